@@ -0,0 +1,513 @@
+#!/usr/bin/env python3
+"""
+Asyncio HTTP/1.1 server for Coral TPU Speech Analysis
+Serves the same endpoints as coral_tpu_server.py (/health, /analyze-speech,
+/analyze-speech/batch, /get-word-list, /words, /model-info, /metrics,
+/debug/profiler, /admin and the /analyze-speech/stream session endpoints)
+without Flask's dev server:
+- slow uploads are read without tying up a worker thread
+- decode, feature extraction and inference run in a thread pool executor
+- a bounded admission queue answers 503 (server saturated) or 429 (one client
+  has too many requests in flight) with Retry-After instead of queueing forever
+Usage: python async_server.py [--port 5000] [--workers 4] [--max-queue 32]
+Set DEMO_MODE=0 (and optionally MODEL_PATH) to serve the real model.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import urlparse, parse_qs
+
+from coral_tpu_server import (
+    health_payload, analyze_json_payload, analyze_batch_payload, analyze_binary_payload, word_list_response, words_query_response,
+    model_info_payload, stream_start_payload, stream_chunk_payload, stream_end_payload, stream_cancel_payload,
+    stream_sessions, metrics_response, profiler_payload, profile_stacks_response, speech_analyzer,
+    admin_model_payload, admin_reload_payload, response_encoder
+)
+
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "GET, POST, DELETE, OPTIONS",
+    "Access-Control-Allow-Headers": "Content-Type, If-None-Match, X-Target-Word, X-Difficulty, X-Audio-Format, X-Sample-Rate, X-Admin-Token",
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+def content_length(headers):
+    """Content-Length of a request (0 when absent); 400 when it isn't a non-negative integer"""
+    value = headers.get('content-length') or '0'
+    if not (value.isascii() and value.isdigit()):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+    return int(value)
+
+
+def chunk_size(size_line):
+    """Size of the next chunk of a chunked body; 400 when the size line isn't hexadecimal"""
+    try:
+        return int(size_line.split(b';')[0].strip() or b'0', 16)
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid chunk size") from None
+
+
+class CatalogResponse:
+    """Pre-serialized body (word catalog, metrics text) plus its headers"""
+
+    def __init__(self, body, headers, content_type="application/json"):
+        self.body = body
+        self.headers = headers
+        self.content_type = content_type
+
+    @classmethod
+    def of(cls, status, etag, body):
+        headers = {"ETag": etag, "Cache-Control": "no-cache"} if etag else {}
+        return cls(body, headers), status
+
+    @classmethod
+    def text(cls, status, content_type, body):
+        return cls(body, {}, content_type), status
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent, max_queue, max_per_client):
+        """Bound in-flight work globally and per client address"""
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_per_client = max_per_client
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._queued = 0
+        self._running = 0
+        self._per_client = {}
+        self._latency_ewma = 0.05
+        self.rejected = 0
+
+    def retry_after(self):
+        """Seconds until the current backlog should have drained"""
+        backlog = self._queued + self._running
+        return max(1, math.ceil(backlog * self._latency_ewma / self.max_concurrent))
+
+    async def run(self, client, fn, *args):
+        """Run fn(*args) in the executor once admitted, or raise 429/503"""
+        if self._per_client.get(client, 0) >= self.max_per_client:
+            self.rejected += 1
+            raise HTTPError(HTTPStatus.TOO_MANY_REQUESTS, "Too many requests in flight for this client",
+                            {"Retry-After": str(self.retry_after())})
+        if self._queued >= self.max_queue:
+            self.rejected += 1
+            raise HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, "Server busy, please retry",
+                            {"Retry-After": str(self.retry_after())})
+
+        self._per_client[client] = self._per_client.get(client, 0) + 1
+        self._queued += 1
+        admitted = False
+        try:
+            async with self._slots:
+                self._queued -= 1
+                admitted = True
+                self._running += 1
+                start = time.perf_counter()
+                try:
+                    loop = asyncio.get_running_loop()
+                    return await loop.run_in_executor(None, fn, *args)
+                finally:
+                    self._running -= 1
+                    elapsed = time.perf_counter() - start
+                    self._latency_ewma = 0.8 * self._latency_ewma + 0.2 * elapsed
+        finally:
+            if not admitted:
+                # Cancelled (client went away) while still waiting for a slot
+                self._queued -= 1
+            remaining = self._per_client[client] - 1
+            if remaining:
+                self._per_client[client] = remaining
+            else:
+                del self._per_client[client]
+
+    def stats(self):
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "queued": self._queued,
+            "running": self._running,
+            "rejected": self.rejected,
+        }
+
+
+class AsyncSpeechServer:
+    def __init__(self, host='0.0.0.0', port=5000, workers=4, max_queue=32, max_per_client=4,
+                 max_body_bytes=16 * 1024 * 1024, header_timeout=10.0, body_timeout=30.0,
+                 keepalive_timeout=15.0):
+        """Configure limits; the server starts in serve()"""
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_per_client = max_per_client
+        self.max_body_bytes = max_body_bytes
+        self.header_timeout = header_timeout
+        self.body_timeout = body_timeout
+        self.keepalive_timeout = keepalive_timeout
+        self.admission = None
+
+    async def serve(self):
+        """Bind and serve until cancelled"""
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="analysis"))
+        self.admission = AdmissionController(self.workers, self.max_queue, self.max_per_client)
+
+        server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        async with server:
+            await server.serve_forever()
+
+    async def handle_connection(self, reader, writer):
+        """Serve HTTP/1.1 requests on one connection until it closes or idles out"""
+        peer = writer.get_extra_info('peername')
+        client = peer[0] if peer else "unknown"
+        first = True
+        try:
+            while True:
+                timeout = self.header_timeout if first else self.keepalive_timeout
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                except ValueError:
+                    # Longer than the stream reader's line limit (64 KiB)
+                    await self.send_json(writer, {"error": "Request line too long"}, HTTPStatus.REQUEST_URI_TOO_LONG,
+                                         keep_alive=False)
+                    break
+                if not request_line:
+                    break
+                first = False
+
+                keep_alive = await self.handle_request(request_line, reader, writer, client)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def read_headers(self, reader):
+        headers = {}
+        while True:
+            line = await asyncio.wait_for(reader.readline(), self.header_timeout)
+            if line in (b'\r\n', b'\n', b''):
+                return headers
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+    async def iter_body(self, reader, headers):
+        """Yield the body piece by piece as it arrives (chunked or Content-Length)"""
+        received = 0
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            while True:
+                size_line = await asyncio.wait_for(reader.readline(), self.body_timeout)
+                size = chunk_size(size_line)
+                if size == 0:
+                    await asyncio.wait_for(reader.readline(), self.body_timeout)
+                    return
+                received += size
+                if received > self.max_body_bytes:
+                    raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+                chunk = await asyncio.wait_for(reader.readexactly(size), self.body_timeout)
+                await asyncio.wait_for(reader.readline(), self.body_timeout)
+                yield chunk
+            return
+
+        length = content_length(headers)
+        if length > self.max_body_bytes:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+        while received < length:
+            chunk = await asyncio.wait_for(reader.read(min(65536, length - received)), self.body_timeout)
+            if not chunk:
+                raise asyncio.IncompleteReadError(b'', length)
+            received += len(chunk)
+            yield chunk
+
+    async def read_body(self, reader, headers):
+        """Read the body with a per-read timeout so slow uploads don't hang forever"""
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = bytearray()
+            async for chunk in self.iter_body(reader, headers):
+                body += chunk
+            return body
+
+        length = content_length(headers)
+        if length > self.max_body_bytes:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+        body = bytearray(length)
+        view = memoryview(body)
+        filled = 0
+        while filled < length:
+            chunk = await asyncio.wait_for(reader.read(min(65536, length - filled)), self.body_timeout)
+            if not chunk:
+                raise asyncio.IncompleteReadError(bytes(view[:filled]), length)
+            view[filled:filled + len(chunk)] = chunk
+            filled += len(chunk)
+        return body
+
+    async def handle_request(self, request_line, reader, writer, client):
+        """Parse one request, route it, write the response; returns keep-alive flag"""
+        try:
+            method, target, version = request_line.decode('latin-1').split()
+        except ValueError:
+            await self.send_json(writer, {"error": "Bad request line"}, HTTPStatus.BAD_REQUEST, keep_alive=False)
+            return False
+
+        try:
+            headers = await self.read_headers(reader)
+        except asyncio.TimeoutError:
+            await self.send_json(writer, {"error": "Request headers timed out"}, HTTPStatus.REQUEST_TIMEOUT,
+                                 keep_alive=False)
+            return False
+        except ValueError:
+            # A header line longer than the stream reader's limit
+            await self.send_json(writer, {"error": "Request header too large"},
+                                 HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, keep_alive=False)
+            return False
+        keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+        url = urlparse(target)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        try:
+            if method == 'POST' and url.path == '/analyze-speech/stream' and self.is_audio_body(headers):
+                # Analyze the upload while it is still arriving
+                payload, status = await self.stream_upload(reader, headers, query, client)
+                await self.send_json(writer, payload, status, keep_alive=keep_alive, request_headers=headers)
+                return keep_alive
+
+            body = await self.read_body(reader, headers) if method == 'POST' else b''
+            payload, status = await self.route(method, url.path, query, headers, body, client)
+            if isinstance(payload, CatalogResponse):
+                await self.send_catalog(writer, payload, status, headers, keep_alive=keep_alive)
+            else:
+                await self.send_json(writer, payload, status, keep_alive=keep_alive, request_headers=headers)
+        except HTTPError as e:
+            # Oversized or malformed bodies were not read, so the connection can't be reused
+            keep_alive = keep_alive and e.status not in (HTTPStatus.REQUEST_ENTITY_TOO_LARGE, HTTPStatus.BAD_REQUEST)
+            await self.send_json(writer, {"error": e.message}, e.status, e.headers, keep_alive=keep_alive,
+                                 request_headers=headers)
+        except asyncio.TimeoutError:
+            await self.send_json(writer, {"error": "Request timed out"}, HTTPStatus.REQUEST_TIMEOUT, keep_alive=False,
+                                 request_headers=headers)
+            return False
+
+        return keep_alive
+
+    async def route(self, method, path, query, headers, body, client):
+        """Dispatch to the shared payload builders in coral_tpu_server"""
+        if method == 'OPTIONS':
+            return None, HTTPStatus.OK
+
+        if method == 'GET':
+            if path == '/health':
+                payload = health_payload()
+                payload["server"] = "asyncio"
+                payload["admission"] = self.admission.stats()
+                return payload, HTTPStatus.OK
+            if path == '/get-word-list':
+                return CatalogResponse.of(*word_list_response(self.if_none_match(headers)))
+            if path == '/words':
+                return CatalogResponse.of(*words_query_response(query, self.if_none_match(headers)))
+            if path == '/model-info':
+                return model_info_payload(), HTTPStatus.OK
+            if path == '/metrics':
+                return CatalogResponse.text(*metrics_response())
+            if path == '/debug/profiler':
+                return profiler_payload('status')
+            if path == '/debug/profiler/stacks':
+                return CatalogResponse.text(*profile_stacks_response())
+            if path == '/admin/model':
+                return admin_model_payload(client, headers.get('x-admin-token'))
+
+        if method == 'POST' and path == '/admin/reload-model':
+            try:
+                data = json.loads(body) if body else None
+            except ValueError:
+                return {"error": "Invalid JSON body"}, HTTPStatus.BAD_REQUEST
+            params = data if isinstance(data, dict) else query
+            return admin_reload_payload(params, client, headers.get('x-admin-token'))
+
+        if method == 'POST' and path.startswith('/debug/profiler/'):
+            return profiler_payload(path.rsplit('/', 1)[1], query)
+
+        if path.startswith('/analyze-speech/stream'):
+            return await self.route_stream(method, path, query, headers, body, client)
+
+        if method == 'POST' and path == '/analyze-speech/batch':
+            return await self.admission.run(client, self.analyze_batch_body, body)
+
+        if method == 'POST' and path == '/analyze-speech':
+            if self.is_audio_body(headers):
+                return await self.admission.run(
+                    client, analyze_binary_payload, body,
+                    query.get('target_word') or headers.get('x-target-word'),
+                    query.get('difficulty') or headers.get('x-difficulty'),
+                    query.get('format') or headers.get('x-audio-format'),
+                    query.get('sample_rate') or headers.get('x-sample-rate')
+                )
+            return await self.admission.run(client, self.analyze_json_body, body)
+
+        raise HTTPError(HTTPStatus.NOT_FOUND, "Endpoint not found")
+
+    @staticmethod
+    def is_audio_body(headers):
+        content_type = headers.get('content-type', '').split(';')[0].strip()
+        return content_type == 'application/octet-stream' or content_type.startswith('audio/')
+
+    @staticmethod
+    def stream_params(query, headers, data=None):
+        """Streaming session parameters from a JSON body, the query string or X- headers"""
+        data = data if isinstance(data, dict) else {}
+        return {
+            name: data.get(name) or query.get(name) or headers.get(header)
+            for name, header in (('target_word', 'x-target-word'), ('difficulty', 'x-difficulty'),
+                                 ('format', 'x-audio-format'), ('sample_rate', 'x-sample-rate'))
+        }
+
+    async def route_stream(self, method, path, query, headers, body, client):
+        """/analyze-speech/stream[/<session_id>[/end]]"""
+        parts = path.strip('/').split('/')[2:]
+        loop = asyncio.get_running_loop()
+
+        if method == 'POST' and not parts:
+            try:
+                data = json.loads(body) if body else None
+            except ValueError:
+                return {"error": "Invalid JSON body"}, HTTPStatus.BAD_REQUEST
+            return stream_start_payload(self.stream_params(query, headers, data))
+        if method == 'POST' and len(parts) == 1:
+            # Chunks are cheap (a few STFT frames), so they skip admission control
+            return await loop.run_in_executor(None, stream_chunk_payload, parts[0], bytes(body))
+        if method == 'POST' and len(parts) == 2 and parts[1] == 'end':
+            return await self.admission.run(client, stream_end_payload, parts[0], bytes(body))
+        if method == 'DELETE' and len(parts) == 1:
+            return stream_cancel_payload(parts[0])
+
+        raise HTTPError(HTTPStatus.NOT_FOUND, "Endpoint not found")
+
+    async def stream_upload(self, reader, headers, query, client):
+        """Feed each piece of an audio upload to a streaming session as it is read"""
+        loop = asyncio.get_running_loop()
+        payload, status = stream_start_payload(self.stream_params(query, headers))
+        session_id = payload.get("session_id")
+
+        try:
+            async for chunk in self.iter_body(reader, headers):
+                # After an error keep reading so the connection stays usable
+                if session_id is not None:
+                    payload, status = await loop.run_in_executor(None, stream_chunk_payload, session_id, chunk)
+                    if status != HTTPStatus.OK:
+                        stream_sessions.cancel(session_id)
+                        session_id = None
+        except (HTTPError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+            # Malformed, oversized or abandoned upload: don't leave the session open until it expires
+            if session_id is not None:
+                stream_sessions.cancel(session_id)
+            raise
+
+        if session_id is None:
+            return payload, status
+        return await self.admission.run(client, stream_end_payload, session_id)
+
+    @staticmethod
+    def analyze_json_body(body):
+        """Parse the JSON body off the event loop, then analyze it"""
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return {"error": "Invalid JSON body"}, HTTPStatus.BAD_REQUEST
+        return analyze_json_payload(data if isinstance(data, dict) else {})
+
+    @staticmethod
+    def analyze_batch_body(body):
+        """Parse a batch request body off the event loop, then analyze every item"""
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return {"error": "Invalid JSON body"}, HTTPStatus.BAD_REQUEST
+        return analyze_batch_payload(data if isinstance(data, dict) else {})
+
+    async def send_json(self, writer, payload, status, extra_headers=None, keep_alive=True, request_headers=None):
+        """Encode a payload as the request's Accept headers ask (JSON by default) and write it"""
+        request_headers = request_headers or {}
+        if payload is None:
+            await self.send_body(writer, b'', status, extra_headers, keep_alive)
+            return
+        with speech_analyzer.stage_seconds.time("serialize"):
+            body, headers = response_encoder.payload(payload, request_headers.get('accept'),
+                                                     request_headers.get('accept-encoding'))
+        content_type = headers.pop("Content-Type")
+        headers.update(extra_headers or {})
+        await self.send_body(writer, body, status, headers, keep_alive, content_type=content_type)
+
+    @staticmethod
+    def if_none_match(headers):
+        """If-None-Match compared against the word catalog's ETags (see ResponseEncoder.if_none_match)"""
+        return response_encoder.if_none_match(headers.get('if-none-match'), headers.get('accept'),
+                                              headers.get('accept-encoding'))
+
+    async def send_catalog(self, writer, response, status, request_headers, keep_alive=True):
+        """Write a pre-serialized response, re-encoded / compressed for the client (cached per ETag)"""
+        body, headers = response_encoder.serialized(
+            response.body, request_headers.get('accept'), request_headers.get('accept-encoding'),
+            key=response.headers.get('ETag'), content_type=response.content_type)
+        content_type = headers.pop("Content-Type", response.content_type)
+        headers = dict(response.headers, **headers)
+        await self.send_body(writer, body, status, headers, keep_alive, content_type=content_type)
+
+    async def send_body(self, writer, body, status, extra_headers=None, keep_alive=True,
+                        content_type="application/json"):
+        """Write a response with an already serialized body"""
+        status = HTTPStatus(status)
+        lines = [f"HTTP/1.1 {status.value} {status.phrase}",
+                 f"Content-Type: {content_type}",
+                 f"Content-Length: {len(body)}",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        lines += [f"{name}: {value}" for name, value in CORS_HEADERS.items()]
+        lines += [f"{name}: {value}" for name, value in (extra_headers or {}).items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1') + body)
+        await writer.drain()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=4, help="Executor threads for decode/features/inference")
+    parser.add_argument('--max-queue', type=int, default=32, help="Requests allowed to wait for a worker")
+    parser.add_argument('--max-per-client', type=int, default=4, help="In-flight requests per client address")
+    args = parser.parse_args()
+
+    server = AsyncSpeechServer(args.host, args.port, workers=args.workers, max_queue=args.max_queue,
+                               max_per_client=args.max_per_client)
+
+    print("🚀 Starting asyncio Coral TPU Speech Analysis Server...")
+    print(f"🔌 Backend URL: http://localhost:{args.port}")
+    print(f"📡 Health Check: http://localhost:{args.port}/health")
+    print(f"⚙️  {args.workers} workers, admission queue of {args.max_queue}")
+    print(f"🧪 Demo mode: {'on (DEMO_MODE=0 serves the model)' if speech_analyzer.demo_mode else 'off'}")
+
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        print("\n🛑 Server stopped by user")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,304 @@
+# Audio payload helpers for the speech analysis servers
+# Reads uploaded audio straight into NumPy-backed buffers without
+# intermediate bytes/BytesIO copies, and decodes it with the cheapest path:
+#   - 16 kHz PCM WAV / raw PCM16  -> np.frombuffer, no resampling
+#   - WAV at other sample rates   -> np.frombuffer + cached polyphase resampler
+#   - anything else (webm, ogg, mp3, ...) -> librosa.load
+
+import io
+import struct
+import time
+from functools import lru_cache
+from math import gcd
+
+import numpy as np
+
+READ_CHUNK_SIZE = 64 * 1024
+MAX_UPLOAD_BYTES = 16 * 1024 * 1024
+
+
+class UploadTooLarge(ValueError):
+    """Request body over the upload limit (servers answer 413)"""
+
+
+def read_stream_into_buffer(stream, content_length=None, chunk_size=READ_CHUNK_SIZE, max_bytes=MAX_UPLOAD_BYTES):
+    """Read a request body into one bytearray using readinto() where possible
+
+    With a known Content-Length the buffer is allocated once and filled in
+    place; otherwise it grows until the stream is exhausted. Bodies over
+    max_bytes raise UploadTooLarge before (or while) being read.
+    """
+    if content_length is not None:
+        if max_bytes is not None and content_length > max_bytes:
+            raise UploadTooLarge(f"Audio upload of {content_length} bytes exceeds {max_bytes} bytes")
+        buffer = bytearray(content_length)
+        view = memoryview(buffer)
+        filled = 0
+        readinto = getattr(stream, 'readinto', None)
+        while filled < content_length:
+            if readinto is not None:
+                count = readinto(view[filled:])
+            else:
+                chunk = stream.read(content_length - filled)
+                count = len(chunk)
+                view[filled:filled + count] = chunk
+            if not count:
+                break
+            filled += count
+        view.release()
+        if filled < content_length:
+            raise ValueError(f"Incomplete audio upload: got {filled} of {content_length} bytes")
+        return buffer
+
+    buffer = bytearray()
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        buffer += chunk
+        if max_bytes is not None and len(buffer) > max_bytes:
+            raise UploadTooLarge(f"Audio upload exceeds {max_bytes} bytes")
+    return buffer
+
+
+def pcm16_to_float32(buffer, offset=0, count=-1, channels=1):
+    """Little-endian signed 16-bit PCM to float32 in [-1, 1), downmixed to mono"""
+    samples = np.frombuffer(buffer, dtype='<i2', count=count, offset=offset)
+    if channels > 1:
+        usable = len(samples) - len(samples) % channels
+        audio = samples[:usable].reshape(-1, channels).mean(axis=1, dtype=np.float32)
+        audio *= 1.0 / 32768.0
+        return audio
+    audio = samples.astype(np.float32)
+    audio *= 1.0 / 32768.0
+    return audio
+
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+def sniff_container(buffer):
+    """Guess the audio container from its magic bytes"""
+    head = bytes(buffer[:12])
+    if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+        return 'wav'
+    if head[:4] == b'\x1aE\xdf\xa3':
+        return 'webm'
+    if head[:4] == b'OggS':
+        return 'ogg'
+    if head[:4] == b'fLaC':
+        return 'flac'
+    if head[:3] == b'ID3' or head[:2] in (b'\xff\xfb', b'\xff\xf3', b'\xff\xf2'):
+        return 'mp3'
+    if head[4:8] == b'ftyp':
+        return 'mp4'
+    return 'unknown'
+
+
+def parse_wav_header(buffer):
+    """Locate the fmt and data chunks of a RIFF/WAVE buffer"""
+    fmt = None
+    offset = 12
+    size = len(buffer)
+
+    while offset + 8 <= size:
+        chunk_id, chunk_size = struct.unpack_from('<4sI', buffer, offset)
+        body = offset + 8
+
+        if chunk_id == b'fmt ':
+            format_tag, channels, sample_rate, _, _, bits = struct.unpack_from('<HHIIHH', buffer, body)
+            if format_tag == WAVE_FORMAT_EXTENSIBLE and chunk_size >= 40:
+                # The real format is the first two bytes of the SubFormat GUID
+                format_tag = struct.unpack_from('<H', buffer, body + 24)[0]
+            fmt = {
+                "format_tag": format_tag,
+                "channels": channels,
+                "sample_rate": sample_rate,
+                "bits_per_sample": bits,
+            }
+        elif chunk_id == b'data':
+            if fmt is None:
+                raise ValueError("WAV data chunk before fmt chunk")
+            # Streaming recorders often write 0 or 0xFFFFFFFF as the data size
+            data_size = min(chunk_size, size - body) if chunk_size else size - body
+            return dict(fmt, data_offset=body, data_size=data_size)
+
+        # Chunks are word-aligned
+        offset = body + chunk_size + (chunk_size & 1)
+
+    raise ValueError("WAV file has no data chunk")
+
+
+def wav_to_float32(buffer, header):
+    """Convert the WAV data chunk to mono float32 without copying the upload"""
+    format_tag = header["format_tag"]
+    bits = header["bits_per_sample"]
+    channels = header["channels"]
+    offset = header["data_offset"]
+    frame_bytes = (bits // 8) * channels
+    if frame_bytes == 0:
+        raise ValueError(f"Invalid WAV header ({channels} channels, {bits} bits)")
+    size = header["data_size"] - header["data_size"] % frame_bytes
+
+    if format_tag == WAVE_FORMAT_PCM and bits == 16:
+        return pcm16_to_float32(buffer, offset=offset, count=size // 2, channels=channels)
+
+    if format_tag == WAVE_FORMAT_IEEE_FLOAT and bits == 32:
+        samples = np.frombuffer(buffer, dtype='<f4', count=size // 4, offset=offset)
+    elif format_tag == WAVE_FORMAT_PCM and bits == 32:
+        samples = np.frombuffer(buffer, dtype='<i4', count=size // 4, offset=offset) * (1.0 / 2147483648.0)
+    elif format_tag == WAVE_FORMAT_PCM and bits == 24:
+        raw = np.frombuffer(buffer, dtype=np.uint8, count=size, offset=offset).reshape(-1, 3)
+        # Place the 3 bytes in the top of an int32 so the sign bit is right
+        samples = (raw[:, 0].astype(np.int32) << 8 | raw[:, 1].astype(np.int32) << 16
+                   | raw[:, 2].astype(np.int32) << 24) * (1.0 / 2147483648.0)
+    elif format_tag == WAVE_FORMAT_PCM and bits == 8:
+        samples = (np.frombuffer(buffer, dtype=np.uint8, count=size, offset=offset) - 128.0) * (1.0 / 128.0)
+    else:
+        raise ValueError(f"Unsupported WAV encoding (format {format_tag}, {bits} bits)")
+
+    samples = samples.astype(np.float32, copy=False)
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1, dtype=np.float32)
+    return samples
+
+
+@lru_cache(maxsize=16)
+def resampler_taps(up, down):
+    """Kaiser-windowed FIR for resample_poly, designed once per rate pair"""
+    from scipy.signal import firwin
+
+    max_rate = max(up, down)
+    half_len = 10 * max_rate
+    return firwin(2 * half_len + 1, 1.0 / max_rate, window=('kaiser', 5.0))
+
+
+def resample(audio, orig_sr, target_sr):
+    """Polyphase resampling with a cached anti-aliasing filter"""
+    if orig_sr == target_sr:
+        return audio
+    from scipy.signal import resample_poly
+
+    divisor = gcd(int(orig_sr), int(target_sr))
+    up, down = target_sr // divisor, orig_sr // divisor
+    return resample_poly(audio, up, down, window=resampler_taps(up, down)).astype(np.float32, copy=False)
+
+
+def decode_audio(buffer, target_sr=16000, audio_format=None, sample_rate=None):
+    """Decode an audio payload to mono float32 at target_sr
+
+    Returns (audio, sr, info) where info records the container, which decoder
+    ran and how long it took (decode_ms).
+    """
+    start = time.perf_counter()
+
+    if audio_format == 'pcm16':
+        source_sr = int(sample_rate or target_sr)
+        container = 'pcm16'
+        audio = pcm16_to_float32(buffer, count=len(buffer) // 2)
+        decoder = 'raw_pcm'
+    else:
+        container = sniff_container(buffer)
+        source_sr = None
+        audio = None
+        if container == 'wav':
+            try:
+                header = parse_wav_header(buffer)
+                audio = wav_to_float32(buffer, header)
+                source_sr = header["sample_rate"]
+                decoder = 'wav_fast'
+            except (ValueError, struct.error) as e:
+                print(f"⚠️  WAV fast path failed ({e}), using librosa")
+
+        if audio is None:
+            import librosa
+
+            audio, _ = librosa.load(io.BytesIO(buffer), sr=target_sr)
+            source_sr = target_sr
+            decoder = 'librosa'
+
+    if source_sr != target_sr:
+        audio = resample(audio, source_sr, target_sr)
+        decoder += '_resampled'
+
+    info = {
+        "container": container,
+        "decoder": decoder,
+        "source_sample_rate": source_sr,
+        "decode_ms": round((time.perf_counter() - start) * 1000, 3),
+    }
+    return audio, target_sr, info
+
+
+class StreamingAudioDecoder:
+    def __init__(self, audio_format=None, sample_rate=None, target_sr=16000):
+        """Incremental decoder for audio that arrives in chunks while it is recorded
+
+        Accepts headerless PCM16 (audio_format='pcm16') or a WAV stream whose
+        header arrives in the first chunk(s). Streams are not resampled, so the
+        audio must already be at target_sr.
+        """
+        self.target_sr = target_sr
+        self.header = None
+        self.container = None
+        self.bytes_received = 0
+        self.decode_seconds = 0.0
+        self._pending = bytearray()
+
+        if audio_format == 'pcm16':
+            self._set_format('pcm16', {"format_tag": WAVE_FORMAT_PCM, "channels": 1,
+                                       "sample_rate": int(sample_rate or target_sr), "bits_per_sample": 16})
+        elif audio_format not in (None, 'wav'):
+            raise ValueError(f"Streaming supports pcm16 and wav audio, not {audio_format}")
+
+    def _set_format(self, container, header):
+        if header["sample_rate"] != self.target_sr:
+            raise ValueError(f"Streaming audio must be {self.target_sr} Hz, got {header['sample_rate']} Hz")
+        self.container = container
+        self.header = dict(header, data_offset=0)
+        self.frame_bytes = (header["bits_per_sample"] // 8) * header["channels"]
+        if self.frame_bytes == 0:
+            raise ValueError(f"Invalid WAV header ({header['channels']} channels, {header['bits_per_sample']} bits)")
+
+    def _parse_header(self):
+        """Wait for the RIFF header and the start of the data chunk"""
+        if len(self._pending) < 12:
+            return False
+        if sniff_container(self._pending) != 'wav':
+            raise ValueError("Streaming audio must be WAV or raw pcm16 (?format=pcm16)")
+        try:
+            header = parse_wav_header(self._pending)
+        except (ValueError, struct.error):
+            if len(self._pending) > 64 * 1024:
+                raise ValueError("WAV header too large for streaming")
+            # fmt or data chunk header not complete yet
+            return False
+        self._set_format('wav', header)
+        del self._pending[:header["data_offset"]]
+        return True
+
+    def decode(self, chunk):
+        """Decode one chunk to mono float32 samples (partial frames carry over)"""
+        start = time.perf_counter()
+        self.bytes_received += len(chunk)
+        self._pending += chunk
+
+        if self.header is None and not self._parse_header():
+            audio = np.zeros(0, dtype=np.float32)
+        else:
+            usable = len(self._pending) - len(self._pending) % self.frame_bytes
+            audio = wav_to_float32(bytes(self._pending[:usable]), dict(self.header, data_size=usable))
+            del self._pending[:usable]
+
+        self.decode_seconds += time.perf_counter() - start
+        return audio
+
+    def info(self):
+        return {
+            "container": self.container or "unknown",
+            "decoder": "stream",
+            "source_sample_rate": self.header["sample_rate"] if self.header else None,
+            "decode_ms": round(self.decode_seconds * 1000, 3),
+        }
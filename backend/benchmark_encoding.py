@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark: response size and encode time per representation (JSON, msgpack, CBOR, +gzip)
+Usage: python benchmark_encoding.py [--repeat 200] [--limit 200]
+"""
+
+import argparse
+import base64
+import io
+import json
+import time
+
+import numpy as np
+import soundfile as sf
+
+import response_encoding
+from response_encoding import compress, pack_cbor_python, pack_json, pack_msgpack_python
+
+
+def best_of(repeat, fn):
+    """Best wall-clock time of repeat runs, in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def synthetic_wav(seconds=1.0, sr=16000):
+    """Base64 WAV of a noisy tone, as the frontend would upload it"""
+    t = np.arange(int(sr * seconds)) / sr
+    audio = 0.3 * np.sin(2 * np.pi * 220 * t) + 0.02 * np.random.default_rng(0).standard_normal(len(t))
+    buffer = io.BytesIO()
+    sf.write(buffer, audio.astype(np.float32), sr, format='WAV')
+    return base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+def endpoint_payloads(limit):
+    """Typical response payloads, built with the server's own payload functions"""
+    import coral_tpu_server as server
+
+    audio = synthetic_wav()
+    analysis, _ = server.analyze_json_payload({"audio_data": audio, "target_word": "cat"})
+    batch, _ = server.analyze_batch_payload(
+        {"items": [{"audio_data": audio, "target_word": word} for word in ("cat", "dog", "ship", "the")]})
+    _, _, word_list = server.word_list_response()
+    _, _, words = server.words_query_response({"limit": str(limit)})
+    return {
+        "analysis": analysis,
+        "batch": batch,
+        "health": server.health_payload(),
+        "model-info": server.model_info_payload(),
+        "word-list": json.loads(word_list),
+        f"words?limit={limit}": json.loads(words),
+    }
+
+
+def encoders():
+    encoders = {"json": pack_json, "msgpack-python": pack_msgpack_python, "cbor-python": pack_cbor_python}
+    if response_encoding.MSGPACK_AVAILABLE:
+        encoders["msgpack"] = response_encoding.pack_msgpack
+    if response_encoding.CBOR2_AVAILABLE:
+        encoders["cbor2"] = response_encoding.pack_cbor
+    return encoders
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--limit', type=int, default=200, help="Page size of the /words query payload")
+    args = parser.parse_args()
+
+    payloads = endpoint_payloads(args.limit)
+    codings = response_encoding.CODINGS
+
+    print(f"📊 best of {args.repeat}; sizes in bytes, times in µs")
+    for name, payload in payloads.items():
+        print(f"\n   {name}")
+        for encoder_name, encode in encoders().items():
+            body = encode(payload)
+            encode_time = best_of(args.repeat, lambda: encode(payload))
+            line = f"     {encoder_name:15s} {len(body):7d} B {encode_time * 1e6:9.1f} µs"
+            for coding in codings:
+                compressed = compress(body, coding)
+                compress_time = best_of(args.repeat, lambda: compress(body, coding))
+                line += f"   +{coding}: {len(compressed):7d} B {(encode_time + compress_time) * 1e6:9.1f} µs"
+            print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark: float32 vs full-integer int8 model on the CPU interpreter
+Both models run through InterpreterSlot, so the int8 numbers include the same
+input quantization / output dequantization the server does. Inputs are MFCC
+tensors from the server's preprocessing (recordings, or synthetic clips with a
+different seed than the calibration set). Reports per-clip latency, model size
+and how far the int8 scores drift from the float reference, including how
+often the pass/fail decision changes at each difficulty threshold.
+Usage: python benchmark_quantization.py [--float models/speech_model_float.tflite]
+                                        [--int8 models/speech_model_int8.tflite]
+                                        [--recordings DIR] [--samples 200] [--json report.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+
+import numpy as np
+
+from create_dummy_models import representative_features
+from interpreter_pool import InterpreterSlot
+
+# Pass thresholds per difficulty, as in CoralTPUSpeechAnalyzer.get_threshold_by_difficulty
+DIFFICULTY_THRESHOLDS = {"easy": 70, "medium": 75, "hard": 80}
+
+
+def load_slot(model_path):
+    import tensorflow as tf
+    interpreter = tf.lite.Interpreter(model_path=model_path, num_threads=1)
+    interpreter.allocate_tensors()
+    return InterpreterSlot(interpreter, "cpu:0", "cpu")
+
+
+def run_model(slot, features, warmup=5):
+    """Scores (N,) and per-clip latencies in ms, one invoke per clip like a single request"""
+    for i in range(min(warmup, len(features))):
+        slot.invoke(features[i:i + 1])
+
+    scores = np.empty(len(features), dtype=np.float64)
+    latencies = []
+    for i in range(len(features)):
+        start = time.perf_counter()
+        output = slot.invoke(features[i:i + 1])
+        latencies.append((time.perf_counter() - start) * 1000)
+        scores[i] = output[0, 0]
+    return scores, latencies
+
+
+def model_report(path, slot, latencies):
+    details = slot.input_details[0]
+    return {
+        "path": path,
+        "size_kb": round(os.path.getsize(path) / 1024, 1),
+        "input_dtype": np.dtype(details['dtype']).name,
+        "input_quantization": slot.input_quantization[:2] if slot.input_quantization else None,
+        "output_quantization": slot.output_quantization[:2] if slot.output_quantization else None,
+        "latency_ms": {
+            "median": round(statistics.median(latencies), 4),
+            "p95": round(float(np.percentile(latencies, 95)), 4),
+            "mean": round(statistics.fmean(latencies), 4),
+        },
+    }
+
+
+def accuracy_report(reference, quantized):
+    """Drift of the int8 accuracy scores (0-100) from the float reference"""
+    reference_accuracy = np.minimum(reference * 100, 100)
+    quantized_accuracy = np.minimum(quantized * 100, 100)
+    error = np.abs(quantized_accuracy - reference_accuracy)
+    return {
+        "clips": len(reference),
+        "mean_abs_error": round(float(error.mean()), 4),
+        "p95_abs_error": round(float(np.percentile(error, 95)), 4),
+        "max_abs_error": round(float(error.max()), 4),
+        "correlation": round(float(np.corrcoef(reference, quantized)[0, 1]), 6) if reference.std() else None,
+        "decision_agreement": {
+            difficulty: round(float(np.mean((reference_accuracy >= threshold) == (quantized_accuracy >= threshold))), 4)
+            for difficulty, threshold in DIFFICULTY_THRESHOLDS.items()
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--float', dest='float_model', default='models/speech_model_float.tflite')
+    parser.add_argument('--int8', dest='int8_model', default='models/speech_model_int8.tflite')
+    parser.add_argument('--recordings', help="Directory of recordings to evaluate on (default: synthetic clips)")
+    parser.add_argument('--samples', type=int, default=200)
+    parser.add_argument('--json', help="Write the report to this file")
+    args = parser.parse_args()
+
+    # seed=1: not the clips the int8 model was calibrated on (seed 0)
+    features = representative_features(args.samples, args.recordings, seed=1)
+    print(f"🎧 Evaluating on {len(features)} {'recorded' if args.recordings else 'synthetic'} clips")
+
+    float_slot = load_slot(args.float_model)
+    int8_slot = load_slot(args.int8_model)
+    float_scores, float_latencies = run_model(float_slot, features)
+    int8_scores, int8_latencies = run_model(int8_slot, features)
+
+    report = {
+        "float": model_report(args.float_model, float_slot, float_latencies),
+        "int8": model_report(args.int8_model, int8_slot, int8_latencies),
+        "accuracy": accuracy_report(float_scores, int8_scores),
+    }
+    report["speedup"] = round(report["float"]["latency_ms"]["median"] / report["int8"]["latency_ms"]["median"], 2)
+
+    for name in ("float", "int8"):
+        model = report[name]
+        print(f"{name:>6}: {model['size_kb']:8.1f} KB  median {model['latency_ms']['median']:.3f} ms  "
+              f"p95 {model['latency_ms']['p95']:.3f} ms  input {model['input_dtype']}")
+    accuracy = report["accuracy"]
+    print(f"⚡ int8 speedup on CPU: {report['speedup']}x")
+    print(f"🎯 Accuracy score drift: mean {accuracy['mean_abs_error']}  p95 {accuracy['p95_abs_error']}  "
+          f"max {accuracy['max_abs_error']} points")
+    print("✅ Same pass/fail decision: " + ", ".join(
+        f"{difficulty} {agreement * 100:.1f}%" for difficulty, agreement in accuracy["decision_agreement"].items()))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"📁 Report written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark: cold-start import time of the backend servers and their heavy dependencies
+Each import runs in a fresh interpreter so nothing is cached between runs.
+Usage: python benchmark_startup.py [--repeat 3] [--json startup.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+MODULES = [
+    # Heavy dependencies
+    "numpy",
+    "flask",
+    "scipy.signal",
+    "librosa",
+    "tensorflow",
+    "pycoral.utils.edgetpu",
+    # Servers (time until the module is imported and the app object exists)
+    "http_server",
+    "simple_server",
+    "coral_tpu_server",
+]
+
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+import {module}
+print("RESULT", time.perf_counter() - start)
+"""
+
+READY_SNIPPET = """
+import time
+start = time.perf_counter()
+import coral_tpu_server
+imported = time.perf_counter() - start
+coral_tpu_server.speech_analyzer.wait_until_ready(timeout=300)
+print("RESULT", imported, time.perf_counter() - start)
+"""
+
+
+def run_snippet(code):
+    """Run code in a fresh interpreter inside the backend directory"""
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        return None
+    # The servers print their own startup banners; pick our line out of them
+    for line in result.stdout.splitlines():
+        if line.startswith("RESULT "):
+            return [float(value) for value in line.split()[1:]]
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', help="Also write the results to this file")
+    args = parser.parse_args()
+
+    results = {"python": sys.version.split()[0], "imports_ms": {}}
+
+    print(f"⏱️  Cold import times (median of {args.repeat} fresh interpreters)")
+    for module in MODULES:
+        timings = [run_snippet(IMPORT_SNIPPET.format(module=module)) for _ in range(args.repeat)]
+        if any(timing is None for timing in timings):
+            print(f"   {module:<24} not installed / failed to import")
+            results["imports_ms"][module] = None
+            continue
+        median_ms = statistics.median(timing[0] for timing in timings) * 1000
+        results["imports_ms"][module] = round(median_ms, 1)
+        print(f"   {module:<24} {median_ms:9.1f} ms")
+
+    timings = [run_snippet(READY_SNIPPET) for _ in range(args.repeat)]
+    if all(timing is not None for timing in timings):
+        bind_ms = statistics.median(timing[0] for timing in timings) * 1000
+        ready_ms = statistics.median(timing[1] for timing in timings) * 1000
+        results["coral_tpu_server"] = {"health_available_ms": round(bind_ms, 1), "ready_ms": round(ready_ms, 1)}
+        print(f"🚀 coral_tpu_server: /health can answer after {bind_ms:.1f} ms, analyzer ready after {ready_ms:.1f} ms")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"📁 Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
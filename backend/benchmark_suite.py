@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite: microbenchmarks plus a load test of every backend server
+Microbenchmarks time each stage of the request path on synthetic audio:
+decode (WAV fast path, resampled WAV, raw PCM16), silence trimming, MFCC
+(per clip and batched), normalization, inference (when TensorFlow Lite and a
+model file are available) and JSON serialization.
+The load test starts each server in this process on an ephemeral port and
+replays synthetic /analyze-speech payloads from keep-alive client threads at
+each concurrency level, reporting p50/p95/p99 latency, throughput and RSS.
+Clients and servers share one interpreter, so compare runs with each other
+rather than with production numbers.
+Usage: python benchmark_suite.py [--servers coral,async,http,simple] [--concurrency 1,4,16]
+                                 [--duration 5] [--skip-micro] [--skip-load]
+                                 [--json results.json] [--compare baseline.json]
+"""
+
+import argparse
+import asyncio
+import base64
+import contextlib
+import http.client
+import io
+import json
+import logging
+import os
+import platform
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import wave
+
+import numpy as np
+
+from audio_decoding import decode_audio
+from benchmark_features import synthetic_clips
+from feature_extraction import MFCCFeatureExtractor
+from voice_activity import VoiceActivityTrimmer
+
+SERVERS = ("coral", "async", "http", "simple")
+
+
+def rss_mb():
+    """Current resident set size of this process in MB"""
+    try:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20, 1)
+    except OSError:
+        # ru_maxrss is the peak, in KB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (2 ** 20 if sys.platform == "darwin" else 2 ** 10), 1)
+
+
+def wav_bytes(audio, sr=16000):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sr)
+        w.writeframes((np.clip(audio, -1, 1) * 32767).astype("<i2").tobytes())
+    return buffer.getvalue()
+
+
+def time_op(fn, min_seconds=0.5, min_runs=5):
+    """Per-call latency stats for fn, run until min_seconds have passed"""
+    fn()  # first call pays for caches and lazy imports
+    timings = []
+    deadline = time.perf_counter() + min_seconds
+    while len(timings) < min_runs or time.perf_counter() < deadline:
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return {
+        "runs": len(timings),
+        "median_us": round(statistics.median(timings) * 1e6, 1),
+        "mean_us": round(statistics.fmean(timings) * 1e6, 1),
+        "min_us": round(min(timings) * 1e6, 1),
+        "ops_per_sec": round(1.0 / statistics.median(timings), 1),
+    }
+
+
+def micro_benchmarks(model_path, seconds, batch_size, min_seconds):
+    """Time each stage of the request path in isolation"""
+    clips = synthetic_clips(batch_size, seconds)
+    clip = clips[0]
+    wav_16k = wav_bytes(clip)
+    wav_44k = wav_bytes(np.interp(np.arange(int(len(clip) * 44100 / 16000)) * 16000 / 44100,
+                                  np.arange(len(clip)), clip), sr=44100)
+    pcm16 = (clip * 32767).astype("<i2").tobytes()
+
+    extractor = MFCCFeatureExtractor()
+    trimmer = VoiceActivityTrimmer()
+    out = extractor.allocate(len(clips))
+    frames, counts = extractor.frame_audio(clips)
+    mfcc = extractor.mfcc_from_mel_db(extractor.mel_db(frames), counts)
+
+    results = {
+        "decode_wav_16k": time_op(lambda: decode_audio(wav_16k), min_seconds),
+        "decode_wav_44k_resampled": time_op(lambda: decode_audio(wav_44k), min_seconds),
+        "decode_pcm16": time_op(lambda: decode_audio(pcm16, audio_format="pcm16"), min_seconds),
+        "vad_trim": time_op(lambda: trimmer.trim(clip), min_seconds),
+        "mfcc_single": time_op(lambda: extractor.extract(clip), min_seconds),
+        f"mfcc_batch_{len(clips)}": time_op(lambda: extractor.extract(clips, out=out), min_seconds),
+        f"normalize_batch_{len(clips)}": time_op(lambda: extractor.normalize_into(mfcc, counts, out), min_seconds),
+    }
+
+    analysis = {
+        "is_correct": True, "accuracy_score": 82.4, "confidence": 0.824,
+        "feedback": "🎉 Ottimo! Quasi perfetto su 'school'. Continua così!",
+        "phonetic_analysis": "Pronuncia fonetica corretta: /skuːl/",
+        "improvement_tips": ["📝 Dividi la parola in parti più piccole"],
+        "audio_quality": "good", "processing_method": "coral_tpu",
+        "decode": {"container": "wav", "decoder": "wav_fast", "source_sample_rate": 16000, "decode_ms": 0.21},
+    }
+    response = {"success": True, "analysis": analysis, "word": "school", "difficulty": "medium"}
+    results["json_response_compact"] = time_op(
+        lambda: json.dumps(response, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), min_seconds)
+    results["json_response_indented"] = time_op(
+        lambda: json.dumps(response, ensure_ascii=False, indent=2).encode("utf-8"), min_seconds)
+
+    results.update(inference_benchmarks(model_path, extractor.extract(clips), min_seconds))
+    return results
+
+
+def inference_benchmarks(model_path, features, min_seconds):
+    """Interpreter invoke at batch size 1 and N (skipped without TensorFlow or a model)"""
+    try:
+        from interpreter_pool import InterpreterPool
+        pool = InterpreterPool.create(model_path, batch_sizes=(1, len(features)))
+        pool.warm_up((1, len(features)))
+    except Exception as e:
+        return {"inference": {"skipped": f"{type(e).__name__}: {e}"}}
+
+    device = pool.slots[0].device
+    return {
+        f"inference_{device}_batch_1": time_op(lambda: pool.invoke(features[:1]), min_seconds),
+        f"inference_{device}_batch_{len(features)}": time_op(lambda: pool.invoke(features), min_seconds),
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(name):
+    """Start one backend on an ephemeral port in a background thread; returns (port, stop)"""
+    port = free_port()
+
+    if name in ("coral", "simple"):
+        from werkzeug.serving import make_server
+        module = __import__("coral_tpu_server" if name == "coral" else "simple_server")
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+        server = make_server("127.0.0.1", port, module.app, threaded=True)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        return port, lambda: (server.shutdown(), thread.join())
+
+    if name == "http":
+        from http.server import ThreadingHTTPServer
+        from http_server import SpeechAnalysisHandler
+
+        class QuietHandler(SpeechAnalysisHandler):
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", port), QuietHandler)
+        server.daemon_threads = True
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        return port, lambda: (server.shutdown(), thread.join(), server.server_close())
+
+    if name == "async":
+        from async_server import AsyncSpeechServer
+        loop = asyncio.new_event_loop()
+        server = AsyncSpeechServer("127.0.0.1", port, max_queue=1024, max_per_client=1024)
+        task = loop.create_task(server.serve())
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+
+        async def cancel():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        def stop():
+            asyncio.run_coroutine_threadsafe(cancel(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+        return port, stop
+
+    raise ValueError(f"Unknown server {name}")
+
+
+def wait_for_health(port, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise TimeoutError(f"Server on port {port} did not become healthy")
+
+
+def request_bodies(count, seconds):
+    """JSON /analyze-speech bodies with distinct synthetic clips (fields for every server)"""
+    words = ["school", "thought", "said", "water", "little", "people"]
+    bodies = []
+    for i, clip in enumerate(synthetic_clips(count, seconds, seed=1)):
+        audio_data = "data:audio/wav;base64," + base64.b64encode(wav_bytes(clip)).decode("ascii")
+        word = words[i % len(words)]
+        bodies.append(json.dumps({"audio_data": audio_data, "target_word": word, "word": word,
+                                  "difficulty": "medium"}).encode("utf-8"))
+    return bodies
+
+
+def run_load(port, bodies, concurrency, duration):
+    """Keep-alive clients posting bodies back to back for duration seconds"""
+    latencies = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+    deadline = time.perf_counter() + duration
+
+    def client(index):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        sent = index
+        while time.perf_counter() < deadline:
+            body = bodies[sent % len(bodies)]
+            sent += concurrency
+            start = time.perf_counter()
+            try:
+                conn.request("POST", "/analyze-speech", body=body, headers={"Content-Type": "application/json"})
+                response = conn.getresponse()
+                response.read()
+                if response.status != 200:
+                    errors[index] += 1
+                    continue
+            except (OSError, http.client.HTTPException):
+                errors[index] += 1
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                continue
+            latencies[index].append(time.perf_counter() - start)
+        conn.close()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    samples = np.array([latency for client_latencies in latencies for latency in client_latencies]) * 1000
+    if len(samples) == 0:
+        return {"requests": 0, "errors": sum(errors)}
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {
+        "requests": int(len(samples)),
+        "errors": sum(errors),
+        "throughput_rps": round(len(samples) / elapsed, 1),
+        "mean_ms": round(float(samples.mean()), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "rss_mb": rss_mb(),
+    }
+
+
+def load_tests(servers, concurrency_levels, duration, payloads, seconds):
+    bodies = request_bodies(payloads, seconds)
+    results = {}
+    for name in servers:
+        try:
+            # Servers print per-request progress; keep the report readable
+            with contextlib.redirect_stdout(io.StringIO()):
+                port, stop = start_server(name)
+                wait_for_health(port)
+        except Exception as e:
+            print(f"⚠️  {name}: could not start ({type(e).__name__}: {e})")
+            results[name] = {"skipped": f"{type(e).__name__}: {e}"}
+            continue
+
+        results[name] = {"rss_mb_idle": rss_mb()}
+        try:
+            for concurrency in concurrency_levels:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    stats = run_load(port, bodies, concurrency, duration)
+                results[name][f"c{concurrency}"] = stats
+                print(f"   {name:<7} c={concurrency:<3} {stats.get('throughput_rps', 0):8.1f} req/s  "
+                      f"p50 {stats.get('p50_ms', 0):7.2f} ms  p95 {stats.get('p95_ms', 0):7.2f} ms  "
+                      f"p99 {stats.get('p99_ms', 0):7.2f} ms  errors {stats['errors']}  rss {stats.get('rss_mb')} MB")
+        finally:
+            with contextlib.redirect_stdout(io.StringIO()):
+                stop()
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(results, baseline_path):
+    """Print the change of every timing and throughput against a previous run"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    print(f"📈 Compared with {baseline_path} ({baseline['meta'].get('git_revision')})")
+    for name, stats in results.get("micro", {}).items():
+        before = baseline.get("micro", {}).get(name, {}).get("median_us")
+        if before and "median_us" in stats:
+            print(f"   {name:<28} {stats['median_us']:10.1f} us  ({(stats['median_us'] / before - 1) * 100:+6.1f}%)")
+    for server, levels in results.get("load", {}).items():
+        for level, stats in levels.items():
+            before = baseline.get("load", {}).get(server, {}).get(level)
+            if isinstance(stats, dict) and isinstance(before, dict) and before.get("p50_ms") and "p50_ms" in stats:
+                print(f"   {server:<7} {level:<5} p50 {(stats['p50_ms'] / before['p50_ms'] - 1) * 100:+6.1f}%  "
+                      f"throughput {(stats['throughput_rps'] / before['throughput_rps'] - 1) * 100:+6.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--servers", default=",".join(SERVERS), help="Comma-separated subset of " + ",".join(SERVERS))
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated client counts")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per server and concurrency level")
+    parser.add_argument("--payloads", type=int, default=64, help="Distinct synthetic clips to replay")
+    parser.add_argument("--seconds", type=float, default=1.5, help="Length of the synthetic clips")
+    parser.add_argument("--batch-size", type=int, default=8, help="Batch size for batched microbenchmarks")
+    parser.add_argument("--micro-seconds", type=float, default=0.5, help="Minimum time per microbenchmark")
+    parser.add_argument("--model", default="models/speech_model_edgetpu.tflite")
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--skip-load", action="store_true")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--compare", help="Previous --json output to compare against")
+    args = parser.parse_args()
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_revision": git_revision(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "rss_mb_start": rss_mb(),
+        }
+    }
+
+    if not args.skip_micro:
+        print(f"⏱️  Microbenchmarks ({args.seconds}s clips, batch of {args.batch_size})")
+        with contextlib.redirect_stdout(io.StringIO()):
+            results["micro"] = micro_benchmarks(args.model, args.seconds, args.batch_size, args.micro_seconds)
+        for name, stats in results["micro"].items():
+            if "skipped" in stats:
+                print(f"   {name:<28} skipped ({stats['skipped']})")
+            else:
+                print(f"   {name:<28} {stats['median_us']:10.1f} us  {stats['ops_per_sec']:10.1f} ops/s")
+
+    if not args.skip_load:
+        servers = [name.strip() for name in args.servers.split(",") if name.strip()]
+        levels = [int(level) for level in args.concurrency.split(",")]
+        print(f"🚀 Load test: {args.duration}s per level, {args.payloads} distinct payloads")
+        results["load"] = load_tests(servers, levels, args.duration, args.payloads, args.seconds)
+
+    results["meta"]["rss_mb_peak"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"📁 Results written to {args.json}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Offline bulk scoring of recorded attempts
+Re-scores an archive of recordings with the current model, without one HTTP
+call per file:
+- decode + features run in parallel worker processes
+- features are grouped into batches for a single interpreter invoke each
+- results are appended to JSONL or CSV as each batch finishes, so an
+  interrupted run continues with --resume (clips already scored with the
+  same model version are skipped)
+Input is a directory (target word taken from the file name, e.g.
+school_0042.wav, or from the parent directory with --word-from dirname) or a
+manifest: .csv / .jsonl with path, target_word and optional difficulty
+columns, or .txt with one path per line.
+Usage: python bulk_score.py recordings/ -o scores.jsonl [--workers 4] [--batch-size 32] [--resume]
+"""
+
+import argparse
+import collections
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from coral_tpu_server import CoralTPUSpeechAnalyzer
+from feature_workers import FeatureProcessPool
+
+AUDIO_EXTENSIONS = ('.wav', '.webm', '.ogg', '.flac', '.mp3', '.m4a', '.mp4', '.pcm', '.raw')
+
+CSV_COLUMNS = ["path", "target_word", "difficulty", "accuracy_score", "confidence", "is_correct",
+               "audio_quality", "speech_duration", "pace_rating", "model_version", "error"]
+
+
+def word_from_path(path, word_from):
+    """Target word from the file name (up to the first '_' or '-') or the parent directory"""
+    if word_from == 'dirname':
+        return os.path.basename(os.path.dirname(path)).lower()
+    stem = os.path.splitext(os.path.basename(path))[0]
+    for separator in ('_', '-'):
+        stem = stem.split(separator)[0]
+    return stem.lower()
+
+
+def read_items(source, word_from='filename', difficulty='medium'):
+    """Yield {path, target_word, difficulty} for a directory or a manifest"""
+    if os.path.isdir(source):
+        paths = []
+        for root, _, files in os.walk(source):
+            paths.extend(os.path.join(root, name) for name in files if name.lower().endswith(AUDIO_EXTENSIONS))
+        for path in sorted(paths):
+            yield {"path": path, "target_word": word_from_path(path, word_from), "difficulty": difficulty}
+        return
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, newline='', encoding='utf-8') as f:
+        if source.endswith('.csv'):
+            rows = csv.DictReader(f)
+        elif source.endswith('.jsonl'):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = ({"path": line.strip()} for line in f if line.strip())
+
+        for row in rows:
+            path = row["path"] if os.path.isabs(row["path"]) else os.path.join(base, row["path"])
+            yield {
+                "path": path,
+                "target_word": (row.get("target_word") or row.get("word") or word_from_path(path, word_from)).lower(),
+                "difficulty": row.get("difficulty") or difficulty,
+            }
+
+
+def audio_format_for(path):
+    return 'pcm16' if path.lower().endswith(('.pcm', '.raw')) else None
+
+
+class ResultWriter:
+    def __init__(self, path, resume=False):
+        """Append JSONL or CSV rows (chosen by extension), flushing after every batch"""
+        self.path = path
+        self.csv = path.endswith('.csv')
+        exists = resume and os.path.exists(path) and os.path.getsize(path) > 0
+        self.file = open(path, 'a' if exists else 'w', newline='', encoding='utf-8')
+        if exists:
+            with open(path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    # The previous run died mid-line; start on a fresh one
+                    self.file.write('\n')
+        self.writer = None
+        if self.csv:
+            self.writer = csv.DictWriter(self.file, fieldnames=CSV_COLUMNS, extrasaction='ignore')
+            if not exists:
+                self.writer.writeheader()
+
+    @staticmethod
+    def completed(path, model_version):
+        """Paths already scored with this model version in an existing output file"""
+        if not os.path.exists(path):
+            return set()
+        with open(path, newline='', encoding='utf-8') as f:
+            if path.endswith('.csv'):
+                rows = csv.DictReader(f)
+            else:
+                rows = (json.loads(line) for line in f if line.strip().endswith('}'))
+            return {row["path"] for row in rows
+                    if row.get("model_version") == model_version and not row.get("error")}
+
+    def write(self, row):
+        if self.csv:
+            self.writer.writerow(row)
+        else:
+            self.file.write(json.dumps(row, ensure_ascii=False, separators=(',', ':'), default=str) + '\n')
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def flat_row(item, analysis, model_version, error=None):
+    """Output row: the input item plus the analysis (CSV keeps the summary columns)"""
+    row = dict(item)
+    if analysis is not None:
+        row.update(analysis)
+        timing = analysis.get("timing_analysis") or {}
+        row["speech_duration"] = timing.get("duration")
+        row["pace_rating"] = timing.get("pace_rating")
+    row["model_version"] = model_version
+    row["error"] = error
+    return row
+
+
+class BulkScorer:
+    def __init__(self, analyzer, workers=2, batch_size=32, max_tasks_per_worker=500):
+        """Decode + features in worker processes, batched inference on the analyzer's interpreter pool"""
+        self.analyzer = analyzer
+        self.batch_size = batch_size
+        self.feature_pool = None
+        if workers:
+            self.feature_pool = FeatureProcessPool(
+                workers=workers, max_tasks_per_worker=max_tasks_per_worker, target_sr=16000,
+                extractor_kwargs={"n_mfcc": 13, "n_fft": 512, "hop_length": 160, "target_frames": 100},
+                trimmer_kwargs={} if analyzer.trimmer is not None else None
+            )
+        # One inference thread per interpreter so decode and inference overlap
+        self.inference = ThreadPoolExecutor(max_workers=analyzer.pool.size, thread_name_prefix="bulk-inference")
+        self.decode_window = max(1, workers) * batch_size * 2
+
+    def features(self, items):
+        """Yield (item, input_data, decode_info, error) in input order"""
+        if self.feature_pool is None:
+            for item in items:
+                try:
+                    with open(item["path"], 'rb') as f:
+                        buffer = f.read()
+                except OSError as e:
+                    yield item, None, None, f"{type(e).__name__}: {e}"
+                    continue
+                input_data, _, _, decode_info = self.analyzer.preprocess_audio(
+                    buffer, item["target_word"], audio_format=audio_format_for(item["path"]))
+                yield item, input_data, decode_info, None if input_data is not None else "preprocessing failed"
+            return
+
+        # Keep a bounded window of decodes in flight so memory stays flat on huge archives
+        pending = collections.deque()
+        items = iter(items)
+        while True:
+            while len(pending) < self.decode_window:
+                item = next(items, None)
+                if item is None:
+                    break
+                pending.append((item, self.feature_pool.submit_file(item["path"], audio_format_for(item["path"]))))
+            if not pending:
+                return
+
+            item, future = pending.popleft()
+            try:
+                input_data, audio_stats, decode_info = future.result()
+                decode_info.update(audio_stats)
+                yield item, input_data, decode_info, None
+            except Exception as e:
+                yield item, None, None, f"{type(e).__name__}: {e}"
+
+    def infer(self, batch):
+        """One invoke for a whole batch of clips; returns (item, analysis, error) rows
+
+        Clips that failed to decode stay in the batch (without an input) so
+        results come out in input order.
+        """
+        valid = [input_data for _, input_data, _, error in batch if error is None]
+        outputs = iter(self.analyzer.pool.invoke(np.concatenate(valid, axis=0)) if valid else ())
+
+        results = []
+        for item, _, decode_info, error in batch:
+            if error is not None:
+                results.append((item, None, error))
+                continue
+            analysis = self.analyzer.analysis_from_output(next(outputs), None, 16000, item["target_word"],
+                                                          item["difficulty"], decode_info)
+            results.append((item, analysis, None))
+        return results
+
+    def score(self, items):
+        """Yield (item, analysis, error) in input order"""
+        batches = collections.deque()
+        batch = []
+
+        def drain(limit):
+            while len(batches) > limit:
+                yield from batches.popleft().result()
+
+        for entry in self.features(items):
+            batch.append(entry)
+            if len(batch) == self.batch_size:
+                batches.append(self.inference.submit(self.infer, batch))
+                batch = []
+                yield from drain(self.analyzer.pool.size)
+
+        if batch:
+            batches.append(self.inference.submit(self.infer, batch))
+        yield from drain(0)
+
+    def close(self):
+        self.inference.shutdown()
+        if self.feature_pool is not None:
+            self.feature_pool.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('source', help="Directory of recordings or a .csv/.jsonl/.txt manifest")
+    parser.add_argument('-o', '--output', default='scores.jsonl', help="Results file (.jsonl or .csv)")
+    parser.add_argument('--model', default='models/speech_model_edgetpu.tflite')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Decode/feature worker processes (0 = decode in this process)")
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--cpu-workers', type=int, default=1, help="CPU interpreters when no Edge TPU is attached")
+    parser.add_argument('--difficulty', default='medium', help="Difficulty for items that don't specify one")
+    parser.add_argument('--word-from', choices=['filename', 'dirname'], default='filename')
+    parser.add_argument('--no-trim', action='store_true', help="Don't crop silence before MFCC")
+    parser.add_argument('--resume', action='store_true', help="Skip clips already scored with this model")
+    parser.add_argument('--report-every', type=float, default=5.0, help="Seconds between progress lines")
+    args = parser.parse_args()
+
+    analyzer = CoralTPUSpeechAnalyzer(model_path=args.model, demo_mode=False, max_batch_size=args.batch_size,
+                                      cpu_workers=args.cpu_workers, trim_silence=not args.no_trim)
+    if analyzer.pool is None:
+        print("❌ Model could not be loaded; bulk scoring needs TensorFlow Lite and a model file")
+        sys.exit(1)
+
+    done = ResultWriter.completed(args.output, analyzer.model_version) if args.resume else set()
+    items = [item for item in read_items(args.source, args.word_from, args.difficulty) if item["path"] not in done]
+    print(f"🎯 Scoring {len(items)} clips with model {analyzer.model_version}"
+          + (f" ({len(done)} already scored, skipped)" if done else ""))
+
+    scorer = BulkScorer(analyzer, workers=args.workers, batch_size=args.batch_size)
+    writer = ResultWriter(args.output, resume=args.resume)
+    scored = errors = 0
+    start = last_report = time.perf_counter()
+    try:
+        for item, analysis, error in scorer.score(items):
+            writer.write(flat_row(item, analysis, analyzer.model_version, error))
+            scored += 1
+            errors += error is not None
+
+            now = time.perf_counter()
+            if scored % args.batch_size == 0 or now - last_report >= args.report_every:
+                writer.flush()
+            if now - last_report >= args.report_every:
+                last_report = now
+                print(f"📊 {scored}/{len(items)} clips, {scored / (now - start):.1f} clips/sec")
+    except KeyboardInterrupt:
+        print("\n🛑 Interrupted; rerun with --resume to continue")
+    finally:
+        writer.close()
+        scorer.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ {scored} clips scored ({errors} errors) in {elapsed:.1f}s: "
+          f"{scored / elapsed if elapsed else 0.0:.1f} clips/sec -> {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,173 +2,731 @@
 # This Python backend will handle AI-powered speech analysis
 
 import os
+import hmac
 import json
+import time
+import random
+import threading
+import importlib.util
 import numpy as np
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-import librosa
 
-# Try to import TensorFlow and PyCoral (optional for demo mode)
-try:
-    import tensorflow as tf
-    TF_AVAILABLE = True
-except ImportError:
+# TensorFlow, PyCoral and librosa take seconds to import, so at startup we only
+# check that they are installed; they are imported when the model is loaded
+# (optionally in a background warm-up thread) or when a decoder needs them.
+TF_AVAILABLE = importlib.util.find_spec('tensorflow') is not None
+if not TF_AVAILABLE:
     print("⚠️  TensorFlow not available - running in demo mode")
-    TF_AVAILABLE = False
-
-try:
-    from pycoral.utils import edgetpu
-    from pycoral.adapters import common
-    from pycoral.adapters import classify
-    CORAL_AVAILABLE = True
-except ImportError:
-    print("⚠️  PyCoral not available - running in demo mode")
-    CORAL_AVAILABLE = False
-
-import io
+
+CORAL_AVAILABLE = importlib.util.find_spec('pycoral') is not None
+if not CORAL_AVAILABLE:
+    print("⚠️  PyCoral not available - models run on CPU interpreters")
+
 import base64
-import wave
+
+from inference_scheduler import MicroBatchScheduler
+from interpreter_pool import InterpreterPool
+from feature_extraction import MFCCFeatureExtractor
+from audio_decoding import MAX_UPLOAD_BYTES, READ_CHUNK_SIZE, UploadTooLarge, read_stream_into_buffer, decode_audio
+from feature_workers import FeatureProcessPool
+from result_cache import LRUCache, audio_fingerprint
+from feedback_catalog import FeedbackCatalog
+from word_store import load_word_store
+from streaming import StreamingSessionManager
+from voice_activity import VoiceActivityTrimmer, pace_rating
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsRegistry, SamplingProfiler
+from model_registry import LoadedModel, ModelRegistry
+from template_scoring import load_template_scorer
+from response_encoding import ResponseEncoder, install_flask
 
 app = Flask(__name__)
 CORS(app)  # Allow requests from React frontend
 
+# Request bodies over MAX_UPLOAD_BYTES are refused with 413 before being read
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_BYTES', MAX_UPLOAD_BYTES))
+
+# JSON by default; msgpack / CBOR and gzip when the client's Accept headers ask for them
+response_encoder = ResponseEncoder()
+install_flask(app, response_encoder)
+
+WORDS_BY_DIFFICULTY = {
+    "easy": ["the", "was", "you", "they", "said", "have", "like", "so", "do", "some"],
+    "medium": ["come", "were", "there", "little", "one", "when", "out", "what", "water", "who"],
+    "hard": ["school", "called", "looked", "asked", "could", "people", "your", "right", "know", "thought"]
+}
+
+# This would be enhanced with actual phonetic analysis
+PHONETIC_MAP = {
+    "the": "/ðə/",
+    "was": "/wɒz/",
+    "said": "/sed/",
+    "school": "/skuːl/",
+    "thought": "/θɔːt/"
+}
+
+# Indexed word catalog ($WORD_CATALOG, or the lists above)
+WORD_STORE = load_word_store(WORDS_BY_DIFFICULTY, PHONETIC_MAP)
+
+# Accuracy thresholds used by generate_ai_feedback, phonetic_breakdown and get_improvement_tips
+FEEDBACK_THRESHOLDS = (60, 70, 80, 90)
+
+# Simulated accuracy range per difficulty in demo mode
+DEMO_SCORE_RANGES = {
+    "easy": (75, 95),
+    "medium": (65, 85),
+    "hard": (55, 75)
+}
+
 class CoralTPUSpeechAnalyzer:
-    def __init__(self, model_path='models/speech_model_edgetpu.tflite'):
-        """Initialize Coral TPU Speech Analyzer"""
+    def __init__(self, model_path='models/speech_model_edgetpu.tflite', demo_mode=True,
+                 max_batch_size=8, max_batch_wait_ms=5.0, cpu_workers=1, max_edgetpu_devices=None,
+                 background_load=False, ready_timeout=30.0, warmup_runs=3,
+                 feature_workers=0, feature_worker_max_tasks=500,
+                 result_cache_entries=1024, result_cache_bytes=8 * 1024 * 1024,
+                 feature_cache_entries=512, feature_cache_bytes=16 * 1024 * 1024,
+                 trim_silence=True, model_poll_seconds=None,
+                 templates_path='models/word_templates.bin', scoring_method="auto"):
+        """Initialize Coral TPU Speech Analyzer
+
+        With background_load=True the model is loaded in a warm-up thread so the
+        HTTP server can bind immediately; state is "warming" until it finishes.
+        Repeated audio is answered from content-addressed caches: the full
+        result per (audio, word, difficulty, model) and the features per audio.
+        With trim_silence=True leading/trailing silence is cropped before MFCC.
+        Stage latencies and fallback counts are recorded in self.metrics.
+        The active model lives in self.models and can be swapped while
+        serving (reload_model(), or every model_poll_seconds when the file
+        changes).
+        Words with reference templates (templates_path) can be scored on the
+        CPU with DTW ("cpu_dtw"): scoring_method="auto" does so whenever no
+        model is loaded, "cpu_dtw" always, "coral_tpu" never.
+        """
         self.model_path = model_path
-        self.interpreter = None
-        self.input_details = None
-        self.output_details = None
+        self.demo_mode = demo_mode
+        self.max_batch_size = max_batch_size
+        self.max_batch_wait_ms = max_batch_wait_ms
+        self.cpu_workers = cpu_workers
+        self.max_edgetpu_devices = max_edgetpu_devices
+        self.model_poll_seconds = model_poll_seconds
+        self.models = ModelRegistry(self.build_model, model_path, on_activate=self.model_activated)
+        self.feature_extractor = MFCCFeatureExtractor(sr=16000, n_mfcc=13, n_fft=512, hop_length=160, target_frames=100)
+
+        self.trimmer = VoiceActivityTrimmer(sr=16000) if trim_silence else None
+
+        # Optional worker processes for decode + MFCC, so they don't serialize on the GIL
+        self.feature_pool = None
+        if feature_workers:
+            self.feature_pool = FeatureProcessPool(
+                workers=feature_workers,
+                max_tasks_per_worker=feature_worker_max_tasks,
+                target_sr=16000,
+                extractor_kwargs={"n_mfcc": 13, "n_fft": 512, "hop_length": 160, "target_frames": 100},
+                trimmer_kwargs={} if trim_silence else None
+            )
+
+        # Feedback texts for every practice word, compiled once per accuracy band
+        self.feedback_catalog = FeedbackCatalog(
+            FEEDBACK_THRESHOLDS, self.feedback_entry,
+            words=WORD_STORE.words()
+        )
+
+        # Memory-mapped reference templates for CPU scoring (None without a template file)
+        self.scoring_method = scoring_method
+        self.templates = load_template_scorer(templates_path)
+        if self.templates is not None:
+            missing = self.templates.coverage(WORD_STORE.words())
+            if missing:
+                print(f"⚠️  {len(missing)} practice word(s) have no reference templates, e.g. {missing[:5]}")
+
+        self.result_cache = LRUCache(result_cache_entries, result_cache_bytes, name="results")
+        self.feature_cache = LRUCache(feature_cache_entries, feature_cache_bytes, name="features")
+        self.register_metrics()
+
+        self.state = "warming"
+        self.ready_timeout = ready_timeout
+        self.ready_event = threading.Event()
+        self.load_seconds = None
+        self.warmup_runs = warmup_runs
+
+        if background_load:
+            threading.Thread(target=self.warm_up, name="model-warmup", daemon=True).start()
+        else:
+            self.warm_up()
+
+    def register_metrics(self):
+        """Stage histograms, outcome counters and scrape-time views of the existing stats"""
+        self.metrics = MetricsRegistry(prefix="speech")
+        self.stage_seconds = self.metrics.histogram(
+            "stage_seconds", "Time spent in each stage of an analysis", ["stage"])
+        self.analysis_seconds = self.metrics.histogram(
+            "analysis_seconds", "End-to-end analyze_pronunciation time by processing method", ["method"])
+        self.analyses_total = self.metrics.counter(
+            "analyses_total", "Analyses by processing method (cached, demo_mode, fallback, ...)", ["method"])
+        self.fallbacks_total = self.metrics.counter(
+            "fallbacks_total", "Fallback analyses by reason", ["reason"])
+
+        caches = (self.result_cache, self.feature_cache)
+        for field, kind in (("hits", "counter"), ("misses", "counter"), ("evictions", "counter"),
+                            ("entries", "gauge"), ("bytes", "gauge")):
+            self.metrics.callback(
+                f"cache_{field}" + ("_total" if kind == "counter" else ""), f"Cache {field}",
+                lambda field=field: {(cache.name,): cache.stats()[field] for cache in caches},
+                kind=kind, labelnames=["cache"])
+        self.metrics.callback("ready", "1 once the model is loaded and warmed up",
+                              lambda: int(self.ready_event.is_set()))
+        self.metrics.callback("model_info", "Active model version",
+                              lambda: {(self.model_version,): 1}, labelnames=["version"])
+        self.metrics.callback("model_reloads_total", "Model switches since startup",
+                              lambda: self.models.reloads, kind="counter")
+        self.metrics.callback("model_reload_failures_total", "Model loads that failed",
+                              lambda: self.models.failures, kind="counter")
+        self.metrics.callback("scheduler_queue_depth", "Requests waiting for a micro-batch",
+                              lambda: self.scheduler.stats()["queue_depth"] if self.scheduler else None)
+        self.metrics.callback("scheduler_batches_total", "Micro-batches run",
+                              lambda: self.scheduler.batches_run if self.scheduler else None, kind="counter")
+        self.metrics.callback("scheduler_rows_total", "Clips run through micro-batches",
+                              lambda: self.scheduler.rows_run if self.scheduler else None, kind="counter")
+        self.metrics.callback("device_utilization", "Fraction of time each interpreter was busy",
+                              lambda: {(device["device"],): device["utilization"]
+                                       for device in self.pool.stats()["devices"]} if self.pool else None,
+                              labelnames=["device"])
+        self.metrics.callback("feature_worker_restarts_total", "Feature worker pool restarts",
+                              lambda: self.feature_pool.restarts if self.feature_pool else None, kind="counter")
+
+    # The active model's parts; None (or "demo") until a model is loaded
+    @property
+    def pool(self):
+        model = self.models.current
+        return model.pool if model else None
+
+    @property
+    def scheduler(self):
+        model = self.models.current
+        return model.scheduler if model else None
+
+    @property
+    def interpreter(self):
+        model = self.models.current
+        return model.pool.slots[0].interpreter if model else None
+
+    @property
+    def input_details(self):
+        model = self.models.current
+        return model.pool.slots[0].input_details if model else None
+
+    @property
+    def output_details(self):
+        model = self.models.current
+        return model.pool.slots[0].output_details if model else None
+
+    @property
+    def model_version(self):
+        model = self.models.current
+        return model.version if model else "demo"
+
+    @property
+    def warmup_stats(self):
+        model = self.models.current
+        return model.warmup_stats if model else None
+
+    def warm_up(self):
+        """Load the model (and its heavy imports), then mark the analyzer ready"""
+        start = time.perf_counter()
         self.load_model()
+        if self.models.current is not None and self.model_poll_seconds:
+            self.models.watch(self.model_poll_seconds)
+        self.load_seconds = round(time.perf_counter() - start, 3)
+        self.state = "ready"
+        self.ready_event.set()
+        print(f"⏱️  Analyzer ready in {self.load_seconds}s")
+
+    def warmup_batch_sizes(self):
+        """Batch sizes the scheduler can produce that are worth pre-warming"""
+        sizes = {1, self.max_batch_size}
+        size = 2
+        while size < self.max_batch_size:
+            sizes.add(size)
+            size *= 2
+        return sorted(sizes)
+
+    def run_warmup_inferences(self, pool):
+        """Pay for delegate compilation, TPU model upload and first-touch
+        allocations with synthetic inputs before the model serves requests"""
+        start = time.perf_counter()
+        batch_sizes = self.warmup_batch_sizes()
+        devices = pool.warm_up(batch_sizes, runs=self.warmup_runs)
+        warmup_stats = {
+            "runs_per_batch_size": self.warmup_runs,
+            "batch_sizes": batch_sizes,
+            "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+            "devices": devices,
+        }
+        print(f"🔥 Warm-up done in {warmup_stats['duration_ms']} ms (batch sizes {batch_sizes})")
+        return warmup_stats
+
+    def wait_until_ready(self, timeout=None):
+        """Block until the warm-up thread finishes; False on timeout"""
+        return self.ready_event.wait(self.ready_timeout if timeout is None else timeout)
         
     def load_model(self):
         """Load TensorFlow Lite model on Coral TPU"""
         try:
-            print("⚠️  Running in simplified demo mode")
-            print("✅ Analyzer initialized in demo mode")
-            return
-
-            if not TF_AVAILABLE or not CORAL_AVAILABLE:
-                print("⚠️  TensorFlow or PyCoral not available, using demo mode")
+            if self.demo_mode:
+                print("⚠️  Running in simplified demo mode")
+                print("✅ Analyzer initialized in demo mode")
                 return
 
-            # Initialize Coral TPU
-            delegates = []
-            try:
-                # Try to load Edge TPU delegate
-                edgetpu_delegate = tf.lite.experimental.load_delegate('libedgetpu.so.1')
-                delegates = [edgetpu_delegate]
-                print("🤖 Coral TPU delegate loaded")
-            except Exception as e:
-                print(f"⚠️  Could not load TPU delegate: {e}")
-                print("📱 Falling back to CPU inference")
+            if not TF_AVAILABLE:
+                print("⚠️  TensorFlow not available, using demo mode")
+                return
 
-            self.interpreter = tf.lite.Interpreter(
-                model_path=self.model_path,
-                experimental_delegates=delegates
-            )
-            self.interpreter.allocate_tensors()
-            
-            # Get input and output details
-            self.input_details = self.interpreter.get_input_details()
-            self.output_details = self.interpreter.get_output_details()
-            
-            if delegates:
-                print(f"✅ Coral TPU model loaded successfully")
-            else:
-                print(f"✅ CPU model loaded successfully")
-            print(f"📥 Input shape: {self.input_details[0]['shape']}")
-            print(f"📤 Output shape: {self.output_details[0]['shape']}")
+            self.models.load(self.model_path)
             
         except Exception as e:
             print(f"❌ Error loading model: {e}")
             print(f"📁 Make sure model file exists at: {self.model_path}")
-            # Create a dummy model for fallback
-            self.interpreter = None
-            self.input_details = None
-            self.output_details = None
 
-    def preprocess_audio(self, audio_data, target_word):
-        """Preprocess audio for the model"""
+    def build_model(self, model_path):
+        """Load and warm a model file into a LoadedModel (the registry activates it)"""
+        start = time.perf_counter()
+        version = self.compute_model_version(model_path)
+
+        # One interpreter per Edge TPU device (or per CPU worker as fallback)
+        pool = InterpreterPool.create(
+            model_path,
+            cpu_workers=self.cpu_workers,
+            max_edgetpu_devices=self.max_edgetpu_devices,
+            batch_sizes=self.warmup_batch_sizes()
+        )
+        slot = pool.slots[0]
+        
+        if slot.delegate == "edgetpu":
+            print(f"✅ Coral TPU model {version} loaded successfully on {pool.size} device(s)")
+        else:
+            print(f"✅ CPU model {version} loaded successfully ({pool.size} interpreter(s))")
+        print(f"📥 Input shape: {slot.input_details[0]['shape']}")
+        print(f"📤 Output shape: {slot.output_details[0]['shape']}")
+        quantization = slot.input_quantization
+        if quantization is not None:
+            print(f"🔢 {quantization[2].name} model: inputs quantized with scale {quantization[0]:.6g}, "
+                  f"zero point {quantization[1]}")
+        elif slot.delegate == "edgetpu":
+            print("⚠️  Float model: the Edge TPU only runs full-integer int8 models, so its ops run on the CPU")
+
+        warmup_stats = self.run_warmup_inferences(pool)
+
+        # Batch concurrent requests into a single invoke(), one batch per interpreter
+        scheduler = MicroBatchScheduler(
+            pool.invoke,
+            max_batch_size=self.max_batch_size,
+            max_wait_ms=self.max_batch_wait_ms,
+            num_workers=pool.size,
+            name=f"inference-{version}"
+        )
+        print(f"📦 Micro-batching up to {self.max_batch_size} clips / {self.max_batch_wait_ms} ms")
+        return LoadedModel(model_path, version, pool, scheduler, warmup_stats,
+                           round(time.perf_counter() - start, 3))
+
+    def model_activated(self, model, previous):
+        """Results of the previous model can't be served again (their keys carry its version)"""
+        if previous is not None and previous.version != model.version:
+            self.result_cache.clear()
+            print(f"🔄 Switched from model {previous.version} to {model.version}")
+
+    def reload_model(self, model_path=None):
+        """Load and warm model_path (default: the active model's file) in the background,
+        then switch new requests to it; False if not possible right now"""
+        if self.demo_mode or not TF_AVAILABLE:
+            return False
+        return self.models.reload(model_path)
+
+    def compute_model_version(self, model_path=None):
+        """Short content hash of the model file, so cached results never outlive a model swap"""
+        with open(model_path or self.model_path, 'rb') as f:
+            return audio_fingerprint(f.read())[:12]
+
+    def preprocess_audio(self, audio_data, target_word, audio_format=None, sample_rate=None, fingerprint=None):
+        """Preprocess audio for the model
+
+        audio_data is a base64 data-URL (JSON endpoint), the raw bytes of an
+        uploaded audio file, or 16 kHz float32 samples already decoded from PCM.
+        Returns (input_data, audio, sr, decode_info). When a feature worker pool
+        is configured the samples stay in the worker, so audio is None and
+        decode_info carries the clip's rms and duration instead. Given the
+        payload's fingerprint, features of previously seen audio come from the
+        feature cache without decoding (audio is None then as well).
+        """
         try:
-            # Convert base64 to audio
-            audio_bytes = base64.b64decode(audio_data.split(',')[1])
-            
-            # Load audio with librosa
-            audio, sr = librosa.load(io.BytesIO(audio_bytes), sr=16000)
-            
-            # Extract features (MFCC)
-            mfcc = librosa.feature.mfcc(y=audio, sr=sr, n_mfcc=13, n_fft=512, hop_length=160)
-            
-            # Normalize and reshape for model
-            mfcc_normalized = (mfcc - np.mean(mfcc)) / np.std(mfcc)
-            
-            # Pad or truncate to fixed size (adjust based on your model)
-            target_frames = 100
-            if mfcc_normalized.shape[1] < target_frames:
-                mfcc_padded = np.pad(mfcc_normalized, ((0, 0), (0, target_frames - mfcc_normalized.shape[1])), mode='constant')
-            else:
-                mfcc_padded = mfcc_normalized[:, :target_frames]
-            
-            # Reshape for model input [batch_size, features, time_steps, channels]
-            input_data = mfcc_padded.reshape(1, 13, target_frames, 1).astype(np.float32)
+            feature_key = None
+            if fingerprint is not None:
+                feature_key = (fingerprint, audio_format, sample_rate)
+                with self.stage_seconds.time("feature_cache"):
+                    cached = self.feature_cache.get(feature_key)
+                if cached is not None:
+                    input_data, decode_info = cached
+                    return input_data, None, 16000, dict(decode_info, cache="hit")
+
+            if isinstance(audio_data, str):
+                # Convert base64 to audio
+                with self.stage_seconds.time("base64_decode"):
+                    audio_data = base64.b64decode(audio_data.split(',')[1])
+
+            if self.feature_pool is not None and not isinstance(audio_data, np.ndarray):
+                # Decode + MFCC in a worker process; only the feature tensor comes back
+                with self.stage_seconds.time("feature_worker"):
+                    input_data, audio_stats, decode_info = self.feature_pool.extract(
+                        audio_data, audio_format=audio_format, sample_rate=sample_rate)
+                decode_info.update(audio_stats)
+                self.cache_features(feature_key, input_data, decode_info)
+                return input_data, None, 16000, decode_info
+
+            audio, sr, decode_info = self.decode_clip(audio_data, audio_format, sample_rate)
+
+            # Extract features (MFCC) into the (1, 13, 100, 1) model input
+            with self.stage_seconds.time("mfcc"):
+                input_data = self.feature_extractor.extract(audio)
+            self.cache_features(feature_key, input_data, decode_info)
             
-            return input_data, audio, sr
+            return input_data, audio, sr, decode_info
             
         except Exception as e:
             print(f"❌ Error preprocessing audio: {e}")
-            return None, None, None
+            return None, None, None, None
+
+    def decode_clip(self, audio_data, audio_format=None, sample_rate=None):
+        """Audio bytes (or 16 kHz samples) to samples cropped to the spoken word; returns (audio, sr, decode_info)"""
+        if isinstance(audio_data, np.ndarray):
+            audio, sr = audio_data, 16000
+            decode_info = {"container": "samples", "decoder": "none", "decode_ms": 0.0}
+        else:
+            # Sniff the container: 16 kHz PCM WAV skips librosa entirely
+            with self.stage_seconds.time("decode"):
+                audio, sr, decode_info = decode_audio(audio_data, target_sr=16000,
+                                                      audio_format=audio_format, sample_rate=sample_rate)
 
-    def analyze_pronunciation(self, audio_data, target_word, difficulty_level="medium"):
-        """Analyze pronunciation using demo mode"""
+        # Crop to the spoken word so the 100 model frames cover speech, not silence
+        if self.trimmer is not None:
+            with self.stage_seconds.time("vad"):
+                audio, decode_info["vad"] = self.trimmer.trim(audio)
+        decode_info["rms"] = float(np.sqrt(np.mean(np.square(audio, dtype=np.float64)))) if len(audio) else 0.0
+        decode_info["duration"] = len(audio) / sr
+        return audio, sr, decode_info
+
+    def cache_features(self, feature_key, input_data, decode_info):
+        if feature_key is not None:
+            self.feature_cache.put(feature_key, (input_data, dict(decode_info)), input_data.nbytes + 512)
+
+    def analyze_pronunciation(self, audio_data, target_word, difficulty_level="medium",
+                              audio_format=None, sample_rate=None):
+        """Analyze pronunciation with the Coral TPU model (or demo mode)"""
+        start = time.perf_counter()
+        results = self._analyze_pronunciation(audio_data, target_word, difficulty_level, audio_format, sample_rate)
+        method = "cached" if results.get("cached") else results.get("processing_method", "unknown")
+        self.analysis_seconds.observe(time.perf_counter() - start, method)
+        self.analyses_total.inc(method)
+        return results
+
+    def _analyze_pronunciation(self, audio_data, target_word, difficulty_level, audio_format, sample_rate):
         try:
-            print(f"🎯 Analyzing pronunciation of '{target_word}' in demo mode")
-            
-            # In demo mode, simulate analysis based on word difficulty
-            return self.demo_analysis(target_word, difficulty_level)
-            
-            # Preprocess audio
-            input_data, raw_audio, sr = self.preprocess_audio(audio_data, target_word)
-            if input_data is None:
-                return self.fallback_analysis(target_word)
-            
-            # Run inference on Coral TPU
-            self.interpreter.set_tensor(self.input_details[0]['index'], input_data)
-            self.interpreter.invoke()
-            
-            # Get output
-            output_data = self.interpreter.get_tensor(self.output_details[0]['index'])
-            
-            # Process results (this depends on your specific model)
-            confidence_score = float(output_data[0][0])  # Adjust based on model output
-            
-            # Calculate pronunciation accuracy
-            accuracy = min(confidence_score * 100, 100)
-            
-            # Determine if pronunciation is correct
-            threshold = self.get_threshold_by_difficulty(difficulty_level)
-            is_correct = accuracy >= threshold
-            
-            # Generate detailed feedback
-            feedback = self.generate_ai_feedback(accuracy, target_word, difficulty_level)
-            
-            # Additional analysis
-            analysis_results = {
-                "is_correct": is_correct,
-                "accuracy_score": round(accuracy, 1),
-                "confidence": round(confidence_score, 3),
-                "feedback": feedback,
-                "phonetic_analysis": self.phonetic_breakdown(target_word, accuracy),
-                "improvement_tips": self.get_improvement_tips(accuracy, target_word),
-                "audio_quality": self.assess_audio_quality(raw_audio, sr),
-                "processing_method": "coral_tpu"
-            }
-            
-            return analysis_results
+            if not self.demo_mode and not self.wait_until_ready():
+                return self.fallback_analysis(target_word, reason="model_unavailable")
+
+            if self.uses_templates(target_word):
+                return self.analyze_audio(self.templates.version, self.run_templates, audio_data, target_word,
+                                          difficulty_level, audio_format, sample_rate)
+
+            if self.demo_mode:
+                print(f"🎯 Analyzing pronunciation of '{target_word}' in demo mode")
+
+                # In demo mode, simulate analysis based on word difficulty
+                return self.demo_analysis(target_word, difficulty_level)
+
+            # The model (and its version in the cache key) stays fixed for the whole request
+            with self.models.use() as model:
+                if model is None:
+                    return self.fallback_analysis(target_word, reason="model_unavailable")
+                return self.analyze_with_model(model, audio_data, target_word, difficulty_level,
+                                               audio_format, sample_rate)
             
         except Exception as e:
             print(f"❌ Error in Coral TPU analysis: {e}")
-            return self.fallback_analysis(target_word)
+            return self.fallback_analysis(target_word, reason="analysis_error")
+
+    def uses_templates(self, target_word):
+        """Whether target_word is scored with CPU template matching instead of the model"""
+        if self.templates is None or self.scoring_method == "coral_tpu" or target_word not in self.templates:
+            return False
+        return self.scoring_method == "cpu_dtw" or self.models.current is None
+
+    def analyze_with_model(self, model, audio_data, target_word, difficulty_level, audio_format, sample_rate):
+        """Cache lookup, preprocessing and inference on one (already acquired) model"""
+        def run(*args):
+            return self.run_model(model, *args)
+        return self.analyze_audio(model.version, run, audio_data, target_word, difficulty_level,
+                                  audio_format, sample_rate)
+
+    def analyze_audio(self, version, run, audio_data, target_word, difficulty_level, audio_format, sample_rate):
+        """Cache lookup and preprocessing, then run(input_data, raw_audio, sr, target_word,
+        difficulty_level, decode_info) scores the clip; version is part of the result key"""
+        if isinstance(audio_data, str):
+            # Convert base64 to audio
+            with self.stage_seconds.time("base64_decode"):
+                audio_data = base64.b64decode(audio_data.split(',')[1])
+
+        # Same audio, word, difficulty and model: the analysis is deterministic
+        with self.stage_seconds.time("fingerprint"):
+            fingerprint = audio_fingerprint(audio_data)
+        result_key = (fingerprint, audio_format, sample_rate, target_word, difficulty_level, version)
+        with self.stage_seconds.time("result_cache"):
+            cached = self.result_cache.get(result_key)
+        if cached is not None:
+            return dict(cached, cached=True)
+        
+        # Preprocess audio
+        input_data, raw_audio, sr, decode_info = self.preprocess_audio(
+            audio_data, target_word, audio_format=audio_format, sample_rate=sample_rate,
+            fingerprint=fingerprint)
+        if input_data is None:
+            return self.fallback_analysis(target_word, reason="preprocess_error")
+        
+        analysis_results = run(input_data, raw_audio, sr, target_word, difficulty_level, decode_info)
+        self.result_cache.put(result_key, analysis_results,
+                              len(json.dumps(analysis_results, separators=(',', ':'), default=str)))
+        return dict(analysis_results, cached=False)
+
+    def analyze_batch(self, items):
+        """Analyze several clips with one feature extraction pass and one batched inference
+
+        items are dicts with audio_data (base64, optionally as a data-URL, or
+        bytes), target_word, difficulty and optional audio_format / sample_rate.
+        Returns one (analysis, error) pair per item, in order: a clip that
+        can't be decoded gets an error without failing the others.
+        """
+        start = time.perf_counter()
+        results = [None] * len(items)
+        if not self.demo_mode and not self.wait_until_ready():
+            return [(self.fallback_analysis(item["target_word"], reason="model_unavailable"), None) for item in items]
+
+        with self.models.use() as model:
+            # Pick a scorer per item and answer what we can from the caches
+            pending = []  # [index, item, method, result_key, feature_key, decode payload]
+            for index, item in enumerate(items):
+                target_word, difficulty_level = item["target_word"], item["difficulty"]
+                if self.uses_templates(target_word):
+                    method, version = "cpu_dtw", self.templates.version
+                elif model is not None:
+                    method, version = "coral_tpu", model.version
+                elif self.demo_mode:
+                    results[index] = (self.demo_analysis(target_word, difficulty_level), None)
+                    continue
+                else:
+                    results[index] = (self.fallback_analysis(target_word, reason="model_unavailable"), None)
+                    continue
+
+                audio_data = item["audio_data"]
+                try:
+                    if isinstance(audio_data, str):
+                        with self.stage_seconds.time("base64_decode"):
+                            audio_data = base64.b64decode(audio_data.split(',')[-1], validate=True)
+                except ValueError as e:
+                    results[index] = (None, f"Invalid base64 audio: {e}")
+                    continue
+                with self.stage_seconds.time("fingerprint"):
+                    fingerprint = audio_fingerprint(audio_data)
+                audio_format, sample_rate = item.get("audio_format"), item.get("sample_rate")
+                result_key = (fingerprint, audio_format, sample_rate, target_word, difficulty_level, version)
+                with self.stage_seconds.time("result_cache"):
+                    cached = self.result_cache.get(result_key)
+                if cached is not None:
+                    results[index] = (dict(cached, cached=True), None)
+                    continue
+                pending.append([index, item, method, result_key, (fingerprint, audio_format, sample_rate),
+                                audio_data])
+
+            features = self.batch_features(pending)
+            self.score_batch(model, pending, features, results)
+
+        elapsed = time.perf_counter() - start
+        for analysis, _ in results:
+            if analysis is not None:
+                method = "cached" if analysis.get("cached") else analysis.get("processing_method", "unknown")
+                self.analysis_seconds.observe(elapsed, method)
+                self.analyses_total.inc(method)
+        return results
+
+    def batch_features(self, pending):
+        """{index: (input_row, raw_audio, decode_info) or error message} for the pending batch items
+
+        Cached features are reused; the rest are decoded one by one (or all at
+        once in the worker processes) and go through one vectorized MFCC pass.
+        """
+        features, to_decode = {}, []
+        for index, _, _, _, feature_key, audio_data in pending:
+            with self.stage_seconds.time("feature_cache"):
+                cached = self.feature_cache.get(feature_key)
+            if cached is not None:
+                input_data, decode_info = cached
+                features[index] = (input_data, None, dict(decode_info, cache="hit"))
+            else:
+                to_decode.append((index, feature_key, audio_data))
+
+        if self.feature_pool is not None and to_decode:
+            with self.stage_seconds.time("feature_worker"):
+                extracted = self.feature_pool.extract_many(
+                    [(audio_data, feature_key[1], feature_key[2]) for _, feature_key, audio_data in to_decode])
+            for (index, feature_key, _), result in zip(to_decode, extracted):
+                if isinstance(result, Exception):
+                    features[index] = f"Could not decode audio: {result}"
+                    continue
+                input_data, audio_stats, decode_info = result
+                decode_info.update(audio_stats)
+                self.cache_features(feature_key, input_data, decode_info)
+                features[index] = (input_data, None, decode_info)
+            return features
+
+        clips = []
+        for index, feature_key, audio_data in to_decode:
+            try:
+                audio, _, decode_info = self.decode_clip(audio_data, feature_key[1], feature_key[2])
+            except Exception as e:
+                features[index] = f"Could not decode audio: {type(e).__name__}: {e}"
+                continue
+            clips.append((index, feature_key, audio, decode_info))
+        if clips:
+            with self.stage_seconds.time("mfcc"):
+                inputs = self.feature_extractor.extract([audio for _, _, audio, _ in clips])
+            for (index, feature_key, audio, decode_info), input_data in zip(clips, inputs):
+                input_data = input_data[np.newaxis]
+                self.cache_features(feature_key, input_data, decode_info)
+                features[index] = (input_data, audio, decode_info)
+        return features
+
+    def score_batch(self, model, pending, features, results):
+        """One scheduler submission for every model-scored item, then template scoring; fills results"""
+        decoded = []
+        for index, item, method, result_key, _, _ in pending:
+            if isinstance(features[index], str):
+                results[index] = (None, features[index])
+            else:
+                decoded.append((index, item, method, result_key) + features[index])
+
+        on_model = [entry for entry in decoded if entry[2] == "coral_tpu"]
+        outputs = {}
+        if on_model:
+            try:
+                with self.stage_seconds.time("inference"):
+                    rows = model.scheduler.submit(np.concatenate([entry[4] for entry in on_model], axis=0))
+                outputs = {entry[0]: row for entry, row in zip(on_model, rows)}
+            except Exception as e:
+                print(f"❌ Batched inference failed for {len(on_model)} clip(s): {e}")
+
+        for index, item, method, result_key, input_data, raw_audio, decode_info in decoded:
+            target_word, difficulty_level = item["target_word"], item["difficulty"]
+            if method == "cpu_dtw":
+                try:
+                    analysis = self.run_templates(input_data, raw_audio, 16000, target_word, difficulty_level,
+                                                  decode_info)
+                except Exception as e:
+                    print(f"❌ Template scoring failed for '{target_word}': {e}")
+                    results[index] = (self.fallback_analysis(target_word, reason="analysis_error"), None)
+                    continue
+            elif index in outputs:
+                with self.stage_seconds.time("build_analysis"):
+                    analysis = self.analysis_from_output(outputs[index], raw_audio, 16000, target_word,
+                                                         difficulty_level, decode_info, model_version=model.version)
+            else:
+                results[index] = (self.fallback_analysis(target_word, reason="analysis_error"), None)
+                continue
+            self.result_cache.put(result_key, analysis,
+                                  len(json.dumps(analysis, separators=(',', ':'), default=str)))
+            results[index] = (dict(analysis, cached=False), None)
+
+    def analyze_features(self, input_data, raw_audio, sr, target_word, difficulty_level, decode_info):
+        """Run inference on already extracted features (also used by streaming sessions)"""
+        try:
+            if self.uses_templates(target_word):
+                return self.run_templates(input_data, raw_audio, sr, target_word, difficulty_level, decode_info)
+            if self.demo_mode:
+                return self.demo_analysis(target_word, difficulty_level)
+            if not self.wait_until_ready():
+                return self.fallback_analysis(target_word, reason="model_unavailable")
+
+            with self.models.use() as model:
+                if model is None:
+                    return self.fallback_analysis(target_word, reason="model_unavailable")
+                return self.run_model(model, input_data, raw_audio, sr, target_word, difficulty_level,
+                                      decode_info)
+        except Exception as e:
+            print(f"❌ Error in Coral TPU analysis: {e}")
+            return self.fallback_analysis(target_word, reason="analysis_error")
+
+    def run_model(self, model, input_data, raw_audio, sr, target_word, difficulty_level, decode_info):
+        """Inference on one model's scheduler and the analysis tagged with its version"""
+        # Run inference on Coral TPU (batched with concurrent requests)
+        with self.stage_seconds.time("inference"):
+            output_data = model.scheduler.submit(input_data)
+        with self.stage_seconds.time("build_analysis"):
+            return self.analysis_from_output(output_data[0], raw_audio, sr, target_word, difficulty_level,
+                                             decode_info, model_version=model.version)
+
+    def run_templates(self, input_data, raw_audio, sr, target_word, difficulty_level, decode_info):
+        """Score the clip against the word's reference templates on the CPU"""
+        with self.stage_seconds.time("dtw"):
+            confidence, match = self.templates.score(input_data[0], target_word)
+        with self.stage_seconds.time("build_analysis"):
+            analysis_results = self.analysis_from_output((confidence,), raw_audio, sr, target_word,
+                                                         difficulty_level, decode_info,
+                                                         model_version=self.templates.version,
+                                                         processing_method="cpu_dtw")
+        analysis_results["template_match"] = match
+        return analysis_results
+
+    def analysis_from_output(self, output_row, raw_audio, sr, target_word, difficulty_level, decode_info,
+                             model_version=None, processing_method="coral_tpu"):
+        """Full analysis for one model output row, including decode and timing details"""
+        analysis_results = self.build_analysis(output_row, raw_audio, sr, target_word, difficulty_level,
+                                               rms_energy=decode_info.get("rms"),
+                                               processing_method=processing_method)
+        analysis_results["decode"] = decode_info
+        analysis_results["model_version"] = model_version or self.model_version
+
+        vad = decode_info.get("vad")
+        if vad is not None:
+            analysis_results["timing_analysis"] = {
+                "duration": vad["speech_duration"],
+                "recording_duration": vad["recording_duration"],
+                "pace_rating": pace_rating(vad["speech_duration"], target_word) if vad["speech_detected"] else "no_speech"
+            }
+        return analysis_results
+
+    def build_analysis(self, output_row, raw_audio, sr, target_word, difficulty_level, rms_energy=None,
+                       processing_method="coral_tpu"):
+        """Turn one model output row into the analysis response"""
+        # Process results (this depends on your specific model)
+        confidence_score = float(output_row[0])  # Adjust based on model output
+        
+        # Calculate pronunciation accuracy
+        accuracy = min(confidence_score * 100, 100)
+        
+        # Determine if pronunciation is correct
+        threshold = self.get_threshold_by_difficulty(difficulty_level)
+        is_correct = accuracy >= threshold
+        
+        # Generate detailed feedback
+        feedback = self.feedback_catalog.entry(target_word, accuracy)
+        
+        # Additional analysis
+        return {
+            "is_correct": is_correct,
+            "accuracy_score": round(accuracy, 1),
+            "confidence": round(confidence_score, 3),
+            "feedback": feedback["feedback"],
+            "phonetic_analysis": feedback["phonetic_breakdown"],
+            "improvement_tips": feedback["improvement_tips"],
+            "audio_quality": self.assess_audio_quality(raw_audio, sr, rms_energy=rms_energy),
+            "processing_method": processing_method
+        }
     
     def get_threshold_by_difficulty(self, difficulty):
         """Get accuracy threshold based on difficulty level"""
@@ -179,6 +737,14 @@ class CoralTPUSpeechAnalyzer:
         }
         return thresholds.get(difficulty, 75)
     
+    def feedback_entry(self, word, accuracy):
+        """Text fields of one analysis, compiled into the feedback catalog"""
+        return {
+            "feedback": self.generate_ai_feedback(accuracy, word, None),
+            "phonetic_breakdown": self.phonetic_breakdown(word, accuracy),
+            "improvement_tips": self.get_improvement_tips(accuracy, word)
+        }
+
     def generate_ai_feedback(self, accuracy, word, difficulty):
         """Generate AI-powered feedback based on analysis"""
         if accuracy >= 90:
@@ -194,16 +760,7 @@ class CoralTPUSpeechAnalyzer:
     
     def phonetic_breakdown(self, word, accuracy):
         """Provide phonetic analysis of the word"""
-        # This would be enhanced with actual phonetic analysis
-        phonetic_map = {
-            "the": "/ðə/",
-            "was": "/wɒz/",
-            "said": "/sed/",
-            "school": "/skuːl/",
-            "thought": "/θɔːt/"
-        }
-        
-        phonetic = phonetic_map.get(word.lower(), f"/{word}/")
+        phonetic = PHONETIC_MAP.get(word.lower(), f"/{word}/")
         
         if accuracy >= 80:
             return f"Pronuncia fonetica corretta: {phonetic}"
@@ -227,13 +784,14 @@ class CoralTPUSpeechAnalyzer:
         
         return tips
     
-    def assess_audio_quality(self, audio, sr):
-        """Assess audio quality metrics"""
-        if audio is None:
-            return "unknown"
-        
-        # Calculate basic audio metrics
-        rms_energy = np.sqrt(np.mean(audio**2))
+    def assess_audio_quality(self, audio, sr, rms_energy=None):
+        """Assess audio quality metrics (rms_energy may be precomputed by a worker)"""
+        if rms_energy is None:
+            if audio is None:
+                return "unknown"
+            
+            # Calculate basic audio metrics
+            rms_energy = np.sqrt(np.mean(audio**2))
         
         if rms_energy > 0.1:
             return "good"
@@ -242,8 +800,9 @@ class CoralTPUSpeechAnalyzer:
         else:
             return "low"
     
-    def fallback_analysis(self, target_word):
+    def fallback_analysis(self, target_word, reason="error"):
         """Fallback analysis when TPU fails"""
+        self.fallbacks_total.inc(reason)
         return {
             "is_correct": True,
             "accuracy_score": 75.0,
@@ -252,119 +811,550 @@ class CoralTPUSpeechAnalyzer:
             "phonetic_analysis": f"Pronuncia la parola '{target_word}' chiaramente",
             "improvement_tips": ["Assicurati che il Coral TPU sia connesso"],
             "audio_quality": "unknown",
-            "processing_method": "fallback"
+            "processing_method": "fallback",
+            "model_version": self.model_version
         }
     
     def demo_analysis(self, target_word, difficulty_level="medium"):
         """Simulate analysis for demo purposes"""
-        import random
-        
         # Simulate realistic accuracy based on word difficulty
-        difficulty_scores = {
-            "easy": random.uniform(75, 95),
-            "medium": random.uniform(65, 85),
-            "hard": random.uniform(55, 75)
-        }
-        
-        accuracy = difficulty_scores.get(difficulty_level, random.uniform(60, 80))
+        accuracy = random.uniform(*DEMO_SCORE_RANGES.get(difficulty_level, (60, 80)))
         threshold = self.get_threshold_by_difficulty(difficulty_level)
         is_correct = accuracy >= threshold
+        feedback = self.feedback_catalog.entry(target_word, accuracy)
         
         return {
             "is_correct": is_correct,
             "accuracy_score": round(accuracy, 1),
             "confidence": round(accuracy / 100, 3),
-            "feedback": self.generate_ai_feedback(accuracy, target_word, difficulty_level),
-            "phonetic_breakdown": self.phonetic_breakdown(target_word, accuracy),
-            "improvement_tips": self.get_improvement_tips(target_word, accuracy),
+            "feedback": feedback["feedback"],
+            "phonetic_breakdown": feedback["phonetic_breakdown"],
+            "improvement_tips": feedback["improvement_tips"],
             "timing_analysis": {
                 "duration": round(random.uniform(0.8, 2.5), 2),
                 "pace_rating": "good" if random.choice([True, False]) else "too_fast"
             },
             "audio_quality": "good",
-            "processing_method": "demo_mode"
+            "processing_method": "demo_mode",
+            "model_version": self.model_version
         }
 
-# Initialize TPU analyzer
-speech_analyzer = CoralTPUSpeechAnalyzer()
+# Initialize TPU analyzer (model loads in the background so /health answers right away)
+# DEMO_MODE=0 serves the real model (MODEL_PATH) instead of simulated scores
+# FEATURE_WORKERS=N moves decode + MFCC into N worker processes
+# MODEL_POLL_SECONDS=N reloads the model when its file changes (0 disables)
+# WORD_TEMPLATES / SCORING_METHOD: CPU template scoring (auto, cpu_dtw or coral_tpu)
+speech_analyzer = CoralTPUSpeechAnalyzer(
+    model_path=os.environ.get('MODEL_PATH', 'models/speech_model_edgetpu.tflite'),
+    demo_mode=os.environ.get('DEMO_MODE', '1') != '0',
+    background_load=True,
+    feature_workers=int(os.environ.get('FEATURE_WORKERS', '0')),
+    model_poll_seconds=float(os.environ.get('MODEL_POLL_SECONDS', '5')),
+    templates_path=os.environ.get('WORD_TEMPLATES', 'models/word_templates.bin'),
+    scoring_method=os.environ.get('SCORING_METHOD', 'auto')
+)
 
-@app.route('/health', methods=['GET'])
-def health_check():
-    """Health check endpoint"""
-    return jsonify({
+# Open streaming analysis sessions (audio chunks posted while recording)
+stream_sessions = StreamingSessionManager(speech_analyzer)
+speech_analyzer.metrics.callback("stream_sessions_open", "Open streaming sessions",
+                                 lambda: stream_sessions.stats()["open_sessions"])
+
+# Sampling profiler, idle until started through /debug/profiler/start
+# (the endpoints only exist with ENABLE_PROFILER=1)
+profiler = SamplingProfiler()
+PROFILER_ENABLED = os.environ.get('ENABLE_PROFILER', '0') == '1'
+
+# Clips per /analyze-speech/batch request (a session round is a handful of words)
+MAX_BATCH_ITEMS = int(os.environ.get('MAX_BATCH_ITEMS', '32'))
+
+# /admin endpoints need X-Admin-Token when ADMIN_TOKEN is set, else a local client
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+# Endpoint payloads are built by plain functions so every serving mode
+# (Flask below, asyncio in async_server.py) returns the same responses.
+
+def health_payload():
+    """Health check payload (answers immediately, even while the model warms up)"""
+    return {
         "status": "healthy",
+        "state": speech_analyzer.state,
+        "load_seconds": speech_analyzer.load_seconds,
         "coral_tpu": "available" if speech_analyzer.interpreter else "unavailable",
+        "cpu_dtw": "available" if speech_analyzer.templates else "unavailable",
+        "devices": speech_analyzer.pool.stats()["devices"] if speech_analyzer.pool else [],
         "timestamp": str(np.datetime64('now'))
-    })
+    }
 
-@app.route('/analyze-speech', methods=['POST'])
-def analyze_speech():
-    """Main endpoint for speech analysis"""
+def analyze_json_payload(data):
+    """Analyze a JSON request with a base64 data-URL; returns (payload, status)"""
+    target_word = ''
     try:
-        data = request.get_json()
-        
         # Extract request data
         audio_data = data.get('audio_data')
         target_word = data.get('target_word', '').lower()
         difficulty = data.get('difficulty', 'medium')
         
         if not audio_data or not target_word:
-            return jsonify({
+            return {
                 "error": "Missing audio_data or target_word"
-            }), 400
+            }, 400
         
         # Analyze with Coral TPU
         results = speech_analyzer.analyze_pronunciation(audio_data, target_word, difficulty)
         
-        return jsonify({
+        return {
             "success": True,
             "analysis": results,
             "word": target_word,
             "difficulty": difficulty
-        })
+        }, 200
         
     except Exception as e:
-        return jsonify({
+        return {
+            "success": False,
+            "error": str(e),
+            "analysis": speech_analyzer.fallback_analysis(target_word, reason="request_error")
+        }, 500
+
+def analyze_batch_payload(data):
+    """Analyze {"items": [{audio, target_word, difficulty}, ...]} at once; returns (payload, status)
+
+    Each item gets its own {"success", "analysis"} or {"success": false, "error"}
+    entry, so one bad clip doesn't fail the rest of the round.
+    """
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        return {"error": "Missing items"}, 400
+    if len(items) > MAX_BATCH_ITEMS:
+        return {"error": f"At most {MAX_BATCH_ITEMS} items per batch"}, 400
+
+    results = [None] * len(items)
+    batch, positions = [], []
+    for position, item in enumerate(items):
+        item = item if isinstance(item, dict) else {}
+        audio_data = item.get('audio') or item.get('audio_data')
+        target_word = item.get('target_word')
+        target_word = target_word.lower() if isinstance(target_word, str) else ''
+        difficulty = item.get('difficulty') or data.get('difficulty') or 'medium'
+        audio_format = item.get('format')
+        if not isinstance(audio_data, str) or not target_word:
+            results[position] = {"success": False, "error": "Missing audio or target_word", "word": target_word}
+            continue
+        if not isinstance(difficulty, str) or not (audio_format is None or isinstance(audio_format, str)):
+            results[position] = {"success": False, "error": "difficulty and format must be strings",
+                                 "word": target_word}
+            continue
+        try:
+            sample_rate = int(item['sample_rate']) if item.get('sample_rate') else None
+        except (TypeError, ValueError):
+            results[position] = {"success": False, "error": "sample_rate must be an integer", "word": target_word}
+            continue
+        batch.append({"audio_data": audio_data, "target_word": target_word, "difficulty": difficulty,
+                      "audio_format": audio_format, "sample_rate": sample_rate})
+        positions.append(position)
+
+    try:
+        analyses = speech_analyzer.analyze_batch(batch) if batch else []
+    except Exception as e:
+        return {"success": False, "error": str(e)}, 500
+
+    for position, item, (analysis, error) in zip(positions, batch, analyses):
+        if error is not None:
+            results[position] = {"success": False, "error": error, "word": item["target_word"]}
+        else:
+            results[position] = {"success": True, "analysis": analysis, "word": item["target_word"],
+                                 "difficulty": item["difficulty"]}
+    return {
+        "success": True,
+        "results": results,
+        "count": len(results),
+        "failed": sum(1 for result in results if not result["success"])
+    }, 200
+
+def analyze_binary_payload(audio_buffer, target_word, difficulty, audio_format=None, sample_rate=None):
+    """Analyze raw uploaded audio bytes; returns (payload, status)"""
+    target_word = (target_word or '').lower()
+    difficulty = difficulty or 'medium'
+
+    try:
+        if not audio_buffer or not target_word:
+            return {
+                "error": "Missing audio body or target_word"
+            }, 400
+
+        # Headerless PCM16 is viewed directly; containers are sniffed by the decoder
+        results = speech_analyzer.analyze_pronunciation(
+            audio_buffer, target_word, difficulty,
+            audio_format=audio_format, sample_rate=int(sample_rate) if sample_rate else None
+        )
+
+        return {
+            "success": True,
+            "analysis": results,
+            "word": target_word,
+            "difficulty": difficulty
+        }, 200
+
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e),
+            "analysis": speech_analyzer.fallback_analysis(target_word, reason="request_error")
+        }, 500
+
+def stream_start_payload(params):
+    """Open a streaming session; params has target_word, difficulty, format, sample_rate"""
+    target_word = (params.get('target_word') or '').lower()
+    difficulty = params.get('difficulty') or 'medium'
+    if not target_word:
+        return {"error": "Missing target_word"}, 400
+
+    try:
+        session = stream_sessions.create(
+            target_word, difficulty, audio_format=params.get('format'),
+            sample_rate=int(params['sample_rate']) if params.get('sample_rate') else None
+        )
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    except RuntimeError as e:
+        return {"error": str(e)}, 503
+
+    return {
+        "success": True,
+        "session_id": session.session_id,
+        "chunk_url": f"/analyze-speech/stream/{session.session_id}",
+        "end_url": f"/analyze-speech/stream/{session.session_id}/end",
+        "idle_timeout": stream_sessions.idle_timeout
+    }, 201
+
+def stream_chunk_payload(session_id, chunk):
+    """Feed one audio chunk to a session; returns its progress"""
+    try:
+        return dict(stream_sessions.append(session_id, chunk), success=True), 200
+    except KeyError:
+        return {"error": "Unknown or expired streaming session"}, 404
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+def stream_end_payload(session_id, chunk=None):
+    """Close a session (optionally with a last chunk) and return its analysis"""
+    session = None
+    try:
+        session = stream_sessions.get(session_id)
+        results = stream_sessions.finish(session_id, chunk)
+    except KeyError:
+        return {"error": "Unknown or expired streaming session"}, 404
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    except Exception as e:
+        target_word = session.target_word if session is not None else ''
+        return {
             "success": False,
             "error": str(e),
-            "analysis": speech_analyzer.fallback_analysis(target_word)
-        }), 500
+            "analysis": speech_analyzer.fallback_analysis(target_word, reason="request_error")
+        }, 500
+
+    return {
+        "success": True,
+        "analysis": results,
+        "word": session.target_word,
+        "difficulty": session.difficulty
+    }, 200
+
+def stream_cancel_payload(session_id):
+    if not stream_sessions.cancel(session_id):
+        return {"error": "Unknown or expired streaming session"}, 404
+    return {"success": True}, 200
+
+def word_list_response(if_none_match=None):
+    """Available words for practice: (status, etag, serialized body)"""
+    return WORD_STORE.word_list_response(if_none_match)
+
+def words_query_response(params, if_none_match=None):
+    """One page of the word catalog filtered by difficulty/phoneme/prefix/language"""
+    try:
+        return WORD_STORE.query_response(params, if_none_match)
+    except ValueError as e:
+        return 400, None, json.dumps({"error": str(e)}).encode('utf-8')
+
+def metrics_response():
+    """Prometheus text exposition: (status, content type, body)"""
+    return 200, METRICS_CONTENT_TYPE, speech_analyzer.metrics.render().encode('utf-8')
+
+def profiler_payload(action, params=None):
+    """Start, stop or inspect the sampling profiler; returns (payload, status)"""
+    if not PROFILER_ENABLED:
+        return {"error": "Profiler disabled; start the server with ENABLE_PROFILER=1"}, 404
+    params = params or {}
+    try:
+        if action == 'start':
+            interval_ms = params.get('interval_ms')
+            stats = profiler.start(interval=float(interval_ms) / 1000 if interval_ms else None,
+                                   max_seconds=float(params['seconds']) if params.get('seconds') else None)
+        elif action == 'stop':
+            stats = profiler.stop()
+        elif action == 'status':
+            stats = profiler.stats()
+        else:
+            return {"error": f"Unknown profiler action '{action}'"}, 404
+    except ValueError:
+        return {"error": "interval_ms and seconds must be numbers"}, 400
+    return dict(stats, success=True), 200
+
+def profile_stacks_response():
+    """Collapsed stacks collected so far: (status, content type, body)"""
+    if not PROFILER_ENABLED:
+        return 404, 'text/plain; charset=utf-8', b"Profiler disabled\n"
+    return 200, 'text/plain; charset=utf-8', profiler.collapsed().encode('utf-8')
+
+def admin_authorized(remote_addr, token):
+    if ADMIN_TOKEN:
+        return hmac.compare_digest(token or '', ADMIN_TOKEN)
+    return remote_addr in ('127.0.0.1', '::1', 'localhost')
+
+def admin_model_payload(remote_addr, token):
+    """Model registry state: active version, reloads, failures"""
+    if not admin_authorized(remote_addr, token):
+        return {"error": "Forbidden"}, 403
+    return speech_analyzer.models.stats(), 200
+
+def admin_reload_payload(params, remote_addr, token):
+    """Start loading a model file in the background; params may name another file in the model directory"""
+    if not admin_authorized(remote_addr, token):
+        return {"error": "Forbidden"}, 403
+
+    path = params.get('path') or None
+    if path is not None and not isinstance(path, str):
+        return {"error": "path must be a string"}, 400
+    if path is not None:
+        # Only files next to the configured model can be loaded
+        models_dir = os.path.dirname(os.path.abspath(speech_analyzer.model_path))
+        path = os.path.join(models_dir, os.path.basename(path))
+        if not os.path.isfile(path):
+            return {"error": f"No model file {os.path.basename(path)} in {models_dir}"}, 400
+
+    if speech_analyzer.demo_mode or not TF_AVAILABLE:
+        return {"error": "No model to reload in demo mode"}, 409
+    if not speech_analyzer.reload_model(path):
+        return dict(speech_analyzer.models.stats(), error="A reload is already in progress"), 409
+    return dict(speech_analyzer.models.stats(), success=True, loading=path or speech_analyzer.models.model_path), 202
+
+def model_info_payload():
+    """Information about the loaded model"""
+    if speech_analyzer.interpreter:
+        return {
+            "model_loaded": True,
+            "input_shape": speech_analyzer.input_details[0]['shape'].tolist() if speech_analyzer.input_details else None,
+            "output_shape": speech_analyzer.output_details[0]['shape'].tolist() if speech_analyzer.output_details else None,
+            "model_path": speech_analyzer.models.model_path,
+            "registry": speech_analyzer.models.stats(),
+            "quantization": {
+                "input": speech_analyzer.pool.slots[0].input_quantization[:2]
+                if speech_analyzer.pool.slots[0].input_quantization else None,
+                "output": speech_analyzer.pool.slots[0].output_quantization[:2]
+                if speech_analyzer.pool.slots[0].output_quantization else None
+            },
+            "interpreter_pool": speech_analyzer.pool.stats() if speech_analyzer.pool else None,
+            "warmup": speech_analyzer.warmup_stats,
+            "feature_workers": speech_analyzer.feature_pool.stats() if speech_analyzer.feature_pool else None,
+            "scheduler": speech_analyzer.scheduler.stats() if speech_analyzer.scheduler else None,
+            "model_version": speech_analyzer.model_version,
+            "streaming": stream_sessions.stats(),
+            "templates": speech_analyzer.templates.stats() if speech_analyzer.templates else None,
+            "response_encoding": response_encoder.stats(),
+            "caches": {
+                "results": speech_analyzer.result_cache.stats(),
+                "features": speech_analyzer.feature_cache.stats()
+            }
+        }
+    else:
+        return {
+            "model_loaded": False,
+            "error": "Model not loaded",
+            "templates": speech_analyzer.templates.stats() if speech_analyzer.templates else None
+        }
+
+def analysis_response(payload, status):
+    """jsonify an analysis payload, timing the serialization for /metrics"""
+    with speech_analyzer.stage_seconds.time("serialize"):
+        return jsonify(payload), status
+
+@app.route('/health', methods=['GET'])
+def health_check():
+    """Health check endpoint"""
+    return jsonify(health_payload())
+
+@app.route('/analyze-speech', methods=['POST'])
+def analyze_speech():
+    """Main endpoint for speech analysis
+
+    Accepts the JSON body with a base64 data-URL, or a binary upload:
+    - application/octet-stream / audio/*: raw WAV (or other container) bytes,
+      or headerless mono PCM16 with ?format=pcm16[&sample_rate=16000]
+    - multipart/form-data: an 'audio' file field
+    For binary uploads target_word and difficulty come from the query string,
+    form fields, or the X-Target-Word / X-Difficulty headers.
+    """
+    if request.mimetype == 'multipart/form-data' or request.mimetype == 'application/octet-stream' \
+            or request.mimetype.startswith('audio/'):
+        return analyze_speech_binary()
+
+    payload, status = analyze_json_payload(request.get_json(silent=True) or {})
+    return analysis_response(payload, status)
+
+def binary_request_param(name, header):
+    """Read a parameter of a binary upload from query, form or header"""
+    return request.args.get(name) or request.form.get(name) or request.headers.get(header)
+
+def analyze_speech_binary():
+    """Speech analysis for raw audio bytes (no base64, no JSON)"""
+    try:
+        if request.mimetype == 'multipart/form-data':
+            upload = request.files.get('audio')
+            if upload is None:
+                return jsonify({"error": "Missing 'audio' file field"}), 400
+            audio_buffer = read_stream_into_buffer(upload.stream, upload.content_length or None,
+                                                   max_bytes=app.config['MAX_CONTENT_LENGTH'])
+        else:
+            audio_buffer = read_stream_into_buffer(request.stream, request.content_length,
+                                                   max_bytes=app.config['MAX_CONTENT_LENGTH'])
+    except UploadTooLarge as e:
+        return jsonify({"error": str(e)}), 413
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    payload, status = analyze_binary_payload(
+        audio_buffer,
+        binary_request_param('target_word', 'X-Target-Word'),
+        binary_request_param('difficulty', 'X-Difficulty'),
+        audio_format=binary_request_param('format', 'X-Audio-Format'),
+        sample_rate=binary_request_param('sample_rate', 'X-Sample-Rate')
+    )
+    return analysis_response(payload, status)
+
+def stream_request_params():
+    """Session parameters from the JSON body, query string or X- headers"""
+    data = request.get_json(silent=True) if request.mimetype == 'application/json' else None
+    data = data if isinstance(data, dict) else {}
+    return {
+        name: data.get(name) or binary_request_param(name, header)
+        for name, header in (('target_word', 'X-Target-Word'), ('difficulty', 'X-Difficulty'),
+                             ('format', 'X-Audio-Format'), ('sample_rate', 'X-Sample-Rate'))
+    }
+
+@app.route('/analyze-speech/batch', methods=['POST'])
+def analyze_speech_batch():
+    """Several recordings of a session round in one request: {"items": [{audio, target_word, difficulty}]}"""
+    payload, status = analyze_batch_payload(request.get_json(silent=True) or {})
+    return analysis_response(payload, status)
+
+@app.route('/analyze-speech/stream', methods=['POST'])
+def analyze_speech_stream():
+    """Open a streaming session, or analyze a chunked upload as it arrives
+
+    With a JSON (or empty) body this returns a session_id; the client then
+    POSTs audio chunks to /analyze-speech/stream/<id> while recording and
+    finishes with /analyze-speech/stream/<id>/end. With an audio body
+    (Transfer-Encoding: chunked works) each piece is processed as it is read.
+    """
+    payload, status = stream_start_payload(stream_request_params())
+    if status != 201 or not (request.mimetype == 'application/octet-stream' or request.mimetype.startswith('audio/')):
+        return jsonify(payload), status
+
+    session_id = payload["session_id"]
+    while True:
+        chunk = request.stream.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        payload, status = stream_chunk_payload(session_id, chunk)
+        if status != 200:
+            stream_sessions.cancel(session_id)
+            return jsonify(payload), status
+
+    payload, status = stream_end_payload(session_id)
+    return analysis_response(payload, status)
+
+@app.route('/analyze-speech/stream/<session_id>', methods=['POST', 'DELETE'])
+def analyze_speech_stream_chunk(session_id):
+    """Append an audio chunk to a streaming session (DELETE cancels it)"""
+    if request.method == 'DELETE':
+        payload, status = stream_cancel_payload(session_id)
+    else:
+        payload, status = stream_chunk_payload(session_id, request.get_data())
+    return jsonify(payload), status
+
+@app.route('/analyze-speech/stream/<session_id>/end', methods=['POST'])
+def analyze_speech_stream_end(session_id):
+    """Finish a streaming session; the body may carry the last chunk"""
+    payload, status = stream_end_payload(session_id, request.get_data())
+    return analysis_response(payload, status)
+
+@app.errorhandler(413)
+def request_too_large(error):
+    return jsonify({"error": f"Request body exceeds {app.config['MAX_CONTENT_LENGTH']} bytes"}), 413
+
+def catalog_response(status, etag, body):
+    """Flask response for a word catalog lookup; clients revalidate with If-None-Match"""
+    response = Response(body, status=status, mimetype='application/json')
+    if etag:
+        response.headers['ETag'] = etag
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 @app.route('/get-word-list', methods=['GET'])
 def get_word_list():
     """Get available words for practice"""
-    words_by_difficulty = {
-        "easy": ["the", "was", "you", "they", "said", "have", "like", "so", "do", "some"],
-        "medium": ["come", "were", "there", "little", "one", "when", "out", "what", "water", "who"],
-        "hard": ["school", "called", "looked", "asked", "could", "people", "your", "right", "know", "thought"]
-    }
-    
-    return jsonify({
-        "words": words_by_difficulty,
-        "total_words": sum(len(words) for words in words_by_difficulty.values())
-    })
+    return catalog_response(*word_list_response(request.headers.get('If-None-Match')))
+
+@app.route('/words', methods=['GET'])
+def query_words():
+    """Paginated word catalog query: ?difficulty=&phoneme=&prefix=&language=&offset=&limit="""
+    return catalog_response(*words_query_response(request.args, request.headers.get('If-None-Match')))
 
 @app.route('/model-info', methods=['GET'])
 def model_info():
     """Get information about the loaded model"""
-    if speech_analyzer.interpreter:
-        return jsonify({
-            "model_loaded": True,
-            "input_shape": speech_analyzer.input_details[0]['shape'] if speech_analyzer.input_details else None,
-            "output_shape": speech_analyzer.output_details[0]['shape'] if speech_analyzer.output_details else None,
-            "model_path": speech_analyzer.model_path
-        })
-    else:
-        return jsonify({
-            "model_loaded": False,
-            "error": "Model not loaded"
-        })
+    return jsonify(model_info_payload())
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Stage latency histograms and counters in Prometheus text format"""
+    status, content_type, body = metrics_response()
+    return Response(body, status=status, content_type=content_type)
+
+@app.route('/admin/model', methods=['GET'])
+def admin_model():
+    """Active model and reload history"""
+    payload, status = admin_model_payload(request.remote_addr, request.headers.get('X-Admin-Token'))
+    return jsonify(payload), status
+
+@app.route('/admin/reload-model', methods=['POST'])
+def admin_reload_model():
+    """Load the model file again (or ?path=<file in the model directory>) and switch to it once warm"""
+    data = request.get_json(silent=True)
+    params = data if isinstance(data, dict) else request.args
+    payload, status = admin_reload_payload(params, request.remote_addr, request.headers.get('X-Admin-Token'))
+    return jsonify(payload), status
+
+@app.route('/debug/profiler', methods=['GET'])
+@app.route('/debug/profiler/<action>', methods=['POST'])
+def debug_profiler(action='status'):
+    """Sampling profiler control: POST .../start?interval_ms=5&seconds=60, POST .../stop"""
+    payload, status = profiler_payload(action, request.args)
+    return jsonify(payload), status
+
+@app.route('/debug/profiler/stacks', methods=['GET'])
+def debug_profiler_stacks():
+    """Collapsed stacks for flamegraph.pl or speedscope"""
+    status, content_type, body = profile_stacks_response()
+    return Response(body, status=status, content_type=content_type)
 
 if __name__ == '__main__':
     print("🚀 Starting Coral TPU Speech Analysis Server...")
     print("🌐 Frontend URL: http://localhost:3000")
     print("🔌 Backend URL: http://localhost:5000")
     print("📡 Health Check: http://localhost:5000/health")
+    print(f"🧪 Demo mode: {'on (DEMO_MODE=0 serves the model)' if speech_analyzer.demo_mode else 'off'}")
     
     # Run Flask server
     app.run(
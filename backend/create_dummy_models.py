@@ -1,14 +1,26 @@
 # Create a dummy TensorFlow Lite model for testing
+# Writes a float32 reference model and a full-integer int8 model calibrated on
+# MFCC tensors from the server's own preprocessing; the int8 model is compiled
+# with edgetpu_compiler when it is installed.
+# Usage: python create_dummy_models.py [--recordings DIR] [--samples 200]
+import argparse
+import shutil
+import subprocess
 import tensorflow as tf
 import numpy as np
 import os
 
-def create_dummy_speech_model():
-    """Create a simple dummy model for testing the TPU integration"""
-    
-    # Create a simple sequential model
-    model = tf.keras.Sequential([
-        tf.keras.layers.Input(shape=(13, 100, 1)),  # MFCC input: 13 features, 100 time steps
+from audio_decoding import decode_audio
+from benchmark_features import synthetic_clips
+from feature_extraction import MFCCFeatureExtractor
+from voice_activity import VoiceActivityTrimmer
+
+AUDIO_EXTENSIONS = ('.wav', '.webm', '.ogg', '.flac', '.mp3', '.m4a')
+
+def build_speech_model(batch_size=None):
+    """The speech model architecture; batch_size=None leaves the batch dimension dynamic"""
+    return tf.keras.Sequential([
+        tf.keras.layers.Input(shape=(13, 100, 1), batch_size=batch_size),  # MFCC input: 13 features, 100 time steps
         tf.keras.layers.Conv2D(32, (3, 3), activation='relu'),
         tf.keras.layers.MaxPooling2D((2, 2)),
         tf.keras.layers.Conv2D(64, (3, 3), activation='relu'),
@@ -17,6 +29,12 @@ def create_dummy_speech_model():
         tf.keras.layers.Dropout(0.5),
         tf.keras.layers.Dense(1, activation='sigmoid')  # Output: pronunciation quality score
     ])
+
+def create_dummy_speech_model():
+    """Create a simple dummy model for testing the TPU integration"""
+    
+    # Create a simple sequential model
+    model = build_speech_model()
     
     # Compile the model
     model.compile(
@@ -34,37 +52,134 @@ def create_dummy_speech_model():
     
     return model
 
+def representative_features(count=200, recordings=None, seed=0):
+    """(count, 13, 100, 1) model inputs built exactly like the server builds them
+
+    Clips come from a directory of recordings when given (decoded, trimmed
+    and extracted as in CoralTPUSpeechAnalyzer.preprocess_audio), otherwise
+    from synthetic noisy tones.
+    """
+    extractor = MFCCFeatureExtractor(sr=16000, n_mfcc=13, n_fft=512, hop_length=160, target_frames=100)
+    trimmer = VoiceActivityTrimmer(sr=16000)
+
+    if recordings:
+        paths = sorted(os.path.join(root, name) for root, _, files in os.walk(recordings)
+                       for name in files if name.lower().endswith(AUDIO_EXTENSIONS))
+        clips = []
+        for path in paths[:count]:
+            with open(path, 'rb') as f:
+                audio, _, _ = decode_audio(f.read(), target_sr=16000)
+            clips.append(trimmer.trim(audio)[0])
+        if not clips:
+            raise ValueError(f"No recordings found in {recordings}")
+    else:
+        clips = [trimmer.trim(clip)[0] for clip in synthetic_clips(count, 1.5, seed=seed)]
+
+    return extractor.extract(clips)
+
+def representative_dataset(features, batch_size=1):
+    """Calibration generator for the converter: batch_size clips per step"""
+    def generate():
+        for i in range(0, len(features) - batch_size + 1, batch_size):
+            yield [features[i:i + batch_size]]
+    return generate
+
+def save_tflite(tflite_model, output_path):
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    with open(output_path, 'wb') as f:
+        f.write(tflite_model)
+    print(f"📊 Model size: {len(tflite_model) / 1024:.1f} KB")
+
 def convert_to_tflite(model, output_path):
-    """Convert the Keras model to TensorFlow Lite format"""
+    """Convert the Keras model to a float32 TensorFlow Lite model (the accuracy reference)"""
     
     # Convert the model
     converter = tf.lite.TFLiteConverter.from_keras_model(model)
-    
-    # Optimize for Edge TPU (optional)
-    converter.optimizations = [tf.lite.Optimize.DEFAULT]
-    converter.target_spec.supported_types = [tf.float16]
-    
-    # Convert
     tflite_model = converter.convert()
     
     # Save the model
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    with open(output_path, 'wb') as f:
-        f.write(tflite_model)
-    
-    print(f"✅ Dummy TFLite model saved to: {output_path}")
-    print(f"📊 Model size: {len(tflite_model) / 1024:.1f} KB")
+    save_tflite(tflite_model, output_path)
+    print(f"✅ Float TFLite model saved to: {output_path}")
+
+def convert_to_int8_tflite(model, output_path, features, batch_size=1):
+    """Full-integer conversion: int8 weights, activations, input and output
+
+    The Edge TPU only runs int8 ops, so float16 or dynamic-range models fall
+    back to the CPU. Activation ranges are calibrated on features.
+    """
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset(features, batch_size)
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    converter.inference_input_type = tf.int8
+    converter.inference_output_type = tf.int8
+    tflite_model = converter.convert()
+
+    save_tflite(tflite_model, output_path)
+    print(f"✅ Int8 TFLite model saved to: {output_path}")
 
-def create_models_directory():
+def compile_for_edgetpu(model_path, output_path):
+    """Run edgetpu_compiler on an int8 model; returns output_path, or None if the compiler is missing"""
+    compiler = shutil.which('edgetpu_compiler')
+    if compiler is None:
+        return None
+
+    output_dir = os.path.dirname(output_path) or '.'
+    result = subprocess.run([compiler, '--show_operations', '--out_dir', output_dir, model_path],
+                            capture_output=True, text=True)
+    print(result.stdout)
+    if result.returncode != 0:
+        raise RuntimeError(f"edgetpu_compiler failed: {result.stderr.strip()}")
+
+    # The compiler names its output <model>_edgetpu.tflite
+    compiled = os.path.join(output_dir, os.path.splitext(os.path.basename(model_path))[0] + '_edgetpu.tflite')
+    os.replace(compiled, output_path)
+    print(f"✅ Edge TPU model saved to: {output_path}")
+    return output_path
+
+def export_batch_variants(model, models_dir, features, batch_sizes):
+    """Fixed-batch int8 models compiled for the Edge TPU, as speech_model_edgetpu_b<N>.tflite
+
+    Compiled models can't be resized at runtime, so the server picks among
+    these variants to run a micro-batch in few invokes. CPU interpreters
+    resize the dynamic-batch model instead and don't need them.
+    """
+    for batch_size in batch_sizes:
+        fixed = build_speech_model(batch_size)
+        fixed.set_weights(model.get_weights())
+        int8_path = os.path.join(models_dir, f"speech_model_int8_b{batch_size}.tflite")
+        convert_to_int8_tflite(fixed, int8_path, features, batch_size)
+        try:
+            compile_for_edgetpu(int8_path, os.path.join(models_dir, f"speech_model_edgetpu_b{batch_size}.tflite"))
+        except RuntimeError as e:
+            print(f"⚠️  Batch {batch_size} variant not compiled: {e}")
+
+def create_models_directory(models_dir="models", recordings=None, samples=200, batch_sizes=(4, 8)):
     """Create the models directory and dummy models"""
     
-    models_dir = "models"
     os.makedirs(models_dir, exist_ok=True)
     
     # Create dummy speech recognition model
     print("🤖 Creating dummy speech recognition model...")
     speech_model = create_dummy_speech_model()
-    convert_to_tflite(speech_model, os.path.join(models_dir, "speech_model_edgetpu.tflite"))
+    convert_to_tflite(speech_model, os.path.join(models_dir, "speech_model_float.tflite"))
+
+    print(f"🎚️  Calibrating int8 quantization on {samples} {'recorded' if recordings else 'synthetic'} clips...")
+    features = representative_features(samples, recordings)
+    int8_path = os.path.join(models_dir, "speech_model_int8.tflite")
+    convert_to_int8_tflite(speech_model, int8_path, features)
+
+    # The server loads speech_model_edgetpu.tflite; without the compiler the
+    # int8 model goes there (it runs on the CPU interpreter as well)
+    edgetpu_path = os.path.join(models_dir, "speech_model_edgetpu.tflite")
+    if compile_for_edgetpu(int8_path, edgetpu_path) is None:
+        shutil.copyfile(int8_path, edgetpu_path)
+        print("⚠️  edgetpu_compiler not found; copied the int8 model to "
+              f"{edgetpu_path} (compile it on a machine with the Edge TPU compiler)")
+        print("📦 CPU interpreters resize its dynamic batch dimension; no batch variants needed")
+    elif batch_sizes:
+        print(f"📦 Exporting Edge TPU batch variants {list(batch_sizes)}...")
+        export_batch_variants(speech_model, models_dir, features, batch_sizes)
     
     # Create a simple README for the models
     with open(os.path.join(models_dir, "README.md"), "w") as f:
@@ -73,10 +188,21 @@ def create_models_directory():
 ## Current Models
 
 ### speech_model_edgetpu.tflite
-- **Purpose**: Dummy speech recognition model for testing
-- **Input**: MFCC features (13, 100, 1)
-- **Output**: Pronunciation quality score (0-1)
+- **Purpose**: Dummy speech recognition model for testing (loaded by the server)
+- **Input**: MFCC features (13, 100, 1), int8 (the server quantizes float features)
+- **Output**: Pronunciation quality score (0-1), int8 (the server dequantizes it)
 - **Note**: This is a dummy model for testing. Replace with a real trained model for production.
+- Compiled with edgetpu_compiler when available, otherwise a copy of speech_model_int8.tflite
+
+### speech_model_edgetpu_b<N>.tflite
+- Fixed-batch Edge TPU variants (only written when edgetpu_compiler is installed); the server splits micro-batches across them
+
+### speech_model_int8.tflite
+- Full-integer model calibrated on MFCC tensors from the server's preprocessing
+- Dynamic batch dimension: CPU interpreters are resized to each micro-batch size at load time
+
+### speech_model_float.tflite
+- Float32 reference; compare with `python benchmark_quantization.py`
 
 ## Real Model Training
 
@@ -85,7 +211,7 @@ To create a real speech recognition model:
 1. **Data Collection**: Record audio samples with correct pronunciations
 2. **Feature Extraction**: Convert audio to MFCC features
 3. **Model Training**: Train a CNN/RNN model for speech analysis
-4. **Edge TPU Compilation**: Use Google's Edge TPU Compiler
+4. **Edge TPU Compilation**: Quantize to int8 with a representative dataset, then use Google's Edge TPU Compiler
 5. **Model Replacement**: Replace the dummy model with your trained model
 
 ## Model Requirements
@@ -93,14 +219,22 @@ To create a real speech recognition model:
 - **Input Format**: MFCC features (13 coefficients, 100 time steps, 1 channel)
 - **Output Format**: Single float value (0.0 to 1.0) representing pronunciation quality
 - **File Format**: TensorFlow Lite (.tflite)
-- **Edge TPU**: Optional compilation for faster inference
+- **Edge TPU**: Full-integer int8 quantization, then compilation for faster inference
 """)
     
     print(f"📁 Models directory created at: {models_dir}")
     print(f"📖 See {models_dir}/README.md for more information")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create dummy float and int8 speech models")
+    parser.add_argument('--recordings', help="Directory of recordings for int8 calibration (default: synthetic clips)")
+    parser.add_argument('--samples', type=int, default=200, help="Calibration clips")
+    parser.add_argument('--output-dir', default="models")
+    parser.add_argument('--batch-sizes', default="4,8", help="Edge TPU batch variants to export (empty for none)")
+    args = parser.parse_args()
+
     print("🛠️  Setting up dummy AI models for testing...")
-    create_models_directory()
+    create_models_directory(args.output_dir, args.recordings, args.samples,
+                            [int(size) for size in args.batch_sizes.split(',') if size])
     print("✅ Setup complete! You can now test the application.")
     print("⚠️  Remember: These are dummy models. For production, use real trained models.")
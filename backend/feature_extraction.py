@@ -0,0 +1,284 @@
+# Vectorized MFCC feature extraction for the speech model
+# Builds the (N, 13, 100, 1) float32 model input for N clips in one pass,
+# matching librosa.feature.mfcc(y, sr=16000, n_mfcc=13, n_fft=512, hop_length=160)
+# followed by the per-clip normalization, padding and reshape used by the server.
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def hz_to_mel(frequencies):
+    """Convert Hz to mels (Slaney formula, same as librosa's default)"""
+    frequencies = np.asanyarray(frequencies, dtype=np.float64)
+    f_sp = 200.0 / 3
+    mels = frequencies / f_sp
+
+    min_log_hz = 1000.0
+    min_log_mel = min_log_hz / f_sp
+    logstep = np.log(6.4) / 27.0
+
+    log_region = frequencies >= min_log_hz
+    mels = np.where(log_region, min_log_mel + np.log(np.maximum(frequencies, min_log_hz) / min_log_hz) / logstep, mels)
+    return mels
+
+
+def mel_to_hz(mels):
+    """Convert mels back to Hz (Slaney formula)"""
+    mels = np.asanyarray(mels, dtype=np.float64)
+    f_sp = 200.0 / 3
+    freqs = f_sp * mels
+
+    min_log_hz = 1000.0
+    min_log_mel = min_log_hz / f_sp
+    logstep = np.log(6.4) / 27.0
+
+    log_region = mels >= min_log_mel
+    freqs = np.where(log_region, min_log_hz * np.exp(logstep * (mels - min_log_mel)), freqs)
+    return freqs
+
+
+def mel_filterbank(sr, n_fft, n_mels=128, fmin=0.0, fmax=None):
+    """Slaney-normalized triangular mel filterbank, shape (n_mels, 1 + n_fft // 2)"""
+    fmax = sr / 2.0 if fmax is None else fmax
+
+    fft_freqs = np.linspace(0, sr / 2.0, 1 + n_fft // 2)
+    mel_freqs = mel_to_hz(np.linspace(hz_to_mel(fmin), hz_to_mel(fmax), n_mels + 2))
+
+    fdiff = np.diff(mel_freqs)
+    ramps = mel_freqs[:, None] - fft_freqs[None, :]
+
+    lower = -ramps[:-2] / fdiff[:-1, None]
+    upper = ramps[2:] / fdiff[1:, None]
+    weights = np.maximum(0, np.minimum(lower, upper))
+
+    # Slaney-style area normalization
+    enorm = 2.0 / (mel_freqs[2:n_mels + 2] - mel_freqs[:n_mels])
+    return weights * enorm[:, None]
+
+
+def dct_matrix(n_out, n_in):
+    """Orthonormal DCT-II basis, shape (n_out, n_in)"""
+    n = np.arange(n_in)
+    k = np.arange(n_out)[:, None]
+    basis = np.cos(np.pi * k * (2 * n + 1) / (2.0 * n_in)) * np.sqrt(2.0 / n_in)
+    basis[0] *= np.sqrt(0.5)
+    return basis
+
+
+class MFCCFeatureExtractor:
+    def __init__(self, sr=16000, n_mfcc=13, n_fft=512, hop_length=160, n_mels=128,
+                 target_frames=100, top_db=80.0):
+        """Precompute the window, mel filterbank and DCT matrix once"""
+        self.sr = sr
+        self.n_mfcc = n_mfcc
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.n_mels = n_mels
+        self.target_frames = target_frames
+        self.top_db = top_db
+
+        # Periodic Hann window (librosa's default 'hann' with fftbins=True)
+        self.window = 0.5 - 0.5 * np.cos(2 * np.pi * np.arange(n_fft) / n_fft)
+        # (n_freqs, n_mels) so a frame-major power spectrum can be multiplied directly
+        self.mel_basis_t = np.ascontiguousarray(mel_filterbank(sr, n_fft, n_mels).T, dtype=np.float32)
+        # (n_mels, n_mfcc)
+        self.dct_basis_t = np.ascontiguousarray(dct_matrix(n_mfcc, n_mels).T, dtype=np.float32)
+
+    @property
+    def output_shape(self):
+        return (self.n_mfcc, self.target_frames, 1)
+
+    def allocate(self, batch_size):
+        """Allocate an output buffer for batch_size clips"""
+        return np.zeros((batch_size,) + self.output_shape, dtype=np.float32)
+
+    def n_frames(self, n_samples):
+        """Number of centered STFT frames librosa produces for n_samples"""
+        return 1 + n_samples // self.hop_length
+
+    def frame_audio(self, clips):
+        """Stack the centered, windowed STFT frames of every clip into one matrix"""
+        pad = self.n_fft // 2
+        counts = [self.n_frames(len(clip)) for clip in clips]
+        frames = np.empty((sum(counts), self.n_fft), dtype=np.float64)
+
+        row = 0
+        for clip, count in zip(clips, counts):
+            padded = np.zeros(len(clip) + 2 * pad, dtype=np.float64)
+            padded[pad:pad + len(clip)] = clip
+            frames[row:row + count] = sliding_window_view(padded, self.n_fft)[::self.hop_length][:count]
+            row += count
+
+        frames *= self.window
+        return frames, counts
+
+    def mel_db(self, frames):
+        """Power mel spectrogram in dB for frame-major windowed frames"""
+        power = np.abs(np.fft.rfft(frames, n=self.n_fft, axis=1)).astype(np.float32)
+        power *= power
+        mel = power @ self.mel_basis_t
+        np.maximum(mel, 1e-10, out=mel)
+        np.log10(mel, out=mel)
+        mel *= 10.0
+        return mel
+
+    def mfcc_from_mel_db(self, mel_db, counts):
+        """Apply per-clip top_db clipping and the DCT; returns frame-major MFCCs"""
+        offsets = np.cumsum([0] + counts[:-1])
+        if self.top_db is not None:
+            clip_max = np.maximum.reduceat(mel_db.max(axis=1), offsets)
+            floor = np.repeat(clip_max - self.top_db, counts)
+            mel_db = np.maximum(mel_db, floor[:, None])
+        return mel_db @ self.dct_basis_t
+
+    def normalize_into(self, mfcc, counts, out):
+        """Per-clip global mean/std normalization, truncate/zero-pad into out"""
+        offsets = np.cumsum([0] + counts[:-1])
+        sizes = np.asarray(counts, dtype=np.float64) * self.n_mfcc
+        means = np.add.reduceat(mfcc.sum(axis=1, dtype=np.float64), offsets) / sizes
+        sq_means = np.add.reduceat(np.square(mfcc, dtype=np.float64).sum(axis=1), offsets) / sizes
+        stds = np.sqrt(np.maximum(sq_means - means ** 2, 0.0))
+        stds[stds == 0] = 1.0
+
+        out.fill(0.0)
+        for i, (offset, count) in enumerate(zip(offsets, counts)):
+            keep = min(count, self.target_frames)
+            clip_mfcc = mfcc[offset:offset + keep]
+            out[i, :, :keep, 0] = ((clip_mfcc - means[i]) / stds[i]).T
+        return out
+
+    def extract(self, clips, out=None):
+        """Build the (N, 13, 100, 1) float32 model input for one or N clips
+
+        clips may be a single 1-D array or a list of 1-D arrays (any lengths).
+        If out is given it must have shape (N, 13, 100, 1) and is filled in place.
+        """
+        if isinstance(clips, np.ndarray) and clips.ndim == 1:
+            clips = [clips]
+
+        if out is None:
+            out = self.allocate(len(clips))
+        elif out.shape != (len(clips),) + self.output_shape:
+            raise ValueError(f"Output buffer shape {out.shape} does not match {len(clips)} clips")
+
+        frames, counts = self.frame_audio(clips)
+        mfcc = self.mfcc_from_mel_db(self.mel_db(frames), counts)
+        return self.normalize_into(mfcc, counts, out)
+
+
+class StreamingFeatureExtractor:
+    def __init__(self, extractor, expected_seconds=3.0):
+        """Incremental MFCC over audio that arrives in chunks
+
+        Samples go into a sliding buffer that only keeps what the next STFT
+        frame still needs; every completed frame is turned into a mel dB row
+        right away. finish() only flushes the last frames and applies top_db,
+        the DCT and normalization, giving the same output as extractor.extract()
+        on the whole clip.
+        """
+        self.extractor = extractor
+        n_fft, hop = extractor.n_fft, extractor.hop_length
+        # Centered framing: the stream starts with n_fft // 2 zeros
+        self._buffer = np.zeros(4 * n_fft, dtype=np.float64)
+        self._filled = n_fft // 2
+        self._base = 0  # position of _buffer[0] in the padded stream
+        self._next_frame = 0
+
+        self._mel = np.empty((extractor.n_frames(int(expected_seconds * extractor.sr)), extractor.n_mels),
+                             dtype=np.float32)
+        self.frames = 0
+        self.samples = 0
+        self._sum_squares = 0.0
+        self.finished = False
+
+    @property
+    def duration(self):
+        return self.samples / self.extractor.sr
+
+    @property
+    def rms(self):
+        return float(np.sqrt(self._sum_squares / self.samples)) if self.samples else 0.0
+
+    def append(self, audio):
+        """Add mono float32 samples and compute every frame they complete"""
+        if self.finished:
+            raise RuntimeError("Stream already finished")
+        if len(audio) == 0:
+            return 0
+        self.samples += len(audio)
+        self._sum_squares += float(np.square(audio, dtype=np.float64).sum())
+        self._write(audio)
+        return self._emit_frames()
+
+    def _write(self, audio):
+        # Drop samples no pending frame needs, then grow only if still short
+        keep_from = self._next_frame * self.extractor.hop_length - self._base
+        if keep_from > 0:
+            remaining = self._filled - keep_from
+            self._buffer[:remaining] = self._buffer[keep_from:self._filled]
+            self._filled = remaining
+            self._base += keep_from
+
+        needed = self._filled + len(audio)
+        if needed > len(self._buffer):
+            grown = np.zeros(max(needed, 2 * len(self._buffer)), dtype=np.float64)
+            grown[:self._filled] = self._buffer[:self._filled]
+            self._buffer = grown
+
+        self._buffer[self._filled:needed] = audio
+        self._filled = needed
+
+    def _emit_frames(self, limit=None):
+        n_fft, hop = self.extractor.n_fft, self.extractor.hop_length
+        end = self._base + self._filled
+        if end < n_fft:
+            return 0
+        last = (end - n_fft) // hop
+        if limit is not None:
+            last = min(last, limit - 1)
+        count = last + 1 - self._next_frame
+        if count <= 0:
+            return 0
+
+        start = self._next_frame * hop - self._base
+        window = self._buffer[start:start + (count - 1) * hop + n_fft]
+        frames = sliding_window_view(window, n_fft)[::hop] * self.extractor.window
+        mel = self.extractor.mel_db(frames)
+
+        if self.frames + count > len(self._mel):
+            grown = np.empty((max(self.frames + count, 2 * len(self._mel)), self.extractor.n_mels), dtype=np.float32)
+            grown[:self.frames] = self._mel[:self.frames]
+            self._mel = grown
+        self._mel[self.frames:self.frames + count] = mel
+        self.frames += count
+        self._next_frame += count
+        return count
+
+    def finish(self, out=None):
+        """Flush the trailing frames and build the (1, 13, 100, 1) model input"""
+        if not self.finished:
+            # Trailing center padding, then exactly the frames librosa would produce
+            self._write(np.zeros(self.extractor.n_fft // 2, dtype=np.float64))
+            self._emit_frames(limit=self.extractor.n_frames(self.samples))
+            self.finished = True
+
+        if out is None:
+            out = self.extractor.allocate(1)
+        counts = [self.frames]
+        mfcc = self.extractor.mfcc_from_mel_db(self._mel[:self.frames], counts)
+        return self.extractor.normalize_into(mfcc, counts, out)
+
+
+def librosa_features(audio, sr=16000, target_frames=100):
+    """Reference per-clip librosa implementation (the original request path)"""
+    import librosa
+
+    mfcc = librosa.feature.mfcc(y=audio, sr=sr, n_mfcc=13, n_fft=512, hop_length=160)
+    mfcc_normalized = (mfcc - np.mean(mfcc)) / np.std(mfcc)
+
+    if mfcc_normalized.shape[1] < target_frames:
+        mfcc_padded = np.pad(mfcc_normalized, ((0, 0), (0, target_frames - mfcc_normalized.shape[1])), mode='constant')
+    else:
+        mfcc_padded = mfcc_normalized[:, :target_frames]
+
+    return mfcc_padded.reshape(1, 13, target_frames, 1).astype(np.float32)
@@ -0,0 +1,187 @@
+# Process pool for audio decode + MFCC extraction
+# Decoding and feature extraction hold the GIL for most of their runtime, so
+# with threads only one core does speech analysis. Here the encoded audio is
+# placed in a shared memory block, a worker process decodes it and computes
+# the features, and only the small (1, 13, 100, 1) tensor comes back.
+
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from audio_decoding import decode_audio
+from feature_extraction import MFCCFeatureExtractor
+from voice_activity import VoiceActivityTrimmer
+
+# Per-process state, built once by _init_worker
+_extractor = None
+_trimmer = None
+_target_sr = 16000
+
+
+def _init_worker(target_sr, extractor_kwargs, trimmer_kwargs):
+    """Build the feature extractor (and silence trimmer) once per worker process"""
+    global _extractor, _trimmer, _target_sr
+    _target_sr = target_sr
+    _extractor = MFCCFeatureExtractor(sr=target_sr, **extractor_kwargs)
+    if trimmer_kwargs is not None:
+        _trimmer = VoiceActivityTrimmer(sr=target_sr, **trimmer_kwargs)
+
+
+def _features_from_buffer(buffer, audio_format, sample_rate):
+    audio, sr, decode_info = decode_audio(buffer, target_sr=_target_sr,
+                                          audio_format=audio_format, sample_rate=sample_rate)
+    if _trimmer is not None:
+        audio, decode_info["vad"] = _trimmer.trim(audio)
+    input_data = _extractor.extract(audio)
+    audio_stats = {
+        "rms": float(np.sqrt(np.mean(np.square(audio, dtype=np.float64)))) if len(audio) else 0.0,
+        "duration": len(audio) / sr,
+    }
+    return input_data, audio_stats, decode_info
+
+
+def _extract_from_shared_memory(name, size, audio_format, sample_rate):
+    """Worker entry point: decode + features from a shared memory block"""
+    block = shared_memory.SharedMemory(name=name)
+    error = None
+    try:
+        # Every array viewing block.buf is local to this call and released on return
+        result = _features_from_buffer(block.buf[:size], audio_format, sample_rate)
+    except Exception as e:
+        # Re-raised without the traceback, whose frames still reference block.buf
+        error = RuntimeError(f"{type(e).__name__}: {e}")
+
+    block.close()
+    if error is not None:
+        raise error
+    return result
+
+
+def _extract_from_file(path, audio_format, sample_rate):
+    """Worker entry point for offline scoring: read the file, decode + features"""
+    with open(path, 'rb') as f:
+        buffer = f.read()
+    return _features_from_buffer(buffer, audio_format, sample_rate)
+
+
+class FeatureProcessPool:
+    def __init__(self, workers=2, max_tasks_per_worker=500, target_sr=16000, extractor_kwargs=None,
+                 trimmer_kwargs=None):
+        """Configure the pool; worker processes start on first use
+
+        Each worker is replaced after max_tasks_per_worker clips so memory
+        fragmentation or leaks in native decoders can't build up. With
+        trimmer_kwargs, workers crop silence before extracting features.
+        """
+        self.workers = max(1, int(workers))
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.target_sr = target_sr
+        self.extractor_kwargs = extractor_kwargs or {}
+        self.trimmer_kwargs = trimmer_kwargs
+        self._executor = None
+        self._lock = threading.Lock()
+        self.tasks_submitted = 0
+        self.restarts = 0
+
+    def _get_executor(self):
+        executor = self._executor
+        if executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn'),
+                        initializer=_init_worker,
+                        initargs=(self.target_sr, self.extractor_kwargs, self.trimmer_kwargs),
+                        max_tasks_per_child=self.max_tasks_per_worker
+                    )
+                    print(f"🧵 Started {self.workers} feature extraction worker process(es)")
+                executor = self._executor
+        return executor
+
+    def extract(self, audio_bytes, audio_format=None, sample_rate=None, timeout=None):
+        """Decode + extract features in a worker; returns (input_data, audio_stats, decode_info)"""
+        size = len(audio_bytes)
+        block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        try:
+            block.buf[:size] = audio_bytes
+            future = self._get_executor().submit(_extract_from_shared_memory, block.name, size,
+                                                 audio_format, sample_rate)
+            self.tasks_submitted += 1
+            return future.result(timeout)
+        except BrokenProcessPool:
+            # A worker died (e.g. a native decoder crashed): start a fresh pool
+            print("⚠️  Feature worker pool broken, restarting it")
+            self.restart()
+            raise
+        finally:
+            block.close()
+            block.unlink()
+
+    def extract_many(self, clips, timeout=None):
+        """Decode + features of several (audio_bytes, audio_format, sample_rate) clips at once
+
+        Returns one (input_data, audio_stats, decode_info) tuple or Exception per clip, in order.
+        """
+        blocks, futures = [], []
+        try:
+            executor = self._get_executor()
+            for audio_bytes, audio_format, sample_rate in clips:
+                block = shared_memory.SharedMemory(create=True, size=max(len(audio_bytes), 1))
+                blocks.append(block)
+                block.buf[:len(audio_bytes)] = audio_bytes
+                futures.append(executor.submit(_extract_from_shared_memory, block.name, len(audio_bytes),
+                                               audio_format, sample_rate))
+                self.tasks_submitted += 1
+
+            results = []
+            broken = False
+            for future in futures:
+                try:
+                    results.append(future.result(timeout))
+                except BrokenProcessPool as e:
+                    broken = True
+                    results.append(e)
+                except Exception as e:
+                    results.append(e)
+            if broken:
+                print("⚠️  Feature worker pool broken, restarting it")
+                self.restart()
+            return results
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+    def submit_file(self, path, audio_format=None, sample_rate=None):
+        """Queue decode + features of an audio file; the Future yields (input_data, audio_stats, decode_info)"""
+        future = self._get_executor().submit(_extract_from_file, path, audio_format, sample_rate)
+        self.tasks_submitted += 1
+        return future
+
+    def restart(self):
+        """Gracefully replace all workers: in-flight tasks finish on the old pool"""
+        with self._lock:
+            old, self._executor = self._executor, None
+            self.restarts += 1
+        if old is not None:
+            old.shutdown(wait=True)
+
+    def shutdown(self):
+        with self._lock:
+            old, self._executor = self._executor, None
+        if old is not None:
+            old.shutdown(wait=True)
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "started": self._executor is not None,
+            "max_tasks_per_worker": self.max_tasks_per_worker,
+            "tasks_submitted": self.tasks_submitted,
+            "restarts": self.restarts,
+        }
@@ -0,0 +1,74 @@
+# Precomputed feedback, phonetics and tips per (word, accuracy band)
+# The feedback texts only change at a few accuracy thresholds, so each server
+# builds its texts once per word and band (using its own text methods at a
+# representative accuracy) and keeps both the strings and their serialized
+# JSON. Per request only the numeric fields are formatted.
+
+import bisect
+import itertools
+import json
+
+
+class FeedbackCatalog:
+    def __init__(self, boundaries, build_entry, words=(), max_words=10000):
+        """Build the catalog and precompute every band of the given words
+
+        boundaries are the accuracy thresholds the text methods compare
+        against; build_entry(word, accuracy) returns the response fields
+        (in response order) for one word at one accuracy.
+        """
+        self.boundaries = sorted(set(boundaries))
+        self._build_entry = build_entry
+        self.max_entries = max_words * (len(self.boundaries) + 1)
+        self._entries = {}
+        self._fragments = {}
+        self.misses = 0
+
+        for word in itertools.islice(words, max_words):
+            for band in range(len(self.boundaries) + 1):
+                self._compile(word, band)
+
+    def band(self, accuracy):
+        """Index of the accuracy band: every accuracy in a band gets the same texts"""
+        return bisect.bisect_right(self.boundaries, accuracy)
+
+    def representative_accuracy(self, band):
+        """An accuracy inside the band (thresholds are compared with >= and <)"""
+        return float(self.boundaries[band - 1]) if band else float(self.boundaries[0]) - 1.0
+
+    def _compile(self, word, band):
+        key = (word, band)
+        entry = self._build_entry(word, self.representative_accuracy(band))
+        # Tips are shared between responses, so freeze them
+        entry = {name: tuple(value) if isinstance(value, list) else value for name, value in entry.items()}
+        fragment = json.dumps(entry, ensure_ascii=False, separators=(',', ':'))[1:-1]
+
+        if len(self._entries) < self.max_entries:
+            self._entries[key] = entry
+            self._fragments[key] = fragment
+        return entry, fragment
+
+    def entry(self, word, accuracy):
+        """Response fields for word at this accuracy, as a dict"""
+        key = (word, self.band(accuracy))
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            entry = self._compile(*key)[0]
+        return entry
+
+    def fragment(self, word, accuracy):
+        """The same fields as serialized JSON object members (no braces)"""
+        key = (word, self.band(accuracy))
+        fragment = self._fragments.get(key)
+        if fragment is None:
+            self.misses += 1
+            fragment = self._compile(*key)[1]
+        return fragment
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "bands": len(self.boundaries) + 1,
+            "misses": self.misses,
+        }
@@ -6,18 +6,75 @@ No external dependencies required - uses only Python standard library
 
 import json
 import random
-from http.server import HTTPServer, BaseHTTPRequestHandler
+import signal
+import threading
+from http.server import HTTPServer, ThreadingHTTPServer, BaseHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs
 import socketserver
 
+from feedback_catalog import FeedbackCatalog
+from response_encoding import ResponseEncoder
+from word_store import load_word_store
+
+WORDS_BY_DIFFICULTY = {
+    "easy": ["the", "was", "you", "they", "said", "have", "like", "so", "do", "some"],
+    "medium": ["come", "were", "there", "little", "one", "when", "out", "what", "water", "who"],
+    "hard": ["school", "called", "looked", "asked", "could", "people", "your", "right", "know", "thought"]
+}
+
+PHONETIC_MAP = {
+    "the": "/ðə/",
+    "was": "/wɒz/",
+    "said": "/sed/",
+    "school": "/skuːl/",
+    "thought": "/θɔːt/",
+    "come": "/kʌm/",
+    "were": "/wɜːr/",
+    "there": "/ðeər/",
+    "little": "/ˈlɪtəl/",
+    "water": "/ˈwɔːtər/"
+}
+
+# Indexed word catalog ($WORD_CATALOG, or the lists above)
+WORD_STORE = load_word_store(WORDS_BY_DIFFICULTY, PHONETIC_MAP)
+
+# Accuracy thresholds used by generate_ai_feedback, phonetic_breakdown and get_improvement_tips
+FEEDBACK_THRESHOLDS = (60, 70, 80, 90)
+
+# Simulated accuracy range per difficulty
+DEMO_SCORE_RANGES = {
+    "easy": (75, 95),
+    "medium": (65, 85),
+    "hard": (55, 75)
+}
+
+# JSON by default, msgpack / CBOR and gzip when the client's Accept headers ask for them
+RESPONSE_ENCODER = ResponseEncoder()
+
+# Larger request bodies are refused with 413 instead of being read into memory
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+# Serialized demo analysis; the text fields come precompiled from the feedback catalog
+DEMO_ANALYSIS_JSON = ('{"is_correct":%s,"accuracy_score":%r,"confidence":%r,%s,'
+                      '"timing_analysis":{"duration":%r,"pace_rating":"%s"},'
+                      '"audio_quality":"good","processing_method":"demo_mode"}')
+
 class SpeechAnalysisHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps connections open between requests (every response sets Content-Length)
+    protocol_version = 'HTTP/1.1'
+    # Close idle keep-alive connections so they don't pin handler threads
+    timeout = 30
+    # Headers and body go out in separate writes; with Nagle on, the body would
+    # wait for the client's delayed ACK (~40 ms) on a kept-alive connection
+    disable_nagle_algorithm = True
     
     def do_OPTIONS(self):
         """Handle CORS preflight requests"""
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, If-None-Match')
+        self.send_header('Content-Length', '0')
         self.end_headers()
     
     def do_GET(self):
@@ -28,6 +85,8 @@ class SpeechAnalysisHandler(BaseHTTPRequestHandler):
             self.health_check()
         elif parsed_path.path == '/get-word-list':
             self.get_word_list()
+        elif parsed_path.path == '/words':
+            self.query_words(parsed_path.query)
         elif parsed_path.path == '/model-info':
             self.model_info()
         else:
@@ -40,7 +99,33 @@ class SpeechAnalysisHandler(BaseHTTPRequestHandler):
         if parsed_path.path == '/analyze-speech':
             self.analyze_speech()
         else:
-            self.send_error(404, "Endpoint not found")
+            # Drain the body so the next request on this connection parses cleanly
+            if self.read_body() is not None:
+                self.send_error(404, "Endpoint not found")
+
+    def read_body(self):
+        """Read exactly Content-Length bytes of the request body
+
+        Returns None once an error has been sent: 411 for chunked bodies (not
+        supported here), 400 for an invalid Content-Length, 413 when it's too
+        large. The connection is closed then, since the body wasn't read.
+        """
+        if self.headers.get('Transfer-Encoding'):
+            self.close_connection = True
+            self.send_error(411, "Chunked request bodies are not supported, send Content-Length")
+            return None
+        value = self.headers.get('Content-Length') or '0'
+        if not (value.isascii() and value.isdigit()):
+            self.close_connection = True
+            self.send_error(400, "Invalid Content-Length")
+            return None
+        content_length = int(value)
+        if content_length > MAX_BODY_BYTES:
+            self.close_connection = True
+            self.send_error(413, "Request body too large")
+            return None
+        return self.rfile.read(content_length) if content_length else b''
+
     
     def health_check(self):
         """Health check endpoint"""
@@ -54,17 +139,17 @@ class SpeechAnalysisHandler(BaseHTTPRequestHandler):
     
     def get_word_list(self):
         """Get available words for practice"""
-        words_by_difficulty = {
-            "easy": ["the", "was", "you", "they", "said", "have", "like", "so", "do", "some"],
-            "medium": ["come", "were", "there", "little", "one", "when", "out", "what", "water", "who"],
-            "hard": ["school", "called", "looked", "asked", "could", "people", "your", "right", "know", "thought"]
-        }
-        
-        response = {
-            "words": words_by_difficulty,
-            "total_words": sum(len(words) for words in words_by_difficulty.values())
-        }
-        self.send_json_response(response)
+        self.send_catalog_response(*WORD_STORE.word_list_response(self.if_none_match()))
+
+    def query_words(self, query_string):
+        """Paginated word catalog query: ?difficulty=&phoneme=&prefix=&language=&offset=&limit="""
+        params = {name: values[0] for name, values in parse_qs(query_string).items()}
+        try:
+            result = WORD_STORE.query_response(params, self.if_none_match())
+        except ValueError as e:
+            self.send_json_response({"error": str(e)}, status_code=400)
+            return
+        self.send_catalog_response(*result)
     
     def model_info(self):
         """Get information about the model"""
@@ -78,8 +163,9 @@ class SpeechAnalysisHandler(BaseHTTPRequestHandler):
     def analyze_speech(self):
         """Analyze speech pronunciation"""
         try:
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
+            post_data = self.read_body()
+            if post_data is None:
+                return
             data = json.loads(post_data.decode('utf-8'))
             
             # Extract request data
@@ -90,17 +176,16 @@ class SpeechAnalysisHandler(BaseHTTPRequestHandler):
                 self.send_error(400, "Missing target_word")
                 return
             
-            # Demo analysis
-            analysis = self.demo_analysis(target_word, difficulty)
+            # Demo analysis, assembled from precompiled JSON fragments
+            analysis = self.demo_analysis_json(target_word, difficulty)
             
-            response = {
-                "success": True,
-                "analysis": analysis,
-                "word": target_word,
-                "difficulty": difficulty
-            }
+            body = '{"success":true,"analysis":%s,"word":%s,"difficulty":%s}' % (
+                analysis,
+                json.dumps(target_word, ensure_ascii=False),
+                json.dumps(difficulty, ensure_ascii=False)
+            )
             
-            self.send_json_response(response)
+            self.send_json_body(body.encode('utf-8'))
             
         except Exception as e:
             error_response = {
@@ -110,34 +195,22 @@ class SpeechAnalysisHandler(BaseHTTPRequestHandler):
             }
             self.send_json_response(error_response, status_code=500)
     
-    def demo_analysis(self, target_word, difficulty_level="medium"):
-        """Simulate realistic speech analysis"""
+    def demo_analysis_json(self, target_word, difficulty_level="medium"):
+        """Simulated analysis as serialized JSON; only the numbers are formatted per request"""
         
         # Simulate accuracy based on word difficulty
-        difficulty_scores = {
-            "easy": random.uniform(75, 95),
-            "medium": random.uniform(65, 85),
-            "hard": random.uniform(55, 75)
-        }
-        
-        accuracy = difficulty_scores.get(difficulty_level, random.uniform(60, 80))
+        accuracy = random.uniform(*DEMO_SCORE_RANGES.get(difficulty_level, (60, 80)))
         threshold = self.get_threshold_by_difficulty(difficulty_level)
         is_correct = accuracy >= threshold
         
-        return {
-            "is_correct": is_correct,
-            "accuracy_score": round(accuracy, 1),
-            "confidence": round(accuracy / 100, 3),
-            "feedback": self.generate_ai_feedback(accuracy, target_word, difficulty_level),
-            "phonetic_breakdown": self.phonetic_breakdown(target_word, accuracy),
-            "improvement_tips": self.get_improvement_tips(accuracy, target_word),
-            "timing_analysis": {
-                "duration": round(random.uniform(0.8, 2.5), 2),
-                "pace_rating": "good" if random.choice([True, False]) else "too_fast"
-            },
-            "audio_quality": "good",
-            "processing_method": "demo_mode"
-        }
+        return DEMO_ANALYSIS_JSON % (
+            'true' if is_correct else 'false',
+            round(accuracy, 1),
+            round(accuracy / 100, 3),
+            FEEDBACK_CATALOG.fragment(target_word, accuracy),
+            round(random.uniform(0.8, 2.5), 2),
+            "good" if random.choice([True, False]) else "too_fast"
+        )
     
     def get_threshold_by_difficulty(self, difficulty):
         """Get accuracy threshold based on difficulty level"""
@@ -148,7 +221,8 @@ class SpeechAnalysisHandler(BaseHTTPRequestHandler):
         }
         return thresholds.get(difficulty, 75)
     
-    def generate_ai_feedback(self, accuracy, word, difficulty):
+    @staticmethod
+    def generate_ai_feedback(accuracy, word, difficulty):
         """Generate AI-powered feedback"""
         if accuracy >= 90:
             return f"🌟 Perfetto! Hai pronunciato '{word}' in modo eccellente!"
@@ -161,29 +235,18 @@ class SpeechAnalysisHandler(BaseHTTPRequestHandler):
         else:
             return f"🔄 Riprova! Ascolta attentamente '{word}' e pronuncia lentamente."
     
-    def phonetic_breakdown(self, word, accuracy):
+    @staticmethod
+    def phonetic_breakdown(word, accuracy):
         """Provide phonetic analysis"""
-        phonetic_map = {
-            "the": "/ðə/",
-            "was": "/wɒz/",
-            "said": "/sed/",
-            "school": "/skuːl/",
-            "thought": "/θɔːt/",
-            "come": "/kʌm/",
-            "were": "/wɜːr/",
-            "there": "/ðeər/",
-            "little": "/ˈlɪtəl/",
-            "water": "/ˈwɔːtər/"
-        }
-        
-        phonetic = phonetic_map.get(word.lower(), f"/{word}/")
+        phonetic = PHONETIC_MAP.get(word.lower(), f"/{word}/")
         
         if accuracy >= 80:
             return f"Pronuncia fonetica corretta: {phonetic}"
         else:
             return f"Lavora sulla pronuncia: {phonetic} - Ascolta il suono e ripeti lentamente"
     
-    def get_improvement_tips(self, accuracy, word):
+    @staticmethod
+    def get_improvement_tips(accuracy, word):
         """Get personalized improvement tips"""
         tips = []
         
@@ -214,23 +277,62 @@ class SpeechAnalysisHandler(BaseHTTPRequestHandler):
         }
     
     def send_json_response(self, data, status_code=200):
-        """Send JSON response with CORS headers"""
+        """Send a payload with CORS headers, encoded as the client's Accept headers ask (JSON by default)"""
+        body, headers = RESPONSE_ENCODER.payload(data, self.headers.get('Accept'), self.headers.get('Accept-Encoding'))
+        self.send_body(body, status_code, headers)
+
+    def send_catalog_response(self, status_code, etag, body):
+        """Send a word catalog response; clients revalidate with If-None-Match"""
+        self.send_json_body(body, status_code, {'ETag': etag, 'Cache-Control': 'no-cache'})
+
+    def send_json_body(self, body, status_code=200, extra_headers=None):
+        """Send an already serialized JSON body (re-encoded / compressed if the client asks)"""
+        extra_headers = extra_headers or {}
+        body, headers = RESPONSE_ENCODER.serialized(body, self.headers.get('Accept'),
+                                                    self.headers.get('Accept-Encoding'), key=extra_headers.get('ETag'))
+        self.send_body(body, status_code, dict(extra_headers, **headers))
+
+    def if_none_match(self):
+        """If-None-Match compared against the word catalog's ETags (see ResponseEncoder.if_none_match)"""
+        return RESPONSE_ENCODER.if_none_match(self.headers.get('If-None-Match'), self.headers.get('Accept'),
+                                              self.headers.get('Accept-Encoding'))
+
+    def send_body(self, body, status_code, headers):
+        """Send an encoded body with its Content-Type / Content-Encoding headers and CORS headers"""
         self.send_response(status_code)
-        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, If-None-Match')
+        for name, value in headers.items():
+            self.send_header(name, value)
         self.end_headers()
-        
-        json_data = json.dumps(data, ensure_ascii=False, indent=2)
-        self.wfile.write(json_data.encode('utf-8'))
+        self.wfile.write(body)
 
     def log_message(self, format, *args):
         """Custom log message format"""
         print(f"🌐 {self.address_string()} - {format % args}")
 
-def run_server(port=5000):
-    """Run the HTTP server"""
+def demo_feedback_entry(word, accuracy):
+    """Text fields of one demo analysis, compiled into the feedback catalog"""
+    return {
+        "feedback": SpeechAnalysisHandler.generate_ai_feedback(accuracy, word, None),
+        "phonetic_breakdown": SpeechAnalysisHandler.phonetic_breakdown(word, accuracy),
+        "improvement_tips": SpeechAnalysisHandler.get_improvement_tips(accuracy, word)
+    }
+
+# Feedback texts for every practice word, compiled once per accuracy band
+FEEDBACK_CATALOG = FeedbackCatalog(
+    FEEDBACK_THRESHOLDS, demo_feedback_entry,
+    words=WORD_STORE.words()
+)
+
+def run_server(port=5000, threaded=True):
+    """Run the HTTP server
+
+    With threaded=True every connection gets its own thread, so a slow or
+    idle keep-alive client doesn't block everyone else.
+    """
     server_address = ('', port)
     
     print("🚀 Starting Simple HTTP Speech Analysis Server...")
@@ -238,17 +340,36 @@ def run_server(port=5000):
     print("📡 Available endpoints:")
     print(f"   • GET  /health")
     print(f"   • GET  /get-word-list") 
+    print(f"   • GET  /words?difficulty=&phoneme=&prefix=&offset=&limit=")
     print(f"   • GET  /model-info")
     print(f"   • POST /analyze-speech")
+    print(f"🧵 Mode: {'threaded' if threaded else 'single-threaded'}, HTTP/1.1 keep-alive")
     print("✨ Demo mode active - no dependencies required!")
     print("🎯 Ready for phonics practice!")
     
+    server_class = ThreadingHTTPServer if threaded else HTTPServer
+    httpd = server_class(server_address, SpeechAnalysisHandler)
+    # Handler threads must not keep the process alive after shutdown
+    httpd.daemon_threads = True
+
+    # serve_forever() runs in a background thread: shutdown() blocks until the
+    # serving loop exits, so it must be called from a different thread.
+    serve_thread = threading.Thread(target=httpd.serve_forever, name="http-server")
+    serve_thread.start()
+
+    stop_requested = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_requested.set())
+
     try:
-        httpd = HTTPServer(server_address, SpeechAnalysisHandler)
-        httpd.serve_forever()
+        while not stop_requested.wait(0.5):
+            pass
     except KeyboardInterrupt:
-        print("\n🛑 Server stopped by user")
-        httpd.shutdown()
+        pass
+
+    print("\n🛑 Server stopped by user")
+    httpd.shutdown()
+    serve_thread.join()
+    httpd.server_close()
 
 if __name__ == '__main__':
     run_server()
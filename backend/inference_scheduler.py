@@ -0,0 +1,166 @@
+# Micro-batching scheduler for Coral TPU / TensorFlow Lite inference
+# Collects concurrent /analyze-speech requests into a single batched invoke()
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class MicroBatchScheduler:
+    def __init__(self, run_batch, max_batch_size=8, max_wait_ms=5.0, num_workers=1, name="inference"):
+        """Initialize the scheduler
+
+        run_batch receives a float32 array of shape [N, 13, 100, 1] and must
+        return an array whose first dimension is N (one output row per input row).
+        With num_workers > 1 several batches run at once (one per interpreter).
+        """
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+
+        self._queue = queue.SimpleQueue()
+        self._closed = False
+
+        self._stats_lock = threading.Lock()
+        self.batches_run = 0
+        self.rows_run = 0
+        self.largest_batch = 0
+
+        self._workers = [
+            threading.Thread(target=self._run, name=f"{name}-batcher-{i}", daemon=True)
+            for i in range(max(1, int(num_workers)))
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, input_data, timeout=None):
+        """Queue an input tensor and block until its output rows are ready"""
+        return self.submit_async(input_data).result(timeout)
+
+    def submit_async(self, input_data):
+        """Queue an input tensor and return a Future with its output rows"""
+        if self._closed:
+            raise RuntimeError(f"Scheduler '{self.name}' is closed")
+
+        future = Future()
+        self._queue.put((input_data, future))
+        return future
+
+    def close(self, timeout=None):
+        """Stop accepting work, finish queued requests and stop the worker"""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join(timeout)
+
+    def stats(self):
+        """Scheduler counters for /model-info"""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+            "workers": len(self._workers),
+            "queue_depth": self._queue.qsize(),
+            "batches_run": self.batches_run,
+            "rows_run": self.rows_run,
+            "average_batch_size": round(self.rows_run / self.batches_run, 2) if self.batches_run else 0.0,
+            "largest_batch": self.largest_batch,
+        }
+
+    def _collect(self):
+        """Block for the first request, then gather more until full or timed out"""
+        first = self._queue.get()
+        if first is None:
+            return [], True
+
+        batch = [first]
+        rows = first[0].shape[0]
+        deadline = time.perf_counter() + self.max_wait
+        stop = False
+
+        while rows < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0:
+                    item = self._queue.get(timeout=remaining)
+                else:
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if item is None:
+                stop = True
+                break
+
+            batch.append(item)
+            rows += item[0].shape[0]
+
+        return batch, stop
+
+    def _run(self):
+        """Worker loop: collect a micro-batch, run it, fan results back out"""
+        # Staging arrays owned by this worker, reused for every batch of a given size
+        staging = {}
+
+        while True:
+            batch, stop = self._collect()
+            if batch:
+                self._dispatch(batch, staging)
+            if stop:
+                break
+
+        # Drain anything that raced in before close() took effect
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Another worker's stop signal: put it back for them
+                self._queue.put(None)
+                break
+            self._dispatch([item], staging)
+
+    def _dispatch(self, batch, staging):
+        """Run one batched inference and resolve every waiting Future"""
+        live = [(input_data, future) for input_data, future in batch if future.set_running_or_notify_cancel()]
+        if not live:
+            return
+        inputs = [input_data for input_data, _ in live]
+        futures = [future for _, future in live]
+
+        try:
+            if len(inputs) == 1:
+                input_batch = inputs[0]
+            else:
+                rows = sum(input_data.shape[0] for input_data in inputs)
+                input_batch = staging.get(rows)
+                if input_batch is None:
+                    input_batch = np.empty((rows,) + inputs[0].shape[1:], dtype=inputs[0].dtype)
+                    staging[rows] = input_batch
+                np.concatenate(inputs, axis=0, out=input_batch)
+
+            outputs = self.run_batch(input_batch)
+
+            start = 0
+            for input_data, future in zip(inputs, futures):
+                rows = input_data.shape[0]
+                future.set_result(outputs[start:start + rows])
+                start += rows
+
+            with self._stats_lock:
+                self.batches_run += 1
+                self.rows_run += input_batch.shape[0]
+                self.largest_batch = max(self.largest_batch, input_batch.shape[0])
+
+        except Exception as e:
+            print(f"❌ Error in batched inference: {e}")
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
@@ -0,0 +1,423 @@
+# Pool of TensorFlow Lite interpreters, one per Edge TPU device or CPU worker
+# TFLite interpreters are not thread-safe, so each one is owned by a single
+# thread at a time: a worker checks a slot out, invokes it, and returns it.
+# Callers always pass float32 features and get float32 scores back: for
+# full-integer (int8/uint8) models the slot quantizes the input and
+# dequantizes the output with the tensors' scale and zero point.
+# A slot may hold several fixed-batch variants of the model (resized at load
+# time, or separate <model>_b<N>.tflite files for Edge TPU models, whose
+# shapes are fixed at compile time); each batch is split across the variants
+# that run it fastest according to the latencies measured during warm-up.
+
+import collections
+import glob
+import os
+import re
+import statistics
+import threading
+import time
+
+import numpy as np
+
+
+class ModelVariant:
+    def __init__(self, interpreter):
+        """One allocated interpreter with a fixed batch size, plus its throughput counters"""
+        self.interpreter = interpreter
+        self.input_details = interpreter.get_input_details()
+        self.output_details = interpreter.get_output_details()
+        self.batch_size = int(self.input_details[0]['shape'][0])
+        # Variants exported as separate files are calibrated separately
+        self.input_quantization = InterpreterSlot.quantization(self.input_details[0])
+        self.output_quantization = InterpreterSlot.quantization(self.output_details[0])
+        # Steady-state ms per invoke, measured by InterpreterSlot.warm_up()
+        self.cost_ms = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.invocations = 0
+        self.rows = 0
+        self.padded_rows = 0
+        self.busy_seconds = 0.0
+
+    def stats(self):
+        return {
+            "invocations": self.invocations,
+            "rows": self.rows,
+            "padded_rows": self.padded_rows,
+            "ms_per_invoke": round(self.busy_seconds * 1000 / self.invocations, 3) if self.invocations else None,
+            "clips_per_sec": round(self.rows / self.busy_seconds, 1) if self.busy_seconds else None,
+            "warmup_ms": self.cost_ms,
+        }
+
+
+class InterpreterSlot:
+    def __init__(self, interpreter, device, delegate, variants=()):
+        """Wrap one allocated interpreter (and optional larger-batch variants) with per-device counters"""
+        self.interpreter = interpreter
+        self.device = device
+        self.delegate = delegate
+        self.input_details = interpreter.get_input_details()
+        self.output_details = interpreter.get_output_details()
+
+        self.variants = {}
+        for variant in [ModelVariant(interpreter)] + [ModelVariant(other) for other in variants]:
+            self.variants.setdefault(variant.batch_size, variant)
+        self.batch_sizes = sorted(self.variants)
+        self.input_quantization = self.variants[min(self.batch_sizes)].input_quantization
+        self.output_quantization = self.variants[min(self.batch_sizes)].output_quantization
+        # Batch size -> list of variant batch sizes to run it with
+        self._plans = {}
+
+        # Arrays reused across calls, one per shape
+        self._output_buffers = {}
+        self._input_buffers = {}
+        self._padded_inputs = {}
+
+        # Counters are only written by the thread that holds the slot
+        self.in_flight = 0
+        self.invocations = 0
+        self.rows = 0
+        self.busy_seconds = 0.0
+        self.created_at = time.perf_counter()
+
+    @staticmethod
+    def quantization(details):
+        """(scale, zero_point, dtype) of an integer tensor, None for float tensors"""
+        scale, zero_point = details.get('quantization', (0.0, 0))
+        if not scale or not np.issubdtype(details['dtype'], np.integer):
+            return None
+        return float(scale), int(zero_point), np.dtype(details['dtype'])
+
+    def plan(self, batch_size):
+        """Variant batch sizes that run batch_size clips at the lowest estimated cost
+
+        The last variant may be larger than the clips left (they are padded)
+        when one padded invoke is cheaper than several small ones. Until
+        warm-up has measured the variants, cost is assumed proportional to
+        batch size, which never pads and prefers fewer invokes.
+        """
+        plan = self._plans.get(batch_size)
+        if plan is not None:
+            return plan
+
+        # best[n] = (cost, invokes, first variant) for n clips
+        best = [(0.0, 0, None)]
+        for remaining in range(1, batch_size + 1):
+            options = []
+            for size in self.batch_sizes:
+                variant = self.variants[size]
+                cost = variant.cost_ms if variant.cost_ms is not None else float(size)
+                rest = best[max(remaining - size, 0)]
+                options.append((cost + rest[0], rest[1] + 1, size))
+            best.append(min(options))
+
+        plan = []
+        remaining = batch_size
+        while remaining > 0:
+            size = best[remaining][2]
+            plan.append(size)
+            remaining -= size
+        self._plans[batch_size] = plan
+        return plan
+
+    def invoke(self, input_batch):
+        """Run [N, 13, 100, 1] features and return the N output rows
+
+        The returned array is reused by the next call on this slot, so callers
+        must copy out what they keep before returning the slot to the pool.
+        """
+        self.in_flight = input_batch.shape[0]
+        start = time.perf_counter()
+        try:
+            return self._invoke(input_batch)
+        finally:
+            self.busy_seconds += time.perf_counter() - start
+            self.invocations += 1
+            self.rows += input_batch.shape[0]
+            self.in_flight = 0
+
+    def _invoke(self, input_batch):
+        batch_size = input_batch.shape[0]
+        output = self._output_buffers.get(batch_size)
+        if output is None:
+            shape = (batch_size,) + tuple(self.output_details[0]['shape'][1:])
+            dtype = np.float32 if self.output_quantization else self.output_details[0]['dtype']
+            output = np.empty(shape, dtype=dtype)
+            self._output_buffers[batch_size] = output
+
+        offset = 0
+        for size in self.plan(batch_size):
+            rows = min(size, batch_size - offset)
+            self._run(self.variants[size], input_batch[offset:offset + rows], output[offset:offset + rows])
+            offset += rows
+        return output
+
+    def _run(self, variant, input_rows, output_rows):
+        """One invoke of a variant; input_rows may be fewer than its batch size (zero-padded)"""
+        rows = input_rows.shape[0]
+        if rows < variant.batch_size:
+            padded = self._padded_inputs.get(variant.batch_size)
+            if padded is None:
+                padded = np.zeros((variant.batch_size,) + input_rows.shape[1:], dtype=np.float32)
+                self._padded_inputs[variant.batch_size] = padded
+            padded[:rows] = input_rows
+            padded[rows:] = 0.0
+            input_rows = padded
+
+        start = time.perf_counter()
+        # set_tensor copies into the interpreter's own buffer (no allocation)
+        variant.interpreter.set_tensor(variant.input_details[0]['index'],
+                                       self._quantize_input(input_rows, variant.input_quantization))
+        variant.interpreter.invoke()
+        # tensor() is a view of the interpreter's memory; copy it out and drop it
+        np.copyto(output_rows, variant.interpreter.tensor(variant.output_details[0]['index'])()[:rows],
+                  casting='unsafe')
+        if variant.output_quantization:
+            scale, zero_point, _ = variant.output_quantization
+            output_rows -= zero_point
+            output_rows *= scale
+
+        variant.busy_seconds += time.perf_counter() - start
+        variant.invocations += 1
+        variant.rows += rows
+        variant.padded_rows += variant.batch_size - rows
+
+    def _quantize_input(self, input_batch, quantization):
+        """round(x / scale) + zero_point, saturated to the input dtype, in reused buffers"""
+        if quantization is None:
+            return input_batch
+        scale, zero_point, dtype = quantization
+        buffers = self._input_buffers.get(input_batch.shape)
+        if buffers is None:
+            buffers = (np.empty(input_batch.shape, dtype=np.float32), np.empty(input_batch.shape, dtype=dtype))
+            self._input_buffers[input_batch.shape] = buffers
+        scratch, quantized = buffers
+
+        np.multiply(input_batch, 1.0 / scale, out=scratch)
+        np.rint(scratch, out=scratch)
+        scratch += zero_point
+        limits = np.iinfo(dtype)
+        np.clip(scratch, limits.min, limits.max, out=scratch)
+        np.copyto(quantized, scratch, casting='unsafe')
+        return quantized
+
+    def warm_up(self, batch_sizes, runs=3):
+        """Run synthetic inferences at each batch size; returns first-call vs steady-state latency
+
+        Every model variant is run on its own first, and its steady-state
+        latency becomes the cost used to plan later batches.
+        """
+        feature_shape = tuple(self.input_details[0]['shape'][1:])
+        rng = np.random.default_rng(0)
+
+        def measure(batch_size, run):
+            # Normalized-MFCC-like input so delegates see realistic value ranges
+            # (float32 even for int8 models; invoke() quantizes it)
+            batch = rng.standard_normal((batch_size,) + feature_shape).astype(np.float32)
+            latencies = []
+            for _ in range(max(1, runs)):
+                start = time.perf_counter()
+                run(batch)
+                latencies.append((time.perf_counter() - start) * 1000)
+            return round(latencies[0], 3), round(statistics.median(latencies[1:]), 3) if len(latencies) > 1 else None
+
+        for size, variant in self.variants.items():
+            output = np.empty((size,) + tuple(self.output_details[0]['shape'][1:]), dtype=np.float32)
+            first_call, steady_state = measure(size, lambda batch: self._run(variant, batch, output))
+            variant.cost_ms = steady_state or first_call
+        self._plans.clear()
+
+        timings = {}
+        for batch_size in batch_sizes:
+            first_call, steady_state = measure(batch_size, self.invoke)
+            timings[batch_size] = {
+                "first_call_ms": first_call,
+                "steady_state_ms": steady_state,
+                "plan": self.plan(batch_size),
+            }
+
+        self.reset_stats()
+        return timings
+
+    def reset_stats(self):
+        """Forget warm-up traffic so utilization reflects real requests"""
+        self.invocations = 0
+        self.rows = 0
+        self.busy_seconds = 0.0
+        self.created_at = time.perf_counter()
+        for variant in self.variants.values():
+            variant.reset_stats()
+
+    def stats(self, now=None):
+        """Per-device queue depth, utilization and throughput per model batch size"""
+        now = now or time.perf_counter()
+        uptime = max(now - self.created_at, 1e-9)
+        return {
+            "device": self.device,
+            "delegate": self.delegate,
+            "input_dtype": np.dtype(self.input_details[0]['dtype']).name,
+            "queue_depth": self.in_flight,
+            "invocations": self.invocations,
+            "rows": self.rows,
+            "utilization": round(min(self.busy_seconds / uptime, 1.0), 4),
+            "batch_sizes": {size: self.variants[size].stats() for size in self.batch_sizes},
+        }
+
+
+class InterpreterPool:
+    def __init__(self, slots):
+        """Initialize the pool from already-allocated slots"""
+        if not slots:
+            raise ValueError("InterpreterPool needs at least one interpreter")
+        self.slots = list(slots)
+        self._idle = collections.deque(self.slots)
+        self._cond = threading.Condition()
+        self._waiting = 0
+
+    @classmethod
+    def create(cls, model_path, cpu_workers=1, max_edgetpu_devices=None, batch_sizes=(1,)):
+        """Build one interpreter per attached Edge TPU, or CPU interpreters as fallback
+
+        Each slot also gets a variant per entry of batch_sizes: from
+        <model>_b<N>.tflite files when they exist, otherwise by resizing the
+        batch dimension (CPU models with a dynamic batch).
+        """
+        import tensorflow as tf
+
+        slots = []
+        for device in cls.list_edgetpu_devices()[:max_edgetpu_devices]:
+            try:
+                def load(path, device=device):
+                    delegate = tf.lite.experimental.load_delegate('libedgetpu.so.1', {'device': device})
+                    return tf.lite.Interpreter(model_path=path, experimental_delegates=[delegate])
+
+                interpreter = load(model_path)
+                interpreter.allocate_tensors()
+                variants = cls.batch_variants(load, model_path, batch_sizes)
+                slots.append(InterpreterSlot(interpreter, device, "edgetpu", variants))
+                print(f"🤖 Coral TPU delegate loaded on {device}")
+            except Exception as e:
+                print(f"⚠️  Could not load TPU delegate on {device}: {e}")
+
+        if not slots:
+            print("📱 Falling back to CPU inference")
+            for worker in range(max(1, cpu_workers)):
+                def load(path):
+                    return tf.lite.Interpreter(model_path=path, num_threads=1)
+
+                interpreter = load(model_path)
+                interpreter.allocate_tensors()
+                variants = cls.batch_variants(load, model_path, batch_sizes)
+                slots.append(InterpreterSlot(interpreter, f"cpu:{worker}", "cpu", variants))
+
+        print(f"📦 Model batch sizes: {slots[0].batch_sizes}")
+        return cls(slots)
+
+    @staticmethod
+    def variant_paths(model_path):
+        """{batch size: path} of the <model>_b<N>.tflite files next to model_path"""
+        stem, extension = os.path.splitext(model_path)
+        pattern = re.compile(re.escape(stem) + r'_b(\d+)' + re.escape(extension) + '$')
+        paths = {}
+        for path in glob.glob(glob.escape(stem) + '_b*' + extension):
+            match = pattern.match(path)
+            if match:
+                paths[int(match.group(1))] = path
+        return paths
+
+    @classmethod
+    def batch_variants(cls, load, model_path, batch_sizes):
+        """Allocated interpreters for the batch sizes > 1 this model can run
+
+        load(path) returns an unallocated interpreter. Exported variant files
+        take precedence; a dynamic-batch model is resized to each batch size.
+        """
+        variants = []
+        paths = cls.variant_paths(model_path)
+        if paths:
+            for size, path in sorted(paths.items()):
+                interpreter = load(path)
+                interpreter.allocate_tensors()
+                variants.append(interpreter)
+            return variants
+
+        for size in sorted(set(batch_sizes) - {1}):
+            interpreter = load(model_path)
+            details = interpreter.get_input_details()[0]
+            if details.get('shape_signature', details['shape'])[0] != -1:
+                break  # fixed batch of 1 (e.g. compiled for the Edge TPU)
+            try:
+                interpreter.resize_tensor_input(details['index'], [size] + list(details['shape'][1:]))
+                interpreter.allocate_tensors()
+            except Exception:
+                break
+            variants.append(interpreter)
+        return variants
+
+    @staticmethod
+    def list_edgetpu_devices():
+        """Device strings (':0', ':1', ...) for every attached Edge TPU"""
+        try:
+            from pycoral.utils import edgetpu
+            return [f":{index}" for index, _ in enumerate(edgetpu.list_edge_tpus())]
+        except Exception:
+            return []
+
+    @property
+    def size(self):
+        return len(self.slots)
+
+    def checkout(self, timeout=None):
+        """Take an idle interpreter; only blocks when every slot is busy"""
+        # Fast path: deque.popleft() is atomic, no lock needed
+        try:
+            return self._idle.popleft()
+        except IndexError:
+            pass
+
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        with self._cond:
+            self._waiting += 1
+            try:
+                while True:
+                    try:
+                        return self._idle.popleft()
+                    except IndexError:
+                        pass
+                    remaining = None if deadline is None else deadline - time.perf_counter()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError("No interpreter available")
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+
+    def checkin(self, slot):
+        """Return a slot to the pool, waking a waiter only if there is one"""
+        self._idle.append(slot)
+        if self._waiting:
+            with self._cond:
+                self._cond.notify()
+
+    def invoke(self, input_batch):
+        """Run a batch on whichever interpreter is free"""
+        slot = self.checkout()
+        try:
+            # Copy out of the slot's reusable output buffer before releasing it
+            return slot.invoke(input_batch).copy()
+        finally:
+            self.checkin(slot)
+
+    def warm_up(self, batch_sizes, runs=3):
+        """Warm every device at every batch size; returns per-device timings"""
+        return {slot.device: slot.warm_up(batch_sizes, runs) for slot in self.slots}
+
+    def stats(self):
+        """Pool-wide and per-device counters for /health and /model-info"""
+        now = time.perf_counter()
+        return {
+            "size": self.size,
+            "idle": len(self._idle),
+            "waiting": self._waiting,
+            "devices": [slot.stats(now) for slot in self.slots],
+        }
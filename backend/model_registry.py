@@ -0,0 +1,226 @@
+# Active model of the analyzer, with hot reload
+# A new model file is loaded and warmed in a background thread while the
+# current one keeps serving. The switch is a single reference swap under a
+# lock: requests that already hold the old model finish on it (its scheduler
+# is closed only once they have all released it), new requests get the new
+# one. Reloads are triggered by an admin call or by polling the model file.
+
+import os
+import threading
+import time
+
+from interpreter_pool import InterpreterPool
+
+
+class LoadedModel:
+    def __init__(self, path, version, pool, scheduler, warmup_stats=None, load_seconds=None):
+        """A loaded, warmed model: interpreter pool, scheduler and identity"""
+        self.path = path
+        self.version = version
+        self.pool = pool
+        self.scheduler = scheduler
+        self.warmup_stats = warmup_stats
+        self.load_seconds = load_seconds
+        self.loaded_at = time.time()
+        self.retired = False
+        self._refs = 0
+        self._lock = threading.Lock()
+        self._idle = threading.Event()
+        self._idle.set()
+
+    @property
+    def in_flight(self):
+        return self._refs
+
+    def acquire(self):
+        with self._lock:
+            self._refs += 1
+            self._idle.clear()
+
+    def release(self):
+        with self._lock:
+            self._refs -= 1
+            if self._refs == 0:
+                self._idle.set()
+
+    def drain(self, timeout=None):
+        """Wait for requests still using this model, then stop its scheduler; False on timeout"""
+        drained = self._idle.wait(timeout)
+        if self.scheduler is not None:
+            self.scheduler.close(timeout)
+        return drained
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "version": self.version,
+            "loaded_at": self.loaded_at,
+            "load_seconds": self.load_seconds,
+            "in_flight": self._refs,
+        }
+
+
+class ModelUse:
+    """Context manager holding a reference to the active model (or None) for one request"""
+    __slots__ = ("registry", "model")
+
+    def __init__(self, registry):
+        self.registry = registry
+        self.model = None
+
+    def __enter__(self):
+        with self.registry._lock:
+            self.model = self.registry._current
+            if self.model is not None:
+                self.model.acquire()
+        return self.model
+
+    def __exit__(self, *exc_info):
+        if self.model is not None:
+            self.model.release()
+        return False
+
+
+class ModelRegistry:
+    def __init__(self, build_model, model_path, on_activate=None, drain_timeout=60.0):
+        """Track the active model
+
+        build_model(path) loads and warms a model and returns a LoadedModel
+        (or raises). on_activate(new, old) runs right after each switch.
+        """
+        self.build_model = build_model
+        self.model_path = model_path
+        self.on_activate = on_activate
+        self.drain_timeout = drain_timeout
+        self._current = None
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self.reloading = None
+        self.reloads = 0
+        self.failures = 0
+        self.last_error = None
+        self.draining = 0
+        self._watcher = None
+        self._watched = None
+        self._stop_watching = threading.Event()
+
+    @property
+    def current(self):
+        return self._current
+
+    def use(self):
+        """with registry.use() as model: ... (the model can't be retired mid-request)"""
+        return ModelUse(self)
+
+    def load(self, path=None):
+        """Load, warm and activate a model in the calling thread; raises on failure"""
+        path = path or self.model_path
+        with self._reload_lock:
+            self.reloading = path
+            # Taken before loading, so a file replaced mid-load is picked up by the watcher
+            signature = self.file_signature(path)
+            try:
+                model = self.build_model(path)
+            except Exception as e:
+                self.failures += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                raise
+            finally:
+                self.reloading = None
+            self.activate(model, signature)
+        return model
+
+    def reload(self, path=None):
+        """Load path (default: the current model path) in the background; False if a reload is running"""
+        if self._reload_lock.locked():
+            return False
+
+        def run():
+            try:
+                model = self.load(path)
+                print(f"🔄 Model {model.version} is now serving ({model.path})")
+            except Exception as e:
+                print(f"❌ Model reload failed, keeping the current model: {e}")
+
+        threading.Thread(target=run, name="model-reload", daemon=True).start()
+        return True
+
+    def activate(self, model, signature=None):
+        """Switch new requests to model and drain the previous one in the background
+
+        signature is the file_signature() the model was loaded from; the
+        watcher then polls that file and only reloads once it changes again.
+        """
+        with self._lock:
+            old, self._current = self._current, model
+            self.model_path = model.path
+            self._watched = signature if signature is not None else self.file_signature(model.path)
+        if old is not None:
+            self.reloads += 1
+            old.retired = True
+            threading.Thread(target=self._drain, args=(old,), name="model-drain", daemon=True).start()
+        if self.on_activate is not None:
+            self.on_activate(model, old)
+
+    def _drain(self, model):
+        self.draining += 1
+        try:
+            if not model.drain(self.drain_timeout):
+                print(f"⚠️  Model {model.version} still had {model.in_flight} request(s) after {self.drain_timeout}s")
+        finally:
+            self.draining -= 1
+
+    def file_signature(self, path=None):
+        """(mtime, size) of the model file and its batch variants; None if the file is missing"""
+        path = path or self.model_path
+        try:
+            paths = [path] + sorted(InterpreterPool.variant_paths(path).values())
+            return tuple((os.stat(p).st_mtime_ns, os.stat(p).st_size) for p in paths)
+        except OSError:
+            return None
+
+    def watch(self, interval=5.0):
+        """Poll the model file and reload when it changes (and has stopped changing)"""
+        if self._watcher is not None:
+            return
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="model-watch", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop_watching.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def _watch(self, interval):
+        if self._watched is None:
+            self._watched = self.file_signature()
+        attempted = None  # a failed reload of the same file isn't retried
+        pending = None
+        while not self._stop_watching.wait(interval):
+            signature = self.file_signature()
+            if signature is None or signature == self._watched or signature == attempted:
+                pending = None
+                continue
+            if signature != pending:
+                # Changed since the last poll: wait until a copy in progress settles
+                pending = signature
+                continue
+            print(f"📁 Model file changed, reloading {self.model_path}")
+            if self.reload():
+                attempted = signature
+            pending = None
+
+    def stats(self):
+        current = self._current
+        return {
+            "active": current.stats() if current else None,
+            "model_path": self.model_path,
+            "reloading": self.reloading,
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "draining": self.draining,
+            "watching": self._watcher is not None,
+        }
@@ -0,0 +1,400 @@
+# Content negotiation for response bodies
+# JSON stays the default; clients sending Accept: application/msgpack or
+# application/cbor get the same payload in a compact binary encoding, and
+# bodies over a size threshold are compressed when Accept-Encoding allows
+# (brotli when the brotli package is installed, else gzip). msgpack and cbor2
+# are used when installed; otherwise small pure-Python encoders produce the
+# same wire format. Pre-serialized JSON bodies (word catalog pages) are
+# re-encoded once per ETag and representation, then served from a cache;
+# each representation gets its own ETag ("<etag>.msgpack+gzip").
+# Standard library only (plus the optional packages above), so the stdlib
+# http_server.py can use it.
+
+import gzip
+import importlib.util
+import json
+import struct
+
+from result_cache import LRUCache
+
+MSGPACK_AVAILABLE = importlib.util.find_spec('msgpack') is not None
+CBOR2_AVAILABLE = importlib.util.find_spec('cbor2') is not None
+BROTLI_AVAILABLE = importlib.util.find_spec('brotli') is not None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+CBOR = "application/cbor"
+
+# Accept values -> the media type we answer with
+MEDIA_TYPES = {
+    JSON: JSON,
+    MSGPACK: MSGPACK,
+    "application/x-msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+    CBOR: CBOR,
+}
+
+# Server preference when the client ranks several equally
+CODINGS = ("br", "gzip") if BROTLI_AVAILABLE else ("gzip",)
+
+VARY = "Accept, Accept-Encoding"
+
+
+def parse_accept(header):
+    """[(value, q)] from an Accept / Accept-Encoding header, in header order"""
+    entries = []
+    for part in (header or "").split(","):
+        value, _, params = part.partition(";")
+        value = value.strip().lower()
+        if not value:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, number = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(number)
+                except ValueError:
+                    q = 0.0
+        entries.append((value, q))
+    return entries
+
+
+def negotiate_media_type(accept):
+    """JSON, MSGPACK or CBOR for an Accept header; JSON unless a binary type is preferred"""
+    best, best_q = JSON, 0.0
+    for value, q in parse_accept(accept):
+        media_type = MEDIA_TYPES.get(value)
+        if media_type is not None and q > best_q:
+            best, best_q = media_type, q
+    return best
+
+
+def negotiate_coding(accept_encoding):
+    """'br', 'gzip' or None (identity) for an Accept-Encoding header"""
+    weights = dict(parse_accept(accept_encoding))
+    best, best_q = None, 0.0
+    for coding in CODINGS:
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def representation_suffix(media_type, coding):
+    """'msgpack+gzip', 'cbor', 'gzip'... naming a representation; '' for identity JSON"""
+    parts = []
+    if media_type in (MSGPACK, CBOR):
+        parts.append(media_type.rsplit("/", 1)[1])
+    if coding:
+        parts.append(coding)
+    return "+".join(parts)
+
+
+def representation_etag(etag, suffix):
+    """The resource's ETag with the representation suffix inside the quotes"""
+    if not suffix or not etag.endswith('"'):
+        return etag
+    return etag[:-1] + "." + suffix + '"'
+
+
+def plain(value):
+    """JSON-compatible stand-in for values the encoders don't know (numpy scalars and arrays, ...)"""
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+
+def pack_msgpack_python(value):
+    """msgpack encoding of JSON-like data without the msgpack package"""
+    out = bytearray()
+    _msgpack(value, out)
+    return bytes(out)
+
+
+def _msgpack(value, out):
+    if value is None:
+        out.append(0xc0)
+    elif value is True:
+        out.append(0xc3)
+    elif value is False:
+        out.append(0xc2)
+    elif isinstance(value, int):
+        if 0 <= value < 0x80:
+            out.append(value)
+        elif -32 <= value < 0:
+            out.append(value & 0xff)
+        elif value >= 0:
+            for limit, marker, fmt in ((0xff, 0xcc, ">B"), (0xffff, 0xcd, ">H"), (0xffffffff, 0xce, ">I"),
+                                       (0xffffffffffffffff, 0xcf, ">Q")):
+                if value <= limit:
+                    out.append(marker)
+                    out += struct.pack(fmt, value)
+                    return
+            raise OverflowError("Integer too large for msgpack")
+        else:
+            for limit, marker, fmt in ((-0x80, 0xd0, ">b"), (-0x8000, 0xd1, ">h"), (-0x80000000, 0xd2, ">i"),
+                                       (-0x8000000000000000, 0xd3, ">q")):
+                if value >= limit:
+                    out.append(marker)
+                    out += struct.pack(fmt, value)
+                    return
+            raise OverflowError("Integer too large for msgpack")
+    elif isinstance(value, float):
+        out.append(0xcb)
+        out += struct.pack(">d", value)
+    elif isinstance(value, str):
+        data = value.encode("utf-8")
+        _msgpack_header(out, len(data), 0xa0, 31, 0xd9, 0xda, 0xdb)
+        out += data
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        data = bytes(value)
+        _msgpack_header(out, len(data), None, 0, 0xc4, 0xc5, 0xc6)
+        out += data
+    elif isinstance(value, (list, tuple)):
+        _msgpack_header(out, len(value), 0x90, 15, None, 0xdc, 0xdd)
+        for item in value:
+            _msgpack(item, out)
+    elif isinstance(value, dict):
+        _msgpack_header(out, len(value), 0x80, 15, None, 0xde, 0xdf)
+        for key, item in value.items():
+            _msgpack(key if isinstance(key, str) else str(key), out)
+            _msgpack(item, out)
+    else:
+        _msgpack(plain(value), out)
+
+
+def _msgpack_header(out, length, fix, fix_max, marker8, marker16, marker32):
+    if fix is not None and length <= fix_max:
+        out.append(fix | length)
+    elif marker8 is not None and length <= 0xff:
+        out.append(marker8)
+        out.append(length)
+    elif length <= 0xffff:
+        out.append(marker16)
+        out += struct.pack(">H", length)
+    else:
+        out.append(marker32)
+        out += struct.pack(">I", length)
+
+
+def pack_cbor_python(value):
+    """CBOR (RFC 8949) encoding of JSON-like data without the cbor2 package"""
+    out = bytearray()
+    _cbor(value, out)
+    return bytes(out)
+
+
+def _cbor(value, out):
+    if value is None:
+        out.append(0xf6)
+    elif value is True:
+        out.append(0xf5)
+    elif value is False:
+        out.append(0xf4)
+    elif isinstance(value, int):
+        if value >= 0:
+            _cbor_header(out, 0, value)
+        else:
+            _cbor_header(out, 1, -1 - value)
+    elif isinstance(value, float):
+        out.append(0xfb)
+        out += struct.pack(">d", value)
+    elif isinstance(value, str):
+        data = value.encode("utf-8")
+        _cbor_header(out, 3, len(data))
+        out += data
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        data = bytes(value)
+        _cbor_header(out, 2, len(data))
+        out += data
+    elif isinstance(value, (list, tuple)):
+        _cbor_header(out, 4, len(value))
+        for item in value:
+            _cbor(item, out)
+    elif isinstance(value, dict):
+        _cbor_header(out, 5, len(value))
+        for key, item in value.items():
+            _cbor(key if isinstance(key, str) else str(key), out)
+            _cbor(item, out)
+    else:
+        _cbor(plain(value), out)
+
+
+def _cbor_header(out, major, argument):
+    major <<= 5
+    if argument < 24:
+        out.append(major | argument)
+    elif argument <= 0xff:
+        out.append(major | 24)
+        out.append(argument)
+    elif argument <= 0xffff:
+        out.append(major | 25)
+        out += struct.pack(">H", argument)
+    elif argument <= 0xffffffff:
+        out.append(major | 26)
+        out += struct.pack(">I", argument)
+    elif argument <= 0xffffffffffffffff:
+        out.append(major | 27)
+        out += struct.pack(">Q", argument)
+    else:
+        raise OverflowError("Integer too large for CBOR")
+
+
+if MSGPACK_AVAILABLE:
+    import msgpack
+
+    def pack_msgpack(value):
+        return msgpack.packb(value, default=plain, use_bin_type=True)
+else:
+    pack_msgpack = pack_msgpack_python
+
+if CBOR2_AVAILABLE:
+    import cbor2
+
+    def pack_cbor(value):
+        return cbor2.dumps(value, default=lambda encoder, value: encoder.encode(plain(value)))
+else:
+    pack_cbor = pack_cbor_python
+
+
+def pack_json(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=plain).encode('utf-8')
+
+
+ENCODERS = {JSON: pack_json, MSGPACK: pack_msgpack, CBOR: pack_cbor}
+
+
+def compress(body, coding):
+    """body compressed with 'br' or 'gzip' (levels picked for speed on small responses)"""
+    if coding == "br":
+        import brotli
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+
+class ResponseEncoder:
+    def __init__(self, compress_min_bytes=1024, cache_entries=256, cache_bytes=8 * 1024 * 1024):
+        """Negotiate and encode response bodies
+
+        Bodies smaller than compress_min_bytes are never compressed (the
+        headers would cost more than the saving).
+        """
+        self.compress_min_bytes = compress_min_bytes
+        self._encoded = LRUCache(cache_entries, cache_bytes, name="encoded_responses")
+        self.responses = {}
+
+    def negotiate(self, accept, accept_encoding):
+        return negotiate_media_type(accept), negotiate_coding(accept_encoding)
+
+    def payload(self, payload, accept=None, accept_encoding=None):
+        """(body, headers) for a payload object; headers include Content-Type"""
+        media_type, coding = self.negotiate(accept, accept_encoding)
+        return self.finish(ENCODERS[media_type](payload), media_type, coding)
+
+    def serialized(self, body, accept=None, accept_encoding=None, key=None, content_type=JSON):
+        """(body, headers) for an already serialized body
+
+        JSON bodies are re-encoded when a binary type is negotiated; other
+        types (already binary, or text) are only compressed and their headers
+        carry no Content-Type. With a key (the body's ETag) the headers carry
+        the representation's ETag and the result is cached per representation.
+        Empty bodies (304) are passed through with the representation's ETag.
+        """
+        media_type, coding = self.negotiate(accept, accept_encoding)
+        if content_type != JSON:
+            media_type = content_type
+        suffix = representation_suffix(media_type, coding)
+        cache_key = (key, media_type, coding) if key is not None and body and suffix else None
+        if cache_key is not None:
+            cached = self._encoded.get(cache_key)
+            if cached is not None:
+                return cached[0], dict(cached[1])
+        if media_type != content_type and body:
+            body = ENCODERS[media_type](json.loads(body))
+        body, headers = self.finish(body, media_type, coding)
+        if content_type != JSON:
+            del headers["Content-Type"]
+        if key is not None:
+            headers["ETag"] = representation_etag(key, suffix)
+        if cache_key is not None:
+            self._encoded.put(cache_key, (body, headers), len(body) + 256)
+        return body, dict(headers)
+
+    def if_none_match(self, if_none_match, accept=None, accept_encoding=None):
+        """If-None-Match in terms of the resource's ETags, for the representation this client gets
+
+        Tags of the negotiated representation lose their suffix; tags naming
+        another representation are dropped, so they never yield a 304.
+        """
+        suffix = representation_suffix(*self.negotiate(accept, accept_encoding))
+        if not if_none_match or not suffix or if_none_match.strip() == "*":
+            return if_none_match
+        ending = "." + suffix + '"'
+        tags = [tag.strip()[:-len(ending)] + '"' for tag in if_none_match.split(",")
+                if tag.strip().endswith(ending)]
+        return ", ".join(tags) or None
+
+    def finish(self, body, media_type, coding):
+        headers = {"Content-Type": media_type, "Vary": VARY}
+        if coding is not None and len(body) >= self.compress_min_bytes:
+            body = compress(body, coding)
+            headers["Content-Encoding"] = coding
+        else:
+            coding = None
+        representation = media_type.rsplit("/", 1)[1] + ("+" + coding if coding else "")
+        self.responses[representation] = self.responses.get(representation, 0) + 1
+        return body, headers
+
+    def stats(self):
+        return {
+            "msgpack": "msgpack" if MSGPACK_AVAILABLE else "python",
+            "cbor": "cbor2" if CBOR2_AVAILABLE else "python",
+            "codings": list(CODINGS),
+            "compress_min_bytes": self.compress_min_bytes,
+            "responses": dict(self.responses),
+            "cache": self._encoded.stats(),
+        }
+
+
+def install_flask(app, encoder):
+    """Negotiate every JSON response of a Flask app
+
+    jsonify() encodes straight to the negotiated type; pre-serialized JSON
+    responses (word catalog) are re-encoded after the fact, and any large
+    enough body is compressed.
+    """
+    from flask import request
+    from flask.json.provider import DefaultJSONProvider
+
+    class NegotiatingJSONProvider(DefaultJSONProvider):
+        def response(self, *args, **kwargs):
+            media_type = negotiate_media_type(request.headers.get('Accept'))
+            if media_type == JSON:
+                return super().response(*args, **kwargs)
+            obj = self._prepare_response_obj(args, kwargs)
+            return app.response_class(ENCODERS[media_type](obj), mimetype=media_type)
+
+    app.json = NegotiatingJSONProvider(app)
+
+    @app.before_request
+    def resource_validators():
+        # Views compare If-None-Match with the resource's ETag, not the representation's
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            validators = encoder.if_none_match(if_none_match, request.headers.get('Accept'),
+                                               request.headers.get('Accept-Encoding'))
+            request.environ['HTTP_IF_NONE_MATCH'] = validators or ''
+
+    @app.after_request
+    def encode_response(response):
+        if response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers:
+            return response
+        original = response.get_data()
+        body, headers = encoder.serialized(
+            original, request.headers.get('Accept'), request.headers.get('Accept-Encoding'),
+            key=response.headers.get('ETag'), content_type=response.mimetype)
+        if body is not original:
+            response.set_data(body)
+        response.headers.update(headers)
+        return response
@@ -0,0 +1,77 @@
+# Content-addressed LRU caches for repeated /analyze-speech payloads
+# Kids retry the same word and the frontend retries failed requests, so the
+# same audio often arrives more than once. Entries are keyed by a fast hash
+# of the audio bytes and evicted by both entry count and total size.
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def audio_fingerprint(audio_bytes):
+    """128-bit BLAKE2b digest of an audio payload (bytes, bytearray, memoryview or C-contiguous array)"""
+    return hashlib.blake2b(memoryview(audio_bytes), digest_size=16).hexdigest()
+
+
+class LRUCache:
+    def __init__(self, max_entries=1024, max_bytes=8 * 1024 * 1024, name="cache"):
+        """Initialize an empty cache bounded by entry count and bytes"""
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the cached value (marking it recently used) or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size):
+        """Insert or replace a value, evicting least recently used entries to fit"""
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous[1]
+
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+
+            while len(self._entries) > self.max_entries or self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Hit/miss/eviction counters for /model-info"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
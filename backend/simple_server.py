@@ -1,39 +1,113 @@
 # Simplified Speech Analysis Server for Phonics Game
 import os
+import atexit
 import json
 import random
-from flask import Flask, request, jsonify
+import threading
+from datetime import datetime, timezone
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-import numpy as np
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from feedback_catalog import FeedbackCatalog
+from response_encoding import ResponseEncoder, install_flask
+from stats_store import StatsStore
+from word_store import load_word_store
 
 app = Flask(__name__)
 CORS(app)  # Allow requests from React frontend
 
+# Request bodies over MAX_UPLOAD_BYTES are refused with 413 before being read
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_BYTES', 16 * 1024 * 1024))
+
+# JSON by default; msgpack / CBOR and gzip when the client's Accept headers ask for them
+RESPONSE_ENCODER = ResponseEncoder()
+install_flask(app, RESPONSE_ENCODER)
+
+WORDS_DB = {
+    "easy": ["cat", "dog", "sun", "run", "fun", "big", "red", "bed"],
+    "medium": ["the", "was", "said", "what", "when", "where", "who"],
+    "hard": ["school", "thought", "through", "enough", "laugh", "caught"]
+}
+
+PHONETIC_MAP = {
+    "the": "/ðə/",
+    "was": "/wɒz/",
+    "said": "/sed/",
+    "school": "/skuːl/",
+    "thought": "/θɔːt/",
+    "where": "/weə/",
+    "what": "/wɒt/",
+    "who": "/huː/",
+    "why": "/waɪ/",
+    "when": "/wen/"
+}
+
+WORD_TIPS = {
+    "the": "Usa la lingua tra i denti per il suono 'th'",
+    "was": "Pronuncia 'woz' con la 'o' aperta",
+    "said": "Non dire 'sayed', ma 'sed'",
+    "school": "Allunga il suono 'oo'",
+    "thought": "Combina 'th' e 'ought'"
+}
+
+# Indexed word catalog ($WORD_CATALOG, or the lists above)
+WORD_STORE = load_word_store(WORDS_DB, PHONETIC_MAP)
+
+# Learner progress, persisted write-behind ($STATS_DB). Opened on first use so
+# only the process serving requests owns it (the debug reloader's watcher
+# process imports this module too, and must not run a second flush thread).
+_stats_store = None
+_stats_store_lock = threading.Lock()
+
+def stats_store():
+    global _stats_store
+    if _stats_store is None:
+        with _stats_store_lock:
+            if _stats_store is None:
+                store = StatsStore(
+                    os.environ.get('STATS_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stats.db')),
+                    flush_interval=float(os.environ.get('STATS_FLUSH_SECONDS', '0.5'))
+                )
+                atexit.register(store.close)
+                _stats_store = store
+    return _stats_store
+
+# Accuracy thresholds used by generate_ai_feedback, phonetic_breakdown and get_improvement_tips
+FEEDBACK_THRESHOLDS = (60, 70, 75, 80, 85)
+
+# Simulated accuracy range per difficulty
+DEMO_SCORE_RANGES = {
+    "easy": (75, 95),
+    "medium": (65, 85),
+    "hard": (55, 75)
+}
+
 class SimplifiedSpeechAnalyzer:
     def __init__(self):
         """Initialize the simplified speech analyzer for demo mode"""
+        # Feedback texts for every practice word, compiled once per accuracy band
+        self.feedback_catalog = FeedbackCatalog(
+            FEEDBACK_THRESHOLDS, self.feedback_entry,
+            words=WORD_STORE.words()
+        )
         print("🎯 Initialized Simplified Speech Analyzer in Demo Mode")
         
     def demo_analysis(self, target_word, difficulty_level="medium"):
         """Simulate speech analysis for demo purposes"""
         # Simulate realistic accuracy based on word difficulty
-        difficulty_scores = {
-            "easy": random.uniform(75, 95),
-            "medium": random.uniform(65, 85), 
-            "hard": random.uniform(55, 75)
-        }
-        
-        accuracy = difficulty_scores.get(difficulty_level, random.uniform(60, 80))
+        accuracy = random.uniform(*DEMO_SCORE_RANGES.get(difficulty_level, (60, 80)))
         threshold = self.get_threshold_by_difficulty(difficulty_level)
         is_correct = accuracy >= threshold
+        feedback = self.feedback_catalog.entry(target_word, accuracy)
         
         return {
             "is_correct": is_correct,
             "accuracy_score": round(accuracy, 1),
             "confidence": round(accuracy / 100, 3),
-            "feedback": self.generate_ai_feedback(accuracy, target_word, difficulty_level),
-            "phonetic_breakdown": self.phonetic_breakdown(target_word, accuracy),
-            "improvement_tips": self.get_improvement_tips(target_word, accuracy),
+            "feedback": feedback["feedback"],
+            "phonetic_breakdown": feedback["phonetic_breakdown"],
+            "improvement_tips": feedback["improvement_tips"],
             "timing_analysis": {
                 "duration": round(random.uniform(0.8, 2.5), 2),
                 "pace_rating": "good" if random.choice([True, False]) else "too_fast"
@@ -51,6 +125,14 @@ class SimplifiedSpeechAnalyzer:
         }
         return thresholds.get(difficulty_level, 75.0)
     
+    def feedback_entry(self, word, accuracy):
+        """Text fields of one analysis, compiled into the feedback catalog"""
+        return {
+            "feedback": self.generate_ai_feedback(accuracy, word, None),
+            "phonetic_breakdown": self.phonetic_breakdown(word, accuracy),
+            "improvement_tips": self.get_improvement_tips(word, accuracy)
+        }
+
     def generate_ai_feedback(self, accuracy, word, difficulty_level):
         """Generate encouraging feedback for children"""
         if accuracy >= 85:
@@ -64,20 +146,7 @@ class SimplifiedSpeechAnalyzer:
     
     def phonetic_breakdown(self, word, accuracy):
         """Provide phonetic analysis of the word"""
-        phonetic_map = {
-            "the": "/ðə/",
-            "was": "/wɒz/",
-            "said": "/sed/",
-            "school": "/skuːl/",
-            "thought": "/θɔːt/",
-            "where": "/weə/",
-            "what": "/wɒt/",
-            "who": "/huː/",
-            "why": "/waɪ/",
-            "when": "/wen/"
-        }
-        
-        phonetic = phonetic_map.get(word.lower(), f"/{word}/")
+        phonetic = PHONETIC_MAP.get(word.lower(), f"/{word}/")
         
         if accuracy >= 80:
             return f"Pronuncia fonetica corretta: {phonetic}"
@@ -86,15 +155,7 @@ class SimplifiedSpeechAnalyzer:
     
     def get_improvement_tips(self, word, accuracy):
         """Provide specific tips for pronunciation improvement"""
-        tips = {
-            "the": "Usa la lingua tra i denti per il suono 'th'",
-            "was": "Pronuncia 'woz' con la 'o' aperta",
-            "said": "Non dire 'sayed', ma 'sed'",
-            "school": "Allunga il suono 'oo'",
-            "thought": "Combina 'th' e 'ought'"
-        }
-        
-        tip = tips.get(word.lower(), f"Ascolta attentamente e ripeti '{word}' lentamente")
+        tip = WORD_TIPS.get(word.lower(), f"Ascolta attentamente e ripeti '{word}' lentamente")
         
         if accuracy < 70:
             return f"💡 Suggerimento: {tip}"
@@ -110,7 +171,7 @@ def health_check():
     return jsonify({
         "status": "healthy",
         "mode": "simplified_demo",
-        "timestamp": str(np.datetime64('now'))
+        "timestamp": datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
     })
 
 @app.route('/analyze-speech', methods=['POST'])
@@ -139,6 +200,8 @@ def analyze_speech():
             "analysis": result
         })
         
+    except RequestEntityTooLarge:
+        raise
     except Exception as e:
         print(f"❌ Error in speech analysis: {e}")
         return jsonify({
@@ -155,26 +218,78 @@ def analyze_speech():
 @app.route('/words/difficulty/<level>', methods=['GET'])
 def get_words_by_difficulty(level):
     """Get words by difficulty level"""
-    words_db = {
-        "easy": ["cat", "dog", "sun", "run", "fun", "big", "red", "bed"],
-        "medium": ["the", "was", "said", "what", "when", "where", "who"],
-        "hard": ["school", "thought", "through", "enough", "laugh", "caught"]
-    }
-    
-    words = words_db.get(level, words_db["medium"])
-    return jsonify({"words": words})
+    return catalog_response(*WORD_STORE.level_response(level, request.headers.get('If-None-Match')))
+
+@app.route('/words', methods=['GET'])
+def query_words():
+    """Paginated word catalog query: ?difficulty=&phoneme=&prefix=&language=&offset=&limit="""
+    try:
+        result = WORD_STORE.query_response(request.args, request.headers.get('If-None-Match'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return catalog_response(*result)
+
+@app.errorhandler(413)
+def request_too_large(error):
+    return jsonify({"error": f"Request body exceeds {app.config['MAX_CONTENT_LENGTH']} bytes"}), 413
+
+def catalog_response(status, etag, body):
+    """Flask response for a word catalog lookup; clients revalidate with If-None-Match"""
+    response = Response(body, status=status, mimetype='application/json')
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 @app.route('/stats/update', methods=['POST'])
 def update_stats():
-    """Update player statistics"""
+    """Record one update or {"updates": [...]}; each is an attempt and/or a finished game of a learner"""
     try:
-        data = request.get_json()
-        # In a real implementation, this would save to a database
-        print(f"📊 Stats update: {data}")
-        return jsonify({"success": True, "message": "Stats updated"})
+        data = request.get_json(silent=True)
+        if not data:
+            return jsonify({"success": False, "error": "No data provided"}), 400
+        updates = data.get('updates', [data]) if isinstance(data, dict) else data
+        if not isinstance(updates, list):
+            return jsonify({"success": False, "error": "'updates' must be a list"}), 400
+        accepted = stats_store().record(updates)
+        return jsonify({"success": True, "message": "Stats updated", "accepted": accepted})
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except TimeoutError as e:
+        return jsonify({"success": False, "error": str(e)}), 503
+    except RequestEntityTooLarge:
+        raise
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
+@app.route('/stats/learners/<learner_id>', methods=['GET'])
+def learner_stats(learner_id):
+    """Totals, streaks and per-word accuracy of a learner"""
+    stats = stats_store().learner(learner_id)
+    if stats is None:
+        return jsonify({"error": f"No stats for learner {learner_id}"}), 404
+    return jsonify(stats)
+
+@app.route('/stats/learners/<learner_id>/words/<word>', methods=['GET'])
+def learner_word_stats(learner_id, word):
+    """A learner's accuracy on one word"""
+    stats = stats_store().learner_word(learner_id, word)
+    if stats is None:
+        return jsonify({"error": f"No stats for '{word}' from learner {learner_id}"}), 404
+    return jsonify(stats)
+
+@app.route('/stats/words/<word>', methods=['GET'])
+def word_stats(word):
+    """Accuracy on a word across all learners"""
+    stats = stats_store().word(word)
+    if stats is None:
+        return jsonify({"error": f"No stats for '{word}'"}), 404
+    return jsonify(stats)
+
+@app.route('/stats/store', methods=['GET'])
+def stats_store_info():
+    """Ingest and flush counters of the stats store"""
+    return jsonify(stats_store().stats())
+
 if __name__ == '__main__':
     print("🚀 Starting Simplified Speech Analysis Server...")
     print("🎯 Running in Demo Mode")
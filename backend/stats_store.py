@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+"""
+Server-side learner statistics behind /stats/update
+Updates are applied to in-memory rollups (per learner, per learner+word and
+per word across all learners) and appended to a write buffer, so ingest is a
+few dict operations under a lock and reads like accuracy-by-word or a
+learner's streak are single lookups. A background thread flushes the buffer
+to SQLite (WAL mode) in one transaction per batch: the raw attempts plus the
+rollup rows that changed since the last flush. A crash loses at most the
+last flush interval of updates.
+Usage: python stats_store.py info stats.db
+       python stats_store.py learner stats.db LEARNER_ID
+       python stats_store.py bench [--updates 200000] [--learners 2000] [--db /tmp/bench_stats.db]
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS attempts (
+    id INTEGER PRIMARY KEY,
+    learner TEXT NOT NULL,
+    word TEXT NOT NULL,
+    correct INTEGER NOT NULL,
+    time_spent REAL,
+    accuracy REAL,
+    ts REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS attempts_learner ON attempts (learner, ts);
+CREATE TABLE IF NOT EXISTS learners (
+    learner TEXT PRIMARY KEY,
+    attempts INTEGER NOT NULL,
+    correct INTEGER NOT NULL,
+    total_time REAL NOT NULL,
+    current_streak INTEGER NOT NULL,
+    best_streak INTEGER NOT NULL,
+    games_played INTEGER NOT NULL,
+    last_played REAL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS learner_words (
+    learner TEXT NOT NULL,
+    word TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    correct INTEGER NOT NULL,
+    total_time REAL NOT NULL,
+    last_played REAL,
+    PRIMARY KEY (learner, word)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS words (
+    word TEXT PRIMARY KEY,
+    attempts INTEGER NOT NULL,
+    correct INTEGER NOT NULL,
+    total_time REAL NOT NULL,
+    last_played REAL
+) WITHOUT ROWID;
+"""
+
+MAX_ID_LENGTH = 128
+
+
+class WordRollup:
+    """Attempts and correct answers for one word (of one learner, or of everyone)"""
+    __slots__ = ("attempts", "correct", "total_time", "last_played")
+
+    def __init__(self, attempts=0, correct=0, total_time=0.0, last_played=None):
+        self.attempts = attempts
+        self.correct = correct
+        self.total_time = total_time
+        self.last_played = last_played
+
+    def add(self, correct, time_spent, ts):
+        self.attempts += 1
+        self.correct += correct
+        self.total_time += time_spent
+        self.last_played = ts
+
+    def row(self):
+        return (self.attempts, self.correct, self.total_time, self.last_played)
+
+    def summary(self):
+        return {
+            "attempts": self.attempts,
+            "correct": self.correct,
+            "accuracy": round(self.correct / self.attempts * 100, 1) if self.attempts else 0.0,
+            "average_time": round(self.total_time / self.attempts, 3) if self.attempts else 0.0,
+            "last_played": self.last_played,
+        }
+
+
+class LearnerRollup(WordRollup):
+    """Totals and streaks for one learner, plus their per-word rollups"""
+    __slots__ = ("current_streak", "best_streak", "games_played", "words")
+
+    def __init__(self, attempts=0, correct=0, total_time=0.0, current_streak=0, best_streak=0,
+                 games_played=0, last_played=None):
+        super().__init__(attempts, correct, total_time, last_played)
+        self.current_streak = current_streak
+        self.best_streak = best_streak
+        self.games_played = games_played
+        self.words = {}
+
+    def add(self, correct, time_spent, ts):
+        super().add(correct, time_spent, ts)
+        self.current_streak = self.current_streak + 1 if correct else 0
+        self.best_streak = max(self.best_streak, self.current_streak)
+
+    def row(self):
+        return (self.attempts, self.correct, self.total_time, self.current_streak,
+                self.best_streak, self.games_played, self.last_played)
+
+    def summary(self):
+        result = super().summary()
+        result.update({
+            "current_streak": self.current_streak,
+            "best_streak": self.best_streak,
+            "games_played": self.games_played,
+            "words_practiced": len(self.words),
+        })
+        return result
+
+
+def parse_update(update):
+    """(learner, word or None, correct, time_spent, accuracy, best_streak, game_completed) from one payload
+
+    An update is an attempt ({"word", "is_correct", "time_spent", "accuracy_score"}),
+    a finished game ({"game_completed": true, "best_streak": n}) or both,
+    always with a "learner_id". Raises ValueError on a malformed update.
+    """
+    if not isinstance(update, dict):
+        raise ValueError("Each update must be an object")
+    learner = str(update.get("learner_id") or "anonymous")
+    word = update.get("word")
+    if len(learner) > MAX_ID_LENGTH or (word is not None and len(str(word)) > MAX_ID_LENGTH):
+        raise ValueError("learner_id and word must be at most 128 characters")
+    game_completed = bool(update.get("game_completed"))
+    if word is None and not game_completed:
+        raise ValueError("An update needs a 'word' (attempt) or 'game_completed'")
+    if word is not None and not isinstance(update.get("is_correct"), bool):
+        raise ValueError("'is_correct' must be true or false")
+    try:
+        time_spent = float(update.get("time_spent") or 0.0)
+        accuracy = update.get("accuracy_score")
+        accuracy = float(accuracy) if accuracy is not None else None
+        best_streak = int(update.get("best_streak") or 0)
+    except (TypeError, ValueError):
+        raise ValueError("'time_spent', 'accuracy_score' and 'best_streak' must be numbers")
+    word = str(word).lower() if word is not None else None
+    return learner, word, bool(update.get("is_correct")), time_spent, accuracy, best_streak, game_completed
+
+
+class StatsStore:
+    def __init__(self, path, flush_interval=0.5, flush_size=5000, max_pending=200000):
+        """Load the rollups from path (created if missing) and start the flush thread
+
+        The buffer is flushed every flush_interval seconds, or as soon as it
+        holds flush_size attempts. Once max_pending attempts are waiting
+        (the disk can't keep up), record() blocks until a flush makes room.
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.max_pending = max_pending
+        self.learners = {}
+        self.words = {}
+        self._pending = []
+        self._dirty_learners = set()
+        self._dirty_learner_words = set()
+        self._dirty_words = set()
+        self._lock = threading.Lock()
+        self._flush_needed = threading.Condition(self._lock)
+        self._room = threading.Condition(self._lock)
+        self._closed = False
+        self.updates = 0
+        self.rejected = 0
+        self.flushes = 0
+        self.flushed_attempts = 0
+        self.flush_errors = 0
+        self.last_flush_ms = None
+        self.max_flush_ms = 0.0
+        self.last_error = None
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Only the flush thread uses the connection after _load()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._load()
+        self._thread = threading.Thread(target=self._run, name="stats-flush", daemon=True)
+        self._thread.start()
+
+    def _load(self):
+        for learner, *row in self._db.execute(
+                "SELECT learner, attempts, correct, total_time, current_streak, best_streak, "
+                "games_played, last_played FROM learners"):
+            self.learners[learner] = LearnerRollup(*row)
+        for learner, word, *row in self._db.execute(
+                "SELECT learner, word, attempts, correct, total_time, last_played FROM learner_words"):
+            rollup = self.learners.get(learner)
+            if rollup is None:
+                rollup = self.learners[learner] = LearnerRollup()
+            rollup.words[word] = WordRollup(*row)
+        for word, *row in self._db.execute("SELECT word, attempts, correct, total_time, last_played FROM words"):
+            self.words[word] = WordRollup(*row)
+        print(f"📊 Stats store {self.path}: {len(self.learners)} learners, {len(self.words)} words")
+
+    def record(self, updates, timeout=5.0):
+        """Apply updates (a list of payloads, see parse_update) and queue them for the next flush
+
+        The whole list is validated first, so a malformed entry rejects
+        the request without applying any of it. Returns the number applied.
+        """
+        parsed = []
+        for update in updates:
+            try:
+                parsed.append(parse_update(update))
+            except ValueError:
+                self.rejected += 1
+                raise
+        now = time.time()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Stats store is closed")
+            if len(self._pending) >= self.max_pending:
+                self._flush_needed.notify()
+                if not self._room.wait_for(lambda: len(self._pending) < self.max_pending, timeout):
+                    raise TimeoutError("Stats store is falling behind, retry later")
+            for learner, word, correct, time_spent, accuracy, best_streak, game_completed in parsed:
+                rollup = self.learners.get(learner)
+                if rollup is None:
+                    rollup = self.learners[learner] = LearnerRollup()
+                if word is not None:
+                    rollup.add(correct, time_spent, now)
+                    word_rollup = rollup.words.get(word)
+                    if word_rollup is None:
+                        word_rollup = rollup.words[word] = WordRollup()
+                    word_rollup.add(correct, time_spent, now)
+                    total = self.words.get(word)
+                    if total is None:
+                        total = self.words[word] = WordRollup()
+                    total.add(correct, time_spent, now)
+                    self._pending.append((learner, word, int(correct), time_spent, accuracy, now))
+                    self._dirty_learner_words.add((learner, word))
+                    self._dirty_words.add(word)
+                if game_completed:
+                    rollup.games_played += 1
+                # The client's own streak counter covers games played before the store existed
+                rollup.best_streak = max(rollup.best_streak, best_streak)
+                self._dirty_learners.add(learner)
+            self.updates += len(parsed)
+            if len(self._pending) >= self.flush_size:
+                self._flush_needed.notify()
+        return len(parsed)
+
+    def learner(self, learner_id):
+        """Totals, streaks and per-word accuracy of one learner, or None"""
+        with self._lock:
+            rollup = self.learners.get(learner_id)
+            if rollup is None:
+                return None
+            result = rollup.summary()
+            result["words"] = {word: word_rollup.summary() for word, word_rollup in rollup.words.items()}
+        result["learner_id"] = learner_id
+        return result
+
+    def learner_word(self, learner_id, word):
+        """One learner's accuracy on one word, or None"""
+        with self._lock:
+            rollup = self.learners.get(learner_id)
+            word_rollup = rollup.words.get(word.lower()) if rollup is not None else None
+            return word_rollup.summary() if word_rollup is not None else None
+
+    def word(self, word):
+        """Accuracy on a word across all learners, or None"""
+        with self._lock:
+            rollup = self.words.get(word.lower())
+            return rollup.summary() if rollup is not None else None
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._closed and len(self._pending) < self.flush_size:
+                    self._flush_needed.wait(self.flush_interval)
+                closed = self._closed
+            self.flush()
+            if closed:
+                return
+
+    def flush(self):
+        """Write buffered attempts and changed rollups in one transaction; returns attempts written"""
+        with self._lock:
+            if not (self._pending or self._dirty_learners):
+                return 0
+            pending, self._pending = self._pending, []
+            learner_rows = [(learner,) + self.learners[learner].row() for learner in self._dirty_learners]
+            learner_word_rows = [(learner, word) + self.learners[learner].words[word].row()
+                                 for learner, word in self._dirty_learner_words]
+            word_rows = [(word,) + self.words[word].row() for word in self._dirty_words]
+            self._dirty_learners.clear()
+            self._dirty_learner_words.clear()
+            self._dirty_words.clear()
+            self._room.notify_all()
+
+        start = time.perf_counter()
+        try:
+            with self._db:
+                self._db.executemany(
+                    "INSERT INTO attempts (learner, word, correct, time_spent, accuracy, ts) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", pending)
+                self._db.executemany("INSERT OR REPLACE INTO learners VALUES (?, ?, ?, ?, ?, ?, ?, ?)", learner_rows)
+                self._db.executemany("INSERT OR REPLACE INTO learner_words VALUES (?, ?, ?, ?, ?, ?)",
+                                     learner_word_rows)
+                self._db.executemany("INSERT OR REPLACE INTO words VALUES (?, ?, ?, ?, ?)", word_rows)
+        except sqlite3.Error as e:
+            # Keep the batch: rollup rows are absolute values, so writing them again later is safe
+            self.flush_errors += 1
+            self.last_error = f"{type(e).__name__}: {e}"
+            print(f"❌ Stats flush failed ({len(pending)} attempts kept for retry): {e}")
+            with self._lock:
+                self._pending[:0] = pending
+                self._dirty_learners.update(row[0] for row in learner_rows)
+                self._dirty_learner_words.update(row[:2] for row in learner_word_rows)
+                self._dirty_words.update(row[0] for row in word_rows)
+            return 0
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.flushes += 1
+        self.flushed_attempts += len(pending)
+        self.last_flush_ms = round(elapsed_ms, 3)
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        return len(pending)
+
+    def close(self):
+        """Flush everything still buffered and stop the flush thread"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._flush_needed.notify()
+        self._thread.join()
+        self._db.close()
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "learners": len(self.learners),
+            "words": len(self.words),
+            "updates": self.updates,
+            "rejected": self.rejected,
+            "pending": len(self._pending),
+            "flushes": self.flushes,
+            "flushed_attempts": self.flushed_attempts,
+            "flush_errors": self.flush_errors,
+            "last_flush_ms": self.last_flush_ms,
+            "max_flush_ms": round(self.max_flush_ms, 3),
+            "last_error": self.last_error,
+        }
+
+
+def benchmark(path, updates, learners, batch_size, threads):
+    """Ingest synthetic attempts from several threads and report throughput and flush latency"""
+    if os.path.exists(path):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    words = [f"word{i}" for i in range(300)]
+    store = StatsStore(path)
+    per_thread = updates // threads
+
+    def client(seed):
+        rng = random.Random(seed)
+        for _ in range(per_thread // batch_size):
+            store.record([{
+                "learner_id": f"learner{rng.randrange(learners)}",
+                "word": rng.choice(words),
+                "is_correct": rng.random() < 0.7,
+                "time_spent": rng.uniform(1, 6),
+            } for _ in range(batch_size)])
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=client, args=(seed,)) for seed in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    ingest_seconds = time.perf_counter() - start
+    store.close()
+    total_seconds = time.perf_counter() - start
+
+    stats = store.stats()
+    lookup_start = time.perf_counter()
+    reopened = StatsStore(path)
+    for i in range(10000):
+        reopened.learner_word(f"learner{i % learners}", words[i % len(words)])
+    lookup_us = (time.perf_counter() - lookup_start) / 10000 * 1e6
+    consistent = sum(r.attempts for r in reopened.learners.values()) == stats["updates"]
+    reopened.close()
+    return {
+        "updates": stats["updates"],
+        "ingest_per_second": round(stats["updates"] / ingest_seconds),
+        "durable_per_second": round(stats["updates"] / total_seconds),
+        "flushes": stats["flushes"],
+        "average_batch": round(stats["flushed_attempts"] / max(stats["flushes"], 1)),
+        "max_flush_ms": stats["max_flush_ms"],
+        "reload_and_lookup_us": round(lookup_us, 2),
+        "rollups_match_after_reload": consistent,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    info = commands.add_parser("info", help="Show store statistics")
+    info.add_argument("db")
+
+    learner = commands.add_parser("learner", help="Show one learner's rollups")
+    learner.add_argument("db")
+    learner.add_argument("learner_id")
+
+    bench = commands.add_parser("bench", help="Measure ingest throughput and flush latency")
+    bench.add_argument("--db", default="/tmp/bench_stats.db")
+    bench.add_argument("--updates", type=int, default=200000)
+    bench.add_argument("--learners", type=int, default=2000)
+    bench.add_argument("--batch-size", type=int, default=1, help="Updates per record() call")
+    bench.add_argument("--threads", type=int, default=8)
+
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        print(json.dumps(benchmark(args.db, args.updates, args.learners, args.batch_size, args.threads), indent=2))
+        return
+
+    store = StatsStore(args.db)
+    try:
+        if args.command == "info":
+            print(json.dumps(store.stats(), indent=2))
+        else:
+            print(json.dumps(store.learner(args.learner_id), indent=2, ensure_ascii=False))
+    finally:
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+# Streaming pronunciation analysis sessions
+# The client opens a session, sends audio chunks while it records, and ends
+# the session when speech stops. Decode, framing and the mel spectrogram run
+# as each chunk arrives, so ending a session only flushes the last frames,
+# normalizes the MFCCs and runs one inference.
+
+import secrets
+import threading
+import time
+
+from audio_decoding import StreamingAudioDecoder
+from feature_extraction import StreamingFeatureExtractor
+
+
+class StreamingSession:
+    def __init__(self, session_id, target_word, difficulty, decoder, features):
+        """State of one in-progress recording"""
+        self.session_id = session_id
+        self.target_word = target_word
+        self.difficulty = difficulty
+        self.decoder = decoder
+        self.features = features
+        self.chunks = 0
+        self.created_at = time.monotonic()
+        self.last_activity = self.created_at
+        # Chunks of one session are applied in order, one at a time
+        self.lock = threading.Lock()
+
+    def progress(self):
+        return {
+            "session_id": self.session_id,
+            "chunks": self.chunks,
+            "bytes": self.decoder.bytes_received,
+            "frames": self.features.frames,
+            "duration": round(self.features.duration, 3),
+        }
+
+
+class StreamingSessionManager:
+    def __init__(self, analyzer, max_sessions=64, idle_timeout=30.0, max_seconds=30.0):
+        """Track open sessions for one CoralTPUSpeechAnalyzer"""
+        self.analyzer = analyzer
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_seconds = max_seconds
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.expired = 0
+
+    def create(self, target_word, difficulty="medium", audio_format=None, sample_rate=None):
+        """Open a session; raises ValueError for unsupported audio, RuntimeError when full"""
+        decoder = StreamingAudioDecoder(audio_format=audio_format, sample_rate=sample_rate,
+                                        target_sr=self.analyzer.feature_extractor.sr)
+        features = StreamingFeatureExtractor(self.analyzer.feature_extractor)
+
+        with self._lock:
+            self._expire_idle()
+            if len(self._sessions) >= self.max_sessions:
+                raise RuntimeError("Too many streaming sessions in progress")
+            session = StreamingSession(secrets.token_urlsafe(12), target_word, difficulty, decoder, features)
+            self._sessions[session.session_id] = session
+        return session
+
+    def _expire_idle(self):
+        """Drop sessions whose client went away (caller holds _lock)"""
+        cutoff = time.monotonic() - self.idle_timeout
+        for session_id in [sid for sid, session in self._sessions.items() if session.last_activity < cutoff]:
+            del self._sessions[session_id]
+            self.expired += 1
+
+    def get(self, session_id):
+        """The open session, or KeyError"""
+        with self._lock:
+            return self._sessions[session_id]
+
+    def append(self, session_id, chunk):
+        """Decode a chunk and compute the frames it completes"""
+        session = self.get(session_id)
+        with session.lock:
+            self._append(session, chunk)
+            return session.progress()
+
+    def _append(self, session, chunk):
+        session.last_activity = time.monotonic()
+        if not chunk:
+            return
+        session.chunks += 1
+        session.features.append(session.decoder.decode(chunk))
+        if session.features.duration > self.max_seconds:
+            self.cancel(session.session_id)
+            raise ValueError(f"Streams are limited to {self.max_seconds:g} seconds of audio")
+
+    def finish(self, session_id, chunk=None):
+        """Apply the last chunk, close the session and analyze the recording"""
+        session = self.get(session_id)
+        with session.lock:
+            self._append(session, chunk)
+            with self._lock:
+                self._sessions.pop(session_id, None)
+
+            start = time.perf_counter()
+            input_data = session.features.finish()
+            finalize_ms = round((time.perf_counter() - start) * 1000, 3)
+
+        decode_info = dict(session.decoder.info(), rms=session.features.rms, duration=session.features.duration)
+        analysis = self.analyzer.analyze_features(input_data, None, session.features.extractor.sr,
+                                                  session.target_word, session.difficulty, decode_info)
+        analysis["streaming"] = dict(session.progress(), finalize_ms=finalize_ms)
+        self.completed += 1
+        return analysis
+
+    def cancel(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def stats(self):
+        return {
+            "open_sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "completed": self.completed,
+            "expired": self.expired,
+        }
@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+CPU pronunciation scoring against reference recordings of each word
+Reference clips go through the server's own preprocessing (decode, silence
+trimming, normalized MFCC) and are stored as float16 templates, one
+(templates, frames, 13) block per word, in a single file that is
+memory-mapped at startup. An attempt is scored with banded dynamic time
+warping against every template of its word in one vectorized pass; the
+distance to the closest template is turned into a 0-1 confidence relative to
+how far the word's own reference recordings are from each other.
+Reference recordings are named like bulk_score.py inputs: school_01.wav, or
+school/01.wav with --word-from dirname.
+Usage: python template_scoring.py build references/ -o models/word_templates.bin [--max-templates 8]
+       python template_scoring.py info models/word_templates.bin
+       python template_scoring.py score models/word_templates.bin attempt.wav --word school
+       python template_scoring.py bench [--words 300] [--templates 6]
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import statistics
+import struct
+import sys
+import time
+
+import numpy as np
+
+from audio_decoding import decode_audio
+from feature_extraction import MFCCFeatureExtractor
+from voice_activity import VoiceActivityTrimmer
+
+MAGIC = b"TMPL"
+FORMAT_VERSION = 1
+PREAMBLE = struct.Struct("<4sHHI")  # magic, version, reserved, header length
+ALIGNMENT = 16
+
+AUDIO_EXTENSIONS = ('.wav', '.webm', '.ogg', '.flac', '.mp3', '.m4a')
+
+# Sakoe-Chiba band: a template frame may be matched this fraction of the
+# clip length away from the length-scaled diagonal (at least MIN_BAND frames)
+DEFAULT_BAND = 0.15
+MIN_BAND = 3
+
+# Distance used when no word has two references to compare (normalized MFCC frames)
+DEFAULT_REFERENCE_DISTANCE = 1.5
+
+
+def speech_frames(features):
+    """(frames, n_mfcc) float32 view of one (n_mfcc, target_frames[, 1]) model input, zero padding dropped"""
+    features = np.asarray(features, dtype=np.float32).reshape(features.shape[0], -1)
+    nonzero = np.flatnonzero(np.any(features != 0, axis=0))
+    count = nonzero[-1] + 1 if len(nonzero) else 0
+    return np.ascontiguousarray(features[:, :count].T)
+
+
+def banded_dtw(query, templates, lengths, band=DEFAULT_BAND):
+    """Path-length normalized DTW distance from query (n, d) to each of templates (K, L, d)
+
+    Only the first lengths[k] frames of template k are used. Rows are
+    processed one query frame at a time for all templates together; within
+    a row the horizontal dependency is resolved with a cumulative sum and a
+    running minimum, so every step is a handful of whole-array operations.
+    """
+    n = len(query)
+    count, max_length, _ = templates.shape
+    lengths = np.asarray(lengths)
+    if n == 0:
+        return np.full(count, np.inf)
+
+    # Euclidean frame distances, (K, n, L)
+    cost = np.einsum("id,kjd->kij", query, templates, optimize=True)
+    cost *= -2.0
+    cost += np.einsum("id,id->i", query, query)[None, :, None]
+    cost += np.einsum("kjd,kjd->kj", templates, templates)[:, None, :]
+    np.maximum(cost, 0.0, out=cost)
+    np.sqrt(cost, out=cost)
+    cost = cost.astype(np.float64)
+
+    # Band around the diagonal from (0, 0) to (n - 1, length - 1) of each template
+    columns = np.arange(max_length)
+    center = np.arange(n)[None, :] * ((lengths - 1) / max(n - 1, 1))[:, None]
+    radius = np.maximum(np.ceil(band * np.maximum(n, lengths)), MIN_BAND)
+    allowed = np.abs(columns[None, None, :] - center[:, :, None]) <= radius[:, None, None]
+    allowed &= columns[None, None, :] < lengths[:, None, None]
+    cost[~allowed] = 0.0
+
+    # previous[:, 0] is the virtual column before the first template frame
+    previous = np.full((count, max_length + 1), np.inf)
+    previous[:, 0] = 0.0
+    row = np.empty((count, max_length))
+    for i in range(n):
+        # Best way into each cell from the row above (vertical or diagonal step)
+        entry = np.minimum(previous[:, 1:], previous[:, :-1])
+        entry += cost[:, i]
+        entry[~allowed[:, i]] = np.inf
+        # Then any run of horizontal steps: D[j] = S[j] + min over k <= j of (entry[k] - S[k])
+        steps = np.cumsum(cost[:, i], axis=1)
+        entry -= steps
+        np.minimum.accumulate(entry, axis=1, out=row)
+        row += steps
+        row[~allowed[:, i]] = np.inf
+        previous[:, 1:] = row
+        previous[:, 0] = np.inf
+
+    return previous[np.arange(count), lengths] / (n + lengths)
+
+
+def confidence_from_distance(distance, reference_distance):
+    """0-1 score: ~0.88 at the word's typical reference-to-reference distance, 0.5 at twice that"""
+    scale = 0.5 * reference_distance
+    return float(1.0 / (1.0 + np.exp(np.clip((distance - 2.0 * reference_distance) / scale, -50, 50))))
+
+
+def reference_distance(templates, lengths, band=DEFAULT_BAND):
+    """Median distance from each template to its closest other template (None for a single template)"""
+    if len(templates) < 2:
+        return None
+    nearest = []
+    for k in range(len(templates)):
+        others = [j for j in range(len(templates)) if j != k]
+        distances = banded_dtw(templates[k, :lengths[k]], templates[others], lengths[others], band)
+        nearest.append(float(distances.min()))
+    return statistics.median(nearest)
+
+
+class TemplateScorer:
+    def __init__(self, buffer, path=None):
+        """Wrap a compiled template file (bytes or mmap); per-word blocks are zero-copy views"""
+        magic, version, _, header_length = PREAMBLE.unpack_from(buffer, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"Not a version {FORMAT_VERSION} template file: {path or 'buffer'}")
+
+        header = json.loads(bytes(buffer[PREAMBLE.size:PREAMBLE.size + header_length]))
+        if header["byteorder"] != sys.byteorder:
+            raise ValueError("Template file was built on a machine with a different byte order; rebuild it")
+
+        self.path = path
+        self._buffer = buffer
+        self.n_mfcc = header["n_mfcc"]
+        self.band = header["band"]
+        self.reference_distance = header["reference_distance"]
+        self._words = header["words"]
+        self.version = "templates-" + hashlib.blake2b(memoryview(buffer), digest_size=6).hexdigest()
+
+    @classmethod
+    def open(cls, path):
+        """Memory-map a file built with `template_scoring.py build`"""
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(buffer, path=path)
+
+    @classmethod
+    def from_features(cls, features_by_word, **kwargs):
+        """Compile {word: [(frames, n_mfcc) arrays]} in memory (same format as the file)"""
+        return cls(build_templates(features_by_word, **kwargs))
+
+    def __len__(self):
+        return len(self._words)
+
+    def __contains__(self, word):
+        return word.lower() in self._words
+
+    def words(self):
+        return list(self._words)
+
+    def templates(self, word):
+        """(templates, lengths) of a word: a (K, L, n_mfcc) float16 view and K frame counts"""
+        offset, count, frames, lengths, _ = self._words[word.lower()]
+        block = np.frombuffer(self._buffer, dtype=np.float16, count=count * frames * self.n_mfcc, offset=offset)
+        return block.reshape(count, frames, self.n_mfcc), np.asarray(lengths)
+
+    def score(self, features, word):
+        """Confidence (0-1) and match details for one clip's (n_mfcc, frames[, 1]) features"""
+        templates, lengths = self.templates(word)
+        query = speech_frames(features)
+        distances = banded_dtw(query, templates.astype(np.float32), lengths, self.band)
+        best = int(np.argmin(distances))
+        reference = self._words[word.lower()][4] or self.reference_distance
+        distance = float(distances[best])
+        confidence = confidence_from_distance(distance, reference) if np.isfinite(distance) else 0.0
+        return confidence, {
+            "distance": round(distance, 4) if np.isfinite(distance) else None,
+            "reference_distance": round(reference, 4),
+            "templates": len(lengths),
+            "best_template": best,
+        }
+
+    def coverage(self, words):
+        """Catalog words without templates (scored by the model or demo mode instead)"""
+        return [word for word in words if word.lower() not in self._words]
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "version": self.version,
+            "words": len(self._words),
+            "templates": sum(entry[1] for entry in self._words.values()),
+            "bytes": len(self._buffer),
+            "band": self.band,
+            "reference_distance": round(self.reference_distance, 4),
+        }
+
+
+def build_templates(features_by_word, band=DEFAULT_BAND, max_templates=8):
+    """Template file bytes for {word: [(frames, n_mfcc) arrays]}"""
+    blocks, words, n_mfcc = [], {}, None
+    offset = 0
+    for word in sorted(features_by_word):
+        clips = [np.asarray(clip, dtype=np.float32) for clip in features_by_word[word] if len(clip)]
+        clips = clips[:max_templates]
+        if not clips:
+            continue
+        n_mfcc = clips[0].shape[1]
+        frames = max(len(clip) for clip in clips)
+        block = np.zeros((len(clips), frames, n_mfcc), dtype=np.float16)
+        for k, clip in enumerate(clips):
+            block[k, :len(clip)] = clip
+        lengths = [len(clip) for clip in clips]
+        words[word.lower()] = [offset, len(clips), frames, lengths,
+                               reference_distance(block.astype(np.float32), np.asarray(lengths), band)]
+        blocks.append(block)
+        offset += -(-block.nbytes // ALIGNMENT) * ALIGNMENT
+    if not words:
+        raise ValueError("No reference clips to build templates from")
+
+    measured = [entry[4] for entry in words.values() if entry[4] is not None]
+    header = {
+        "byteorder": sys.byteorder,
+        "n_mfcc": n_mfcc,
+        "band": band,
+        "reference_distance": statistics.median(measured) if measured else DEFAULT_REFERENCE_DISTANCE,
+        "words": words,
+    }
+
+    # Offsets in the header are absolute, so they depend on the header's own length
+    data_start = 0
+    while True:
+        for entry, relative in zip(words.values(), np.cumsum([0] + [-(-b.nbytes // ALIGNMENT) * ALIGNMENT
+                                                                     for b in blocks[:-1]])):
+            entry[0] = data_start + int(relative)
+        encoded = json.dumps(header, separators=(",", ":")).encode("utf-8")
+        start = -(-(PREAMBLE.size + len(encoded)) // ALIGNMENT) * ALIGNMENT
+        if start == data_start:
+            break
+        data_start = start
+
+    out = bytearray(PREAMBLE.pack(MAGIC, FORMAT_VERSION, 0, len(encoded)) + encoded)
+    for block in blocks:
+        out += b"\0" * (-len(out) % ALIGNMENT)
+        out += block.tobytes()
+    return bytes(out)
+
+
+def load_template_scorer(path):
+    """The scorer for a template file, or None when it doesn't exist"""
+    if not path or not os.path.exists(path):
+        return None
+    scorer = TemplateScorer.open(path)
+    print(f"📐 Word templates loaded from {path} ({len(scorer)} words)")
+    return scorer
+
+
+def word_from_path(path, word_from):
+    """Word from the file name (up to the first '_' or '-') or the parent directory"""
+    if word_from == 'dirname':
+        return os.path.basename(os.path.dirname(path)).lower()
+    stem = os.path.splitext(os.path.basename(path))[0]
+    for separator in ('_', '-'):
+        stem = stem.split(separator)[0]
+    return stem.lower()
+
+
+def reference_features(directory, word_from='filename'):
+    """{word: [(frames, 13) features]} for a directory of reference recordings, preprocessed like the server"""
+    extractor = MFCCFeatureExtractor(sr=16000, n_mfcc=13, n_fft=512, hop_length=160, target_frames=100)
+    trimmer = VoiceActivityTrimmer(sr=16000)
+    paths = sorted(os.path.join(root, name) for root, _, files in os.walk(directory)
+                   for name in files if name.lower().endswith(AUDIO_EXTENSIONS))
+    features = {}
+    for path in paths:
+        with open(path, 'rb') as f:
+            audio, _, _ = decode_audio(f.read(), target_sr=16000)
+        audio, _ = trimmer.trim(audio)
+        features.setdefault(word_from_path(path, word_from), []).append(speech_frames(extractor.extract(audio)[0]))
+    return features
+
+
+def synthetic_words(words, per_word, seed=0, sr=16000):
+    """{word: [clips]}: each word is a fixed sequence of tones, each clip a stretched, noisy utterance of it"""
+    rng = np.random.default_rng(seed)
+    clips = {}
+    for w in range(words):
+        pitches = rng.uniform(120, 600, size=rng.integers(2, 5))
+        clips[f"word{w}"] = []
+        for _ in range(per_word):
+            segment = int(sr * rng.uniform(0.15, 0.3))
+            t = np.arange(segment) / sr
+            audio = np.concatenate([0.3 * np.sin(2 * np.pi * pitch * rng.uniform(0.97, 1.03) * t)
+                                    for pitch in pitches])
+            clips[f"word{w}"].append((audio + 0.02 * rng.standard_normal(len(audio))).astype(np.float32))
+    return clips
+
+
+def benchmark(words, templates, attempts, band):
+    """Build templates for synthetic words and time scoring of held-out utterances"""
+    extractor = MFCCFeatureExtractor(sr=16000, n_mfcc=13, n_fft=512, hop_length=160, target_frames=100)
+    clips = synthetic_words(words, templates + 1)
+    start = time.perf_counter()
+    scorer = TemplateScorer.from_features(
+        {word: [speech_frames(extractor.extract(clip)[0]) for clip in word_clips[:templates]]
+         for word, word_clips in clips.items()}, band=band)
+    build_seconds = time.perf_counter() - start
+
+    names = list(clips)
+    held_out = {word: extractor.extract(word_clips[-1])[0] for word, word_clips in clips.items()}
+    latencies, same, other = [], [], []
+    for i in range(attempts):
+        word = names[i % len(names)]
+        wrong = names[(i + 1) % len(names)]
+        started = time.perf_counter()
+        confidence, _ = scorer.score(held_out[word], word)
+        latencies.append((time.perf_counter() - started) * 1000)
+        same.append(confidence)
+        other.append(scorer.score(held_out[wrong], word)[0])
+    return {
+        "words": len(scorer),
+        "templates_per_word": templates,
+        "file_kb": round(scorer.stats()["bytes"] / 1024, 1),
+        "build_seconds": round(build_seconds, 3),
+        "latency_ms": {
+            "median": round(statistics.median(latencies), 3),
+            "p95": round(float(np.percentile(latencies, 95)), 3),
+        },
+        "mean_confidence": {"right_word": round(statistics.fmean(same), 3),
+                            "wrong_word": round(statistics.fmean(other), 3)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Build templates from a directory of reference recordings")
+    build.add_argument("references")
+    build.add_argument("-o", "--output", default="models/word_templates.bin")
+    build.add_argument("--word-from", choices=['filename', 'dirname'], default='filename')
+    build.add_argument("--max-templates", type=int, default=8)
+    build.add_argument("--band", type=float, default=DEFAULT_BAND)
+
+    info = commands.add_parser("info", help="Show template file statistics")
+    info.add_argument("templates")
+
+    score = commands.add_parser("score", help="Score one recording against a word's templates")
+    score.add_argument("templates")
+    score.add_argument("recording")
+    score.add_argument("--word", required=True)
+
+    bench = commands.add_parser("bench", help="Time scoring on synthetic words")
+    bench.add_argument("--words", type=int, default=300)
+    bench.add_argument("--templates", type=int, default=6)
+    bench.add_argument("--attempts", type=int, default=500)
+    bench.add_argument("--band", type=float, default=DEFAULT_BAND)
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        data = build_templates(reference_features(args.references, args.word_from),
+                               band=args.band, max_templates=args.max_templates)
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "wb") as f:
+            f.write(data)
+        scorer = TemplateScorer(data, path=args.output)
+        print(f"📐 {len(scorer)} words, {scorer.stats()['templates']} templates, {len(data)} bytes -> {args.output}")
+    elif args.command == "info":
+        scorer = TemplateScorer.open(args.templates)
+        print(json.dumps(dict(scorer.stats(), word_list=scorer.words()), indent=2, ensure_ascii=False))
+    elif args.command == "score":
+        scorer = TemplateScorer.open(args.templates)
+        extractor = MFCCFeatureExtractor(sr=16000, n_mfcc=13, n_fft=512, hop_length=160, target_frames=100)
+        with open(args.recording, 'rb') as f:
+            audio, _, _ = decode_audio(f.read(), target_sr=16000)
+        audio, _ = VoiceActivityTrimmer(sr=16000).trim(audio)
+        confidence, details = scorer.score(extractor.extract(audio)[0], args.word)
+        print(json.dumps(dict(details, confidence=round(confidence, 3)), indent=2))
+    else:
+        print(json.dumps(benchmark(args.words, args.templates, args.attempts, args.band), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+# Voice-activity trimming before feature extraction
+# Recordings often start and end with seconds of silence; the model input is
+# only 100 frames (1 s), so silence both wastes MFCC work and can push the
+# word itself out of the window. The trimmer finds the speech region with
+# webrtcvad when it is installed, or a frame-energy gate otherwise, and
+# returns a view of the audio cropped to it (plus a little padding).
+
+import importlib.util
+
+import numpy as np
+
+WEBRTCVAD_AVAILABLE = importlib.util.find_spec('webrtcvad') is not None
+
+
+class VoiceActivityTrimmer:
+    def __init__(self, sr=16000, frame_ms=30, aggressiveness=2, relative_db=35.0, floor_db=-55.0,
+                 padding_ms=150, use_webrtcvad=None):
+        """Configure the detector
+
+        A frame counts as speech when webrtcvad says so (if available) and
+        its energy is within relative_db of the loudest frame and above
+        floor_db dBFS. padding_ms of audio is kept around the speech region
+        so word onsets and releases aren't clipped.
+        """
+        self.sr = sr
+        self.frame_length = int(sr * frame_ms / 1000)
+        self.relative_db = relative_db
+        self.floor_db = floor_db
+        self.padding = int(sr * padding_ms / 1000)
+
+        if use_webrtcvad is None:
+            use_webrtcvad = WEBRTCVAD_AVAILABLE
+        self.vad = None
+        if use_webrtcvad:
+            # webrtcvad only handles 10/20/30 ms frames at 8/16/32/48 kHz
+            if sr not in (8000, 16000, 32000, 48000) or frame_ms not in (10, 20, 30):
+                raise ValueError("webrtcvad needs 10/20/30 ms frames at 8/16/32/48 kHz")
+            import webrtcvad
+            self.vad = webrtcvad.Vad(aggressiveness)
+        self.method = "webrtcvad" if self.vad is not None else "energy"
+
+    def frame_energy_db(self, audio):
+        """RMS level in dBFS of each complete frame"""
+        n_frames = len(audio) // self.frame_length
+        frames = audio[:n_frames * self.frame_length].reshape(n_frames, self.frame_length)
+        power = np.square(frames, dtype=np.float64).mean(axis=1)
+        return 10.0 * np.log10(np.maximum(power, 1e-12))
+
+    def speech_frames(self, audio):
+        """Boolean speech flag per frame"""
+        energy_db = self.frame_energy_db(audio)
+        if len(energy_db) == 0:
+            return np.zeros(0, dtype=bool)
+        threshold = max(energy_db.max() - self.relative_db, self.floor_db)
+        flags = energy_db >= threshold
+
+        if self.vad is not None:
+            pcm = (np.clip(audio[:len(flags) * self.frame_length], -1.0, 1.0) * 32767).astype('<i2').tobytes()
+            frame_bytes = 2 * self.frame_length
+            for i in np.flatnonzero(flags):
+                flags[i] = self.vad.is_speech(pcm[i * frame_bytes:(i + 1) * frame_bytes], self.sr)
+        return flags
+
+    def trim(self, audio):
+        """Crop to the speech region; returns (audio view, info)
+
+        When no speech is found the audio is returned unchanged and
+        info["speech_detected"] is False.
+        """
+        flags = self.speech_frames(audio)
+        speech = np.flatnonzero(flags)
+        total = len(audio)
+
+        if len(speech) == 0:
+            start, end = 0, total
+        else:
+            start = max(int(speech[0]) * self.frame_length - self.padding, 0)
+            end = min((int(speech[-1]) + 1) * self.frame_length + self.padding, total)
+
+        trimmed = audio[start:end]
+        speech_rms = float(np.sqrt(np.mean(np.square(trimmed, dtype=np.float64)))) if len(trimmed) else 0.0
+        info = {
+            "method": self.method,
+            "speech_detected": bool(len(speech)),
+            "recording_duration": round(total / self.sr, 3),
+            "speech_duration": round(len(speech) * self.frame_length / self.sr, 3),
+            "leading_silence": round(start / self.sr, 3),
+            "trailing_silence": round((total - end) / self.sr, 3),
+            "speech_rms": speech_rms,
+        }
+        return trimmed, info
+
+
+def count_syllables(word):
+    """Rough syllable count: groups of vowels (a silent final 'e' doesn't count)"""
+    word = word.lower()
+    groups = 0
+    previous_vowel = False
+    for char in word:
+        vowel = char in "aeiouy"
+        if vowel and not previous_vowel:
+            groups += 1
+        previous_vowel = vowel
+    if word.endswith("e") and groups > 1 and not word.endswith(("le", "ee")):
+        groups -= 1
+    return max(groups, 1)
+
+
+def pace_rating(speech_duration, word):
+    """'too_fast', 'good' or 'too_slow' for how long the word was spoken"""
+    expected = 0.2 + 0.25 * count_syllables(word)
+    if speech_duration < 0.5 * expected:
+        return "too_fast"
+    if speech_duration > 3.0 * expected:
+        return "too_slow"
+    return "good"
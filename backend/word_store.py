@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+Compact, indexed word catalog for the practice word endpoints
+A curriculum (tens of thousands of words across levels and languages) is
+compiled once into a single binary file that is memory-mapped at startup:
+- words and phonetic transcriptions as UTF-8 blobs with offset arrays,
+  sorted so prefix lookups are a binary search
+- per-word difficulty and language codes (one byte each)
+- difficulty and phoneme indexes as CSR arrays of sorted word ids
+Responses are serialized once per query and carry an ETag so clients can
+revalidate with If-None-Match instead of downloading the list again.
+Usage: python word_store.py build curriculum.json -o words.bin
+       python word_store.py info words.bin
+       python word_store.py query words.bin --difficulty hard --prefix th
+"""
+
+import argparse
+import bisect
+import csv
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+
+from result_cache import LRUCache
+
+MAGIC = b"WRDS"
+FORMAT_VERSION = 1
+PREAMBLE = struct.Struct("<4sHHI")  # magic, version, reserved, header length
+
+# Sections stored after the JSON header, in file order
+SECTIONS = (
+    ("word_offsets", "I"), ("word_blob", "B"),
+    ("phonetic_offsets", "I"), ("phonetic_blob", "B"),
+    ("difficulty", "B"), ("language", "B"), ("input_order", "I"),
+    ("difficulty_indptr", "I"), ("difficulty_ids", "I"),
+    ("phoneme_indptr", "I"), ("phoneme_ids", "I"),
+)
+
+MAX_PAGE_SIZE = 500
+
+# IPA symbol with an optional length mark; stress marks, syllable dots and slashes are skipped
+PHONEME_PATTERN = re.compile(r"[^\s/\[\]ˈˌ.ːˑ]ː?")
+
+
+def phonemes_from_ipa(phonetic):
+    """Split an IPA transcription like /skuːl/ into phonemes ['s', 'k', 'uː', 'l']"""
+    return PHONEME_PATTERN.findall(phonetic or "")
+
+
+def uint32_array(values=()):
+    """array of unsigned 32-bit ints ('I' is 4 bytes on every supported platform)"""
+    values = array("I", values)
+    if values.itemsize != 4:
+        raise RuntimeError("word_store needs a platform with 32-bit unsigned ints")
+    return values
+
+
+class _SortKeys:
+    """Read-only sequence of casefolded words, for bisect"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def __len__(self):
+        return len(self.store)
+
+    def __getitem__(self, word_id):
+        return self.store.word(word_id).casefold()
+
+
+class WordStore:
+    def __init__(self, buffer, path=None):
+        """Wrap a compiled catalog (bytes or mmap); sections are zero-copy views"""
+        magic, version, _, header_length = PREAMBLE.unpack_from(buffer, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"Not a version {FORMAT_VERSION} word catalog: {path or 'buffer'}")
+
+        header = json.loads(bytes(buffer[PREAMBLE.size:PREAMBLE.size + header_length]))
+        if header["byteorder"] != sys.byteorder:
+            raise ValueError("Word catalog was built on a machine with a different byte order; rebuild it")
+
+        self.path = path
+        self._buffer = buffer
+        self.count = header["count"]
+        self.difficulties = header["difficulties"]
+        self.languages = header["languages"]
+        self.phonemes = header["phonemes"]
+        self._difficulty_codes = {name: code for code, name in enumerate(self.difficulties)}
+        self._language_codes = {name: code for code, name in enumerate(self.languages)}
+        self._phoneme_codes = {name: code for code, name in enumerate(self.phonemes)}
+
+        view = memoryview(buffer)
+        for name, typecode in SECTIONS:
+            offset, length = header["sections"][name]
+            setattr(self, "_" + name, view[offset:offset + length].cast(typecode))
+
+        self._sort_keys = _SortKeys(self)
+        self.digest = hashlib.blake2b(view, digest_size=8).hexdigest()
+        self._responses = LRUCache(max_entries=512, max_bytes=8 * 1024 * 1024, name="word_responses")
+
+    @classmethod
+    def open(cls, path):
+        """Memory-map a catalog built with `word_store.py build`"""
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(buffer, path=path)
+
+    @classmethod
+    def from_entries(cls, entries):
+        """Compile entries in memory (same format as the on-disk catalog)"""
+        return cls(build_catalog(entries))
+
+    @classmethod
+    def from_words_by_difficulty(cls, words_by_difficulty, phonetics=None, language="en"):
+        """Catalog for a {level: [words]} dict, with optional {word: IPA} transcriptions"""
+        phonetics = phonetics or {}
+        return cls.from_entries(
+            {"word": word, "difficulty": level, "language": language, "phonetic": phonetics.get(word.lower())}
+            for level, words in words_by_difficulty.items() for word in words
+        )
+
+    def __len__(self):
+        return self.count
+
+    def word(self, word_id):
+        return bytes(self._word_blob[self._word_offsets[word_id]:self._word_offsets[word_id + 1]]).decode("utf-8")
+
+    def phonetic(self, word_id):
+        start, end = self._phonetic_offsets[word_id], self._phonetic_offsets[word_id + 1]
+        return bytes(self._phonetic_blob[start:end]).decode("utf-8") if end > start else None
+
+    def entry(self, word_id):
+        return {
+            "word": self.word(word_id),
+            "difficulty": self.difficulties[self._difficulty[word_id]],
+            "language": self.languages[self._language[word_id]],
+            "phonetic": self.phonetic(word_id),
+        }
+
+    def words(self):
+        """Every word in curriculum order"""
+        return [self.word(word_id) for word_id in self._input_order]
+
+    def words_by_difficulty(self, language=None):
+        """{level: [words]} in curriculum order, like the original hard-coded lists"""
+        grouped = {level: [] for level in self.difficulties}
+        language_code = self._language_codes.get(language) if language else None
+        for word_id in self._input_order:
+            if language_code is None or self._language[word_id] == language_code:
+                grouped[self.difficulties[self._difficulty[word_id]]].append(self.word(word_id))
+        return grouped
+
+    def find_ids(self, difficulty=None, phoneme=None, prefix=None, language=None):
+        """Sorted ids of the words matching every given filter"""
+        lo, hi = 0, self.count
+        if prefix:
+            prefix = prefix.casefold()
+            lo = bisect.bisect_left(self._sort_keys, prefix)
+            hi = bisect.bisect_left(self._sort_keys, prefix + "\U0010ffff", lo)
+
+        # Start from the most selective posting list, clipped to the prefix range
+        postings = []
+        if difficulty is not None:
+            code = self._difficulty_codes.get(difficulty)
+            if code is None:
+                return []
+            postings.append(self._difficulty_ids[self._difficulty_indptr[code]:self._difficulty_indptr[code + 1]])
+        if phoneme is not None:
+            code = self._phoneme_codes.get(phoneme)
+            if code is None:
+                return []
+            postings.append(self._phoneme_ids[self._phoneme_indptr[code]:self._phoneme_indptr[code + 1]])
+
+        if postings:
+            postings.sort(key=len)
+            first = postings[0]
+            candidates = first[bisect.bisect_left(first, lo):bisect.bisect_left(first, hi)]
+        else:
+            candidates = range(lo, hi)
+
+        language_code = None
+        if language is not None:
+            language_code = self._language_codes.get(language)
+            if language_code is None:
+                return []
+
+        ids = []
+        for word_id in candidates:
+            if language_code is not None and self._language[word_id] != language_code:
+                continue
+            if any(not self._contains(posting, word_id) for posting in postings[1:]):
+                continue
+            ids.append(word_id)
+        return ids
+
+    @staticmethod
+    def _contains(posting, word_id):
+        index = bisect.bisect_left(posting, word_id)
+        return index < len(posting) and posting[index] == word_id
+
+    def query(self, difficulty=None, phoneme=None, prefix=None, language=None, offset=0, limit=50):
+        """One page of matching words (alphabetical) plus the total match count"""
+        ids = self.find_ids(difficulty=difficulty, phoneme=phoneme, prefix=prefix, language=language)
+        page = ids[offset:offset + limit]
+        next_offset = offset + len(page)
+        return {
+            "words": [self.entry(word_id) for word_id in page],
+            "total": len(ids),
+            "offset": offset,
+            "limit": limit,
+            "next_offset": next_offset if next_offset < len(ids) else None,
+        }
+
+    def stats(self):
+        return {
+            "words": self.count,
+            "difficulties": self.difficulties,
+            "languages": self.languages,
+            "phonemes": len(self.phonemes),
+            "bytes": len(self._buffer),
+            "source": self.path or "built-in",
+            "digest": self.digest,
+            "response_cache": self._responses.stats(),
+        }
+
+    # HTTP helpers shared by the servers: (status, etag, body bytes)
+
+    def etag(self, key):
+        """Strong ETag for one response: catalog digest + normalized query"""
+        return '"%s-%s"' % (self.digest, hashlib.blake2b(key.encode("utf-8"), digest_size=6).hexdigest())
+
+    def conditional_json(self, key, build, if_none_match=None):
+        """304 with no body if the client's copy is current, else the cached serialized response"""
+        etag = self.etag(key)
+        if if_none_match and etag_matches(if_none_match, etag):
+            return 304, etag, b""
+
+        body = self._responses.get(key)
+        if body is None:
+            body = json.dumps(build(), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            self._responses.put(key, body, len(body))
+        return 200, etag, body
+
+    def word_list_response(self, if_none_match=None):
+        """/get-word-list: every word grouped by difficulty"""
+        def build():
+            words = self.words_by_difficulty()
+            return {"words": words, "total_words": sum(len(level) for level in words.values())}
+        return self.conditional_json("get-word-list", build, if_none_match)
+
+    def level_response(self, level, if_none_match=None):
+        """simple_server /words/difficulty/<level> (unknown levels fall back to medium)"""
+        grouped = self.words_by_difficulty()
+        if level not in grouped:
+            level = "medium" if "medium" in grouped else self.difficulties[0]
+        return self.conditional_json("level:" + level, lambda: {"words": grouped[level]}, if_none_match)
+
+    def query_response(self, params, if_none_match=None):
+        """/words?difficulty=&phoneme=&prefix=&language=&offset=&limit= (raises ValueError on bad paging)"""
+        filters = {name: params.get(name) or None for name in ("difficulty", "phoneme", "prefix", "language")}
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 50)
+        if offset < 0 or not 0 < limit <= MAX_PAGE_SIZE:
+            raise ValueError(f"offset must be >= 0 and limit between 1 and {MAX_PAGE_SIZE}")
+
+        key = "words?" + json.dumps([filters, offset, limit], ensure_ascii=False, sort_keys=True)
+        return self.conditional_json(key, lambda: self.query(offset=offset, limit=limit, **filters), if_none_match)
+
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match comparison (weak comparison, as RFC 9110 requires for GET)"""
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return etag in candidates or ("W/" + etag) in candidates
+
+
+def build_catalog(entries):
+    """Compile word entries ({word, difficulty, language?, phonetic?, phonemes?}) into catalog bytes"""
+    rows = []
+    for position, entry in enumerate(entries):
+        word = str(entry["word"]).strip()
+        if not word:
+            continue
+        phonetic = entry.get("phonetic") or None
+        phonemes = entry.get("phonemes")
+        if isinstance(phonemes, str):
+            phonemes = phonemes.split()
+        rows.append((word.casefold(), word, str(entry["difficulty"]), entry.get("language") or "en",
+                     phonetic, phonemes if phonemes is not None else phonemes_from_ipa(phonetic), position))
+
+    # Ids follow casefolded alphabetical order, so a prefix is a contiguous id range
+    rows.sort(key=lambda row: (row[0], row[3], row[2]))
+
+    difficulties, languages, phonemes = {}, {}, {}
+    for _, _, difficulty, language, _, word_phonemes, _ in sorted(rows, key=lambda row: row[6]):
+        difficulties.setdefault(difficulty, len(difficulties))
+        languages.setdefault(language, len(languages))
+        for phoneme in word_phonemes:
+            phonemes.setdefault(phoneme, len(phonemes))
+    if len(difficulties) > 255 or len(languages) > 255:
+        raise ValueError("At most 255 difficulty levels and 255 languages are supported")
+
+    sections = {name: uint32_array() if typecode == "I" else array("B") for name, typecode in SECTIONS}
+    word_blob, phonetic_blob = bytearray(), bytearray()
+    sections["word_offsets"].append(0)
+    sections["phonetic_offsets"].append(0)
+    by_difficulty = [[] for _ in difficulties]
+    by_phoneme = [[] for _ in phonemes]
+
+    for word_id, (_, word, difficulty, language, phonetic, word_phonemes, _) in enumerate(rows):
+        word_blob += word.encode("utf-8")
+        sections["word_offsets"].append(len(word_blob))
+        if phonetic:
+            phonetic_blob += phonetic.encode("utf-8")
+        sections["phonetic_offsets"].append(len(phonetic_blob))
+        sections["difficulty"].append(difficulties[difficulty])
+        sections["language"].append(languages[language])
+        by_difficulty[difficulties[difficulty]].append(word_id)
+        for code in sorted({phonemes[phoneme] for phoneme in word_phonemes}):
+            by_phoneme[code].append(word_id)
+
+    sections["word_blob"] = array("B", word_blob)
+    sections["phonetic_blob"] = array("B", phonetic_blob)
+    sections["input_order"] = uint32_array(sorted(range(len(rows)), key=lambda word_id: rows[word_id][6]))
+    for prefix, postings in (("difficulty", by_difficulty), ("phoneme", by_phoneme)):
+        indptr, ids = sections[prefix + "_indptr"], sections[prefix + "_ids"]
+        indptr.append(0)
+        for posting in postings:
+            ids.extend(posting)
+            indptr.append(len(ids))
+
+    # Lay the sections out after the header, each aligned to 4 bytes
+    def layout(header_length):
+        offset = PREAMBLE.size + header_length
+        offset += -offset % 4
+        placement = {}
+        for name, _ in SECTIONS:
+            length = len(sections[name]) * sections[name].itemsize
+            placement[name] = [offset, length]
+            offset += length + (-length % 4)
+        return placement
+
+    header = {
+        "count": len(rows),
+        "byteorder": sys.byteorder,
+        "difficulties": list(difficulties),
+        "languages": list(languages),
+        "phonemes": list(phonemes),
+        "sections": layout(0),
+    }
+    # Section offsets depend on the header length; a couple of passes make them agree
+    for _ in range(3):
+        encoded = json.dumps(header, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        header["sections"] = layout(len(encoded))
+    encoded = json.dumps(header, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if header["sections"] != layout(len(encoded)):
+        raise RuntimeError("Word catalog header layout did not converge")
+
+    out = bytearray(PREAMBLE.pack(MAGIC, FORMAT_VERSION, 0, len(encoded)) + encoded)
+    for name, _ in SECTIONS:
+        out += b"\0" * (header["sections"][name][0] - len(out))
+        out += sections[name].tobytes()
+    return bytes(out)
+
+
+def load_word_store(words_by_difficulty, phonetics=None):
+    """The catalog named by $WORD_CATALOG, or one built from a server's built-in word lists"""
+    path = os.environ.get("WORD_CATALOG")
+    if path:
+        store = WordStore.open(path)
+        print(f"📚 Word catalog loaded from {path} ({len(store)} words)")
+        return store
+    return WordStore.from_words_by_difficulty(words_by_difficulty, phonetics)
+
+
+def read_curriculum(path):
+    """Entries from a JSON list of entries, a JSON {level: [words]} dict, or a CSV with a header row"""
+    if path.endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            return list(csv.DictReader(f))
+
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        return [{"word": word, "difficulty": level} for level, words in data.items() for word in words]
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Compile a curriculum (JSON or CSV) into a catalog file")
+    build.add_argument("curriculum")
+    build.add_argument("-o", "--output", default="words.bin")
+
+    info = commands.add_parser("info", help="Show catalog statistics")
+    info.add_argument("catalog")
+
+    query = commands.add_parser("query", help="Run a /words query against a catalog")
+    query.add_argument("catalog")
+    for name in ("difficulty", "phoneme", "prefix", "language"):
+        query.add_argument("--" + name)
+    query.add_argument("--offset", type=int, default=0)
+    query.add_argument("--limit", type=int, default=20)
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        data = build_catalog(read_curriculum(args.curriculum))
+        with open(args.output, "wb") as f:
+            f.write(data)
+        store = WordStore(data, path=args.output)
+        print(f"📚 {len(store)} words, {len(store.phonemes)} phonemes, {len(data)} bytes -> {args.output}")
+    elif args.command == "info":
+        print(json.dumps(WordStore.open(args.catalog).stats(), ensure_ascii=False, indent=2))
+    else:
+        store = WordStore.open(args.catalog)
+        result = store.query(difficulty=args.difficulty, phoneme=args.phoneme, prefix=args.prefix,
+                             language=args.language, offset=args.offset, limit=args.limit)
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()